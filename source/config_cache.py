@@ -0,0 +1,89 @@
+from excel_api import CustomerTemplate, PARSER_VERSION
+from pa_metrics import phase
+import hashlib
+import json
+import logging
+import os
+import time
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Cache of parsed customer sheets, repeated runs on an unchanged workbook skip openpyxl.
+# Key: SHA-256 of the workbook bytes + sheet name + excel_api.PARSER_VERSION
+# Entry: <cache_dir>/<key>.json -> {"valid": bool, "config": create_config() output}
+# Outside of the repo checkout on purpose, actions/checkout cleans the workspace on self-hosted runners.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pa_customer_rules")
+MAX_AGE = 30 * 24 * 3600  # seconds
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(file_path, sheet_name=None) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as workbook:
+        for block in iter(lambda: workbook.read(1024 * 1024), b""):
+            digest.update(block)
+    digest.update(f"\0{sheet_name}\0{PARSER_VERSION}".encode())
+    return digest.hexdigest()
+
+
+def evict(cache_dir: str, max_age: int = MAX_AGE, max_bytes: int = MAX_BYTES) -> None:
+    # drop entries not used for max_age seconds, then the least recently used ones above max_bytes
+    now = time.time()
+    entries = []
+    for file_name in os.listdir(cache_dir):
+        if not file_name.endswith(".json"):
+            continue
+        path = os.path.join(cache_dir, file_name)
+        # parallel runs/workers evict the same directory: an entry removed by another one is skipped
+        try:
+            stat = os.stat(path)
+            if now - stat.st_mtime > max_age:
+                os.remove(path)
+                continue
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def parse_template(template: CustomerTemplate) -> dict:
+    valid = template.is_valid()
+    return {"valid": valid, "config": template.create_config() if valid else None}
+
+
+def load_parsed(file_path, sheet_name=None, cache_dir: str = DEFAULT_CACHE_DIR, use_cache: bool = True,
+                max_age: int = MAX_AGE, max_bytes: int = MAX_BYTES) -> dict:
+    # returns {"valid": template is valid, "config": create_config() output, None for an invalid template}
+    if not use_cache:
+        return parse_template(CustomerTemplate.load(file_path, sheet_name))
+
+    path = os.path.join(cache_dir, cache_key(file_path, sheet_name) + ".json")
+    try:
+        with phase("template cache load"), open(path) as cache_file:
+            parsed = json.load(cache_file)
+        os.utime(path)  # mtime = last use, for the eviction
+        logger.info(f"Parsed template loaded from cache: {path}")
+        return parsed
+    except (OSError, ValueError):
+        pass
+
+    parsed = parse_template(CustomerTemplate.load(file_path, sheet_name))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as cache_file:
+        json.dump(parsed, cache_file, separators=(",", ":"))
+    os.replace(tmp_path, path)  # atomic, parallel runs never read a partial entry
+    evict(cache_dir, max_age, max_bytes)
+    return parsed
@@ -0,0 +1,123 @@
+from concurrent.futures import ProcessPoolExecutor
+from config_cache import load_parsed, DEFAULT_CACHE_DIR
+import glob
+import logging
+import os
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Several customer workbooks (a directory or a glob like customer_rules/*.xlsx) parsed in
+# parallel processes (openpyxl parsing is CPU-bound) and merged into one namespaced change set:
+# the address objects, groups and rules of a customer are named "<customer>-<name>" (customer = workbook
+# file name), so two customers can both have a "Users" group. The services are named after their ports
+# (service_model.py) and are shared. Every merged item keeps the customer it comes from under the "customer" key.
+CONFIG_KEYS = ("services", "addr_groups", "policies")
+NAMESPACE_SEPARATOR = "-"
+
+
+def is_multi_path(path: str) -> bool:
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def workbook_paths(path: str) -> list:
+    if os.path.isdir(path):
+        path = os.path.join(path, "*.xlsx")
+    if not glob.has_magic(path):
+        return [path]
+    # skip the "~$customer.xlsx" lock files left by Excel
+    return sorted(p for p in glob.glob(path) if not os.path.basename(p).startswith("~$"))
+
+
+def customer_name(file_path: str) -> str:
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def parse_workbooks(paths: list, sheet_name=None, cache_dir: str = DEFAULT_CACHE_DIR,
+                    use_cache: bool = True, workers: int = None) -> dict:
+    # {customer: {"valid": bool, "config": create_config() output}}
+    if len(paths) == 1:
+        return {customer_name(paths[0]): load_parsed(paths[0], sheet_name, cache_dir, use_cache)}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(load_parsed, path, sheet_name, cache_dir, use_cache) for path in paths]
+        return {customer_name(path): future.result() for path, future in zip(paths, futures)}
+
+
+def namespace_config(customer: str, config: dict) -> dict:
+    # create_config() output -> the same config with the customer prefix on the address objects, groups and rules;
+    # the rule addresses are renamed only when the sheet defines them (not "any" or a firewall object)
+    prefix = customer + NAMESPACE_SEPARATOR
+    names = {addr_group["name"] for addr_group in config["addr_groups"]}
+    names.update(name for addr_group in config["addr_groups"] for addr_object in addr_group["objects"] for name in addr_object)
+
+    def rename(value):
+        return prefix + value if isinstance(value, str) and value in names else value
+
+    return {
+        "services": config["services"],
+        "addr_groups": [dict(addr_group, name=prefix + addr_group["name"],
+                             objects=[{prefix + name: value for name, value in addr_object.items()}
+                                      for addr_object in addr_group["objects"]])
+                        for addr_group in config["addr_groups"]],
+        "policies": [dict(policy, name=prefix + policy["name"], src_addr=rename(policy["src_addr"]),
+                          dst_addr=rename(policy["dst_addr"]))
+                     for policy in config["policies"]],
+    }
+
+
+def merge_configs(configs: dict) -> tuple:
+    # {customer: config} -> (merged config, [conflicts])
+    # a service defined the same way by several customers is deployed once; the same name with different
+    # definitions (a service, or an object defined twice in one sheet) is a conflict, reported once per name
+    merged = {key: [] for key in CONFIG_KEYS}
+    owners = {key: {} for key in CONFIG_KEYS}
+    addresses = {}
+    # (kind, name) -> customers defining it differently, first owner first
+    conflicts = {}
+    for customer, config in configs.items():
+        config = namespace_config(customer, config)
+        # address objects live inside the groups, the same object name can be used by several groups
+        for addr_group in config["addr_groups"]:
+            for addr_object in addr_group["objects"]:
+                for addr_obj_name, addr_obj_value in addr_object.items():
+                    known = addresses.setdefault(addr_obj_name, (customer, addr_obj_value))
+                    if known[1] != addr_obj_value:
+                        customers = conflicts.setdefault(("address", addr_obj_name), [known[0]])
+                        if customer not in customers:
+                            customers.append(customer)
+        for key in CONFIG_KEYS:
+            for item in config[key]:
+                name = item["name"]
+                known = owners[key].get(name)
+                if known is None:
+                    owners[key][name] = (customer, item)
+                    merged[key].append(dict(item, customer=customer))
+                elif known[1] != item:
+                    customers = conflicts.setdefault((key, name), [known[0]])
+                    if customer not in customers:
+                        customers.append(customer)
+    return merged, [f"{kind} {name}: defined differently "
+                    + (f"by {' and '.join(customers)}" if len(customers) > 1 else f"inside {customers[0]}")
+                    for (kind, name), customers in conflicts.items()]
+
+
+def load_customer_configs(path: str, sheet_name=None, cache_dir: str = DEFAULT_CACHE_DIR,
+                          use_cache: bool = True, workers: int = None) -> dict:
+    # parse + validate + merge, exits on an invalid workbook or conflicting definitions
+    paths = workbook_paths(path)
+    if not paths:
+        exit(f"No workbook found in {path}.")
+    parsed = parse_workbooks(paths, sheet_name, cache_dir, use_cache, workers)
+    invalid = [customer for customer, result in parsed.items() if not result["valid"]]
+    if invalid:
+        exit(f"The template file is not valid for: {', '.join(invalid)}. Please fix the template structure.")
+    logger.info(f"Template structure is valid for: {', '.join(parsed)}.")
+
+    merged, conflicts = merge_configs({customer: result["config"] for customer, result in parsed.items()})
+    if conflicts:
+        for conflict in conflicts:
+            logger.info(conflict)
+        exit(f"{len(conflicts)} conflicting definition(s) between the customer workbooks.")
+    return merged
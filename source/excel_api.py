@@ -1,4 +1,6 @@
 from openpyxl import load_workbook
+from service_model import SPECIAL_SERVICES, parse_service_cell, service_objects
+from pa_metrics import phase
 import logging
 
 # logger will return the source module name
@@ -6,108 +8,175 @@ logger = logging.getLogger(__name__)
 # display logging info level
 logging.basicConfig(level=logging.INFO)
 
+# Policy_name ... Action columns of the "Policies" section
+TEMPLATE_COLUMNS = 9
+# bump when the create_config() output format changes (invalidates config_cache.py entries)
+PARSER_VERSION = 2
 
-# More validations can be added here
-def validate_template(file_path, sheet_name=None) -> None:
-    excel_workbook = load_workbook(filename=file_path, data_only=True)
-    excel_sheet = excel_workbook[sheet_name]
-    temp_valid = []
-
-    for row in excel_sheet.iter_rows(min_row=1, max_col=1, max_row=excel_sheet.max_row):
-        for cell in row:
-            temp_valid.append(cell.value)
-    
-    if ("Group_address_objects" not in temp_valid) or ("Policies" not in temp_valid):
-        exit("The template file is not valid. Please fix the template structure.")
-    else:
-        logger.info("Template structure is valid.")
 
+def iter_sheet_rows(file_path, sheet_name=None):
+    # read-only + values_only: openpyxl streams the sheet XML, no cell objects are kept in memory
+    excel_workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
+    try:
+        for row in excel_workbook[sheet_name].iter_rows(values_only=True):
+            # policy rows are read up to the "Action" column, short rows are padded
+            yield tuple(row) + (None,) * (TEMPLATE_COLUMNS - len(row))
+    finally:
+        excel_workbook.close()
 
-def service_port_strip(service: str) -> list:
-    # logger.info(f"Service:\n{service}")
-    serv_list = []
-    if service == "application-default":
-        serv_list.append(service)
-        return serv_list
-    if service == "any":
-        serv_list.append(service)
-        return serv_list
-    else:
-        split_lines = service.splitlines()
-        for line in split_lines:
-            serv_dict = {}
-            serv_dict["name"] = line
-            prot_port = line.split("_")
-            serv_dict["protocol"] = prot_port[0]
-            serv_dict["port"] = prot_port[1]
-            serv_list.append(serv_dict)
-
-        return serv_list
-
-
-def create_config(file_path, sheet_name=None) -> None:
-    excel_workbook = load_workbook(filename=file_path, data_only=True)
-    excel_sheet = excel_workbook[sheet_name]
-    cfg_addr_groups = []
-    cfg_services = []
-    cfg_policies = []
-    all_configs = {}
+
+def iter_config_rows(rows):
+    # yields ("addr_group", group), ("service", service), ("policy", policy) and ("row_error", message),
+    # an address group is yielded once its last object row has been read,
+    # the services of a policy are yielded right before the policy
+    cfg_addr_group = None
+    config_flag = None
 
     # Start from the 1st row to set the config_flag
-    # row is a list of cells in that row
-    for row in excel_sheet.iter_rows(min_row=1, max_col=excel_sheet.max_column, max_row=excel_sheet.max_row):
+    # row is a tuple of cell values in that row
+    for row in rows:
         # thanks to the flag system we scan the config only once
-        if row[0].value == "Group_address_objects":
+        if row[0] == "Group_address_objects":
             config_flag = "addr_group"
-        if row[0].value == "Policies":
+        if row[0] == "Policies":
             config_flag = "policy"
-        if (row[0].value != "Group_address_objects" and row[0].value != "Group_name" 
-            and config_flag == "addr_group" and row[0].value is not None
-            and row[1].value is not None and row[2].value is not None):
+        if (row[0] != "Group_address_objects" and row[0] != "Group_name"
+            and config_flag == "addr_group" and row[0] is not None
+            and row[1] is not None and row[2] is not None):
+            if cfg_addr_group is not None:
+                yield "addr_group", cfg_addr_group
             cfg_addr_group = {}
-            cfg_addr_group["name"] = row[0].value
-            cfg_addr_group["objects"] = [{row[1].value: row[2].value}]
-            cfg_addr_groups.append(cfg_addr_group)
-            # logger.info(f"ADDR_GROUP_DICT_FIRST_ROW:\n{row[0].value, row[1].value, row[2].value}")
-        if row[0].value is None and row[1].value is not None and row[2].value is not None and config_flag == "addr_group":
-            cfg_addr_group["objects"].extend([{row[1].value: row[2].value}])
-            # logger.info(f"ADDR_GROUP_DICT_SECOND_ROW:\n{row[0].value, row[1].value, row[2].value}")
+            cfg_addr_group["name"] = row[0]
+            cfg_addr_group["objects"] = [{row[1]: row[2]}]
+        if row[0] is None and row[1] is not None and row[2] is not None and config_flag == "addr_group":
+            cfg_addr_group["objects"].extend([{row[1]: row[2]}])
 
         # flag was changed, time for a second part of the config
-        if (row[0].value != "Policies" and row[0].value != "Policy_name" 
-            and config_flag == "policy" and row[0].value is not None):
+        if config_flag == "policy" and cfg_addr_group is not None:
+            yield "addr_group", cfg_addr_group
+            cfg_addr_group = None
+        if (row[0] != "Policies" and row[0] != "Policy_name"
+            and config_flag == "policy" and row[0] is not None):
+            # an invalid Service cell is reported as a row error and the policy is left out,
+            # the items already yielded to a streamed deploy stay valid
+            try:
+                services = service_port_strip(row[7])
+            except ValueError as err:
+                yield "row_error", f"Policy {row[0]}: {err}"
+                continue
+            if row[7] not in SPECIAL_SERVICES:
+                for cfg_service in services:
+                    yield "service", cfg_service
             cfg_policy = {}
-            cfg_policy["name"] = row[0].value
-            cfg_policy["description"] = row[1].value
-            cfg_policy["src_zone"] = row[2].value
-            cfg_policy["src_addr"] = row[3].value
-            cfg_policy["dst_zone"] = row[4].value
-            cfg_policy["dst_addr"] = row[5].value
-            cfg_policy["app"] = row[6].value
-            cfg_policy["service"] = service_port_strip(row[7].value)
-            cfg_policy["action"] = row[8].value
-            # logger.info(f"POLICY_DICT:\n{cfg_policy}")
-            cfg_policies.append(cfg_policy)
-            # logger.info(f"CURRENT_POLICY_LIST:\n{cfg_policies}")
-        if (row[0].value != "Policies" and row[0].value != "Policy_name" 
-            and config_flag == "policy" and row[0].value is not None 
-            and row[7].value != "application-default" and row[7].value != "any"):
-            cfg_services.extend(service_port_strip(row[7].value))
-
-    logger.info(f"Policies:\n{cfg_policies}")
-    logger.info(f"Address groups:\n{cfg_addr_groups}")
-    logger.info(f"Services:\n{cfg_services}")
-
-    all_configs["policies"] = cfg_policies
-    all_configs["addr_groups"] = cfg_addr_groups
-    all_configs["services"] = cfg_services
-
+            cfg_policy["name"] = row[0]
+            cfg_policy["description"] = row[1]
+            cfg_policy["src_zone"] = row[2]
+            cfg_policy["src_addr"] = row[3]
+            cfg_policy["dst_zone"] = row[4]
+            cfg_policy["dst_addr"] = row[5]
+            cfg_policy["app"] = row[6]
+            cfg_policy["service"] = services
+            cfg_policy["action"] = row[8]
+            yield "policy", cfg_policy
+
+    if cfg_addr_group is not None:
+        yield "addr_group", cfg_addr_group
+
+
+def iter_config(file_path, sheet_name=None):
+    # streaming variant of create_config(): memory stays flat whatever the sheet size,
+    # and the caller can start deploying before the whole sheet has been read
+    return iter_config_rows(iter_sheet_rows(file_path, sheet_name))
+
+
+def collect_config(items) -> dict:
+    # iter_config*() items -> create_config() dictionary
+    all_configs = {"policies": [], "addr_groups": [], "services": []}
+    keys = {"policy": "policies", "addr_group": "addr_groups", "service": "services"}
+    for kind, item in items:
+        if kind == "row_error":
+            # the same rows are reported by invalid_services() and fail the template validation
+            logger.info(item)
+            continue
+        all_configs[keys[kind]].append(item)
+
+    logger.info(f"Policies:\n{all_configs['policies']}")
+    logger.info(f"Address groups:\n{all_configs['addr_groups']}")
+    logger.info(f"Services:\n{all_configs['services']}")
     return all_configs
 
 
+def check_template(valid: bool) -> None:
+    if not valid:
+        exit("The template file is not valid. Please fix the template structure.")
+    else:
+        logger.info("Template structure is valid.")
+
+
+class CustomerTemplate:
+    # The customer sheet parsed once (cell values only), shared by the template
+    # validation, the config extraction and any further checks.
+    # Each step is timed as a pa_metrics phase (excel load, template validation, config extraction).
+    def __init__(self, rows: list, file_path=None, sheet_name=None) -> None:
+        self.rows = rows
+        self.file_path = file_path
+        self.sheet_name = sheet_name
+
+    @classmethod
+    def load(cls, file_path, sheet_name=None) -> "CustomerTemplate":
+        with phase("excel load"):
+            return cls(list(iter_sheet_rows(file_path, sheet_name)), file_path, sheet_name)
+
+    # More validations can be added here
+    def is_valid(self) -> bool:
+        with phase("template validation"):
+            temp_valid = [row[0] for row in self.rows]
+            invalid_services = self.invalid_services()
+        for invalid in invalid_services:
+            logger.info(invalid)
+        return ("Group_address_objects" in temp_valid) and ("Policies" in temp_valid) and not invalid_services
+
+    def invalid_services(self) -> list:
+        invalid = []
+        policies = False
+        for row in self.rows:
+            if row[0] == "Policies":
+                policies = True
+            elif policies and row[0] not in (None, "Policy_name") and row[7] not in SPECIAL_SERVICES:
+                try:
+                    parse_service_cell(row[7])
+                except ValueError as err:
+                    invalid.append(f"Policy {row[0]}: {err}")
+        return invalid
+
+    def validate(self) -> None:
+        check_template(self.is_valid())
+
+    def create_config(self) -> dict:
+        with phase("config extraction"):
+            return collect_config(iter_config_rows(self.rows))
+
+
+def validate_template(file_path, sheet_name=None) -> None:
+    CustomerTemplate.load(file_path, sheet_name).validate()
+
+
+def service_port_strip(service: str) -> list:
+    # "application-default" / "any" are kept as they are, port lists are compiled into
+    # one service object per protocol (service_model)
+    if service in SPECIAL_SERVICES:
+        return [service]
+    return service_objects(service)
+
+
+def create_config(file_path, sheet_name=None) -> dict:
+    return CustomerTemplate.load(file_path, sheet_name).create_config()
+
+
 def main() -> None:
-    validate_template("customer_rules/customer_A.xlsx", sheet_name="Rules")
-    create_config("customer_rules/customer_A.xlsx", sheet_name="Rules")
+    template = CustomerTemplate.load("customer_rules/customer_A.xlsx", sheet_name="Rules")
+    template.validate()
+    template.create_config()
     # read_excel_file("customer_rules/customer_A.xlsx", sheet_name="Rules")
     # ports = service_port_strip("tcp_7700\ntcp_7701\ntcp_7702")
     # ports = service_port_strip("udp_123-222")
@@ -0,0 +1,209 @@
+from pa_api import PaClient
+from pa_plan import desired_state, current_state
+from pa_resolve import ip_range
+from config_cache import load_parsed, DEFAULT_CACHE_DIR
+from excel_api import check_template
+import numpy as np
+import argparse
+import json
+import logging
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Bulk checks of the address objects of the customer sheet against the live firewall table:
+#   name_conflict - the same name with different values inside the sheet (fails the check)
+#   update        - a firewall object the sheet gives another value, updated by the deploy (information)
+#   same_ip       - the same IP/range under different names
+#   contained     - an object inside another object's range
+#   overlap       - partially overlapping objects
+#
+# Every address is converted into a start/end range, IPv6 values as (high, low) uint64 pairs. All the
+# starts and ends are sorted together (lexsort on version, high, low) and replaced by their rank, so IPv4
+# and IPv6 ranges become int64 intervals with the same order. Identical ranges are grouped with np.unique,
+# containment and overlaps come from one sort by (start, -end) and a running maximum of the ends; every
+# range is reported once, against the earlier range reaching the furthest.
+
+FINDING_TYPES = ("name_conflict", "update", "same_ip", "contained", "overlap")
+LOW_MASK = (1 << 64) - 1
+
+
+def sheet_conflicts(conf: dict) -> list:
+    # desired_state() keeps the last definition of a name, the conflicting definitions inside the sheet are listed here
+    definitions = {}
+    for addr_group in conf["addr_groups"]:
+        for addr_object in addr_group["objects"]:
+            for name, value in addr_object.items():
+                value = str(value).strip()
+                # 10.0.0.1 and 10.0.0.1/32 are the same object
+                key = ip_range(value) or value
+                defined = definitions.setdefault(name, {}).setdefault(key, {"value": value, "groups": []})
+                defined["groups"].append(addr_group["name"])
+    findings = []
+    for name, by_value in definitions.items():
+        if len(by_value) > 1:
+            values = {defined["value"]: sorted(set(defined["groups"])) for defined in by_value.values()}
+            findings.append({"type": "name_conflict", "names": [name], "sheet": True, "values": {"sheet": values}})
+    return findings
+
+
+def address_table(sheet: dict, firewall: dict) -> tuple:
+    # sheet/firewall: {name: {"ip": value}} (pa_plan state) -> (objects, skipped)
+    # objects: [(name, value, origin, (version, start, end))], the addresses once deployed: an object in both
+    # with the same value is kept once, the sheet value replaces the firewall one
+    objects, skipped = [], []
+    for origin, addresses in (("firewall", firewall), ("sheet", sheet)):
+        for name, spec in addresses.items():
+            if origin == "firewall" and name in sheet and sheet[name]["ip"] != spec["ip"]:
+                continue
+            if origin == "sheet" and name in firewall and firewall[name]["ip"] == spec["ip"]:
+                continue
+            rng = ip_range(spec["ip"])
+            if rng is None:
+                skipped.append(name)
+            else:
+                objects.append((name, spec["ip"], origin, rng))
+    return objects, skipped
+
+
+def range_ranks(objects: list) -> tuple:
+    # -> (starts, ends) int64 arrays of ranks, ordered like the IP values
+    count = len(objects)
+    versions = np.empty(2 * count, dtype=np.uint8)
+    high = np.empty(2 * count, dtype=np.uint64)
+    low = np.empty(2 * count, dtype=np.uint64)
+    for pos, (_, _, _, (version, start, end)) in enumerate(objects):
+        versions[pos], high[pos], low[pos] = version, start >> 64, start & LOW_MASK
+        versions[count + pos], high[count + pos], low[count + pos] = version, end >> 64, end & LOW_MASK
+
+    order = np.lexsort((low, high, versions))
+    sorted_keys = (versions[order], high[order], low[order])
+    new_value = np.ones(2 * count, dtype=bool)
+    if count:
+        new_value[1:] = np.any([key[1:] != key[:-1] for key in sorted_keys], axis=0)
+    ranks = np.empty(2 * count, dtype=np.int64)
+    ranks[order] = np.cumsum(new_value) - 1
+    return ranks[:count], ranks[count:]
+
+
+def check_addresses(sheet: dict, firewall: dict) -> dict:
+    objects, skipped = address_table(sheet, firewall)
+    findings = []
+
+    for name, spec in sheet.items():
+        if name in firewall and firewall[name]["ip"] != spec["ip"]:
+            findings.append({"type": "update", "names": [name], "sheet": True,
+                             "values": {"firewall": firewall[name]["ip"], "sheet": spec["ip"]}})
+
+    starts, ends = range_ranks(objects)
+    # identical ranges -> one unique range, with the objects defining it
+    keys = starts * (int(ends.max(initial=0)) + 1) + ends
+    unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    members = [[] for _ in unique_keys]
+    for pos, unique_pos in enumerate(inverse.tolist()):
+        members[unique_pos].append(pos)
+
+    described = {}
+
+    def describe(unique_pos: int) -> dict:
+        # a wide range can hold thousands of objects, it is described once
+        if unique_pos not in described:
+            objs = [objects[pos] for pos in members[unique_pos]]
+            described[unique_pos] = {"names": sorted({obj[0] for obj in objs}), "value": objs[0][1],
+                                     "origins": {obj[2] for obj in objs}}
+        return described[unique_pos]
+
+    for unique_pos, positions in enumerate(members):
+        if len({objects[pos][0] for pos in positions}) > 1:
+            same = describe(unique_pos)
+            findings.append({"type": "same_ip", "names": same["names"], "value": same["value"],
+                             "sheet": "sheet" in same["origins"]})
+
+    # sorted by start, widest first: a range is inside an earlier one when the running maximum end reaches it
+    unique_starts, unique_ends = starts[first], ends[first]
+    order = np.lexsort((-unique_ends, unique_starts))
+    sorted_starts, sorted_ends = unique_starts[order], unique_ends[order]
+    running_end = np.maximum.accumulate(sorted_ends)
+    # position of the range holding the running maximum
+    running_pos = np.maximum.accumulate(np.where(sorted_ends == running_end, np.arange(len(order)), 0))
+    previous_end = np.concatenate(([-1], running_end[:-1]))
+    previous_pos = np.concatenate(([0], running_pos[:-1]))
+    contained = previous_end >= sorted_ends
+    overlap = (previous_end >= sorted_starts) & ~contained
+
+    for finding_type, mask in (("contained", contained), ("overlap", overlap)):
+        for pos in np.flatnonzero(mask).tolist():
+            inner, outer = describe(int(order[pos])), describe(int(order[previous_pos[pos]]))
+            findings.append({"type": finding_type, "names": inner["names"], "value": inner["value"],
+                             "other": outer["names"], "other_value": outer["value"],
+                             "sheet": "sheet" in inner["origins"] or "sheet" in outer["origins"]})
+
+    return {"objects": len(objects), "skipped": skipped, "findings": findings}
+
+
+def log_report(report: dict, sheet_only: bool = True) -> None:
+    counts = {finding_type: 0 for finding_type in FINDING_TYPES}
+    for finding in report["findings"]:
+        counts[finding["type"]] += 1
+        if sheet_only and not finding["sheet"]:
+            continue
+        if finding["type"] == "name_conflict":
+            logger.info(f"name_conflict: {finding['names'][0]} is defined twice in the sheet: "
+                        + ", ".join(f"{value} ({', '.join(groups)})" for value, groups in finding["values"]["sheet"].items()))
+        elif finding["type"] == "update":
+            logger.info(f"update: {finding['names'][0]} {finding['values']['firewall']} -> {finding['values']['sheet']}")
+        elif finding["type"] == "same_ip":
+            logger.info(f"same_ip: {finding['value']} is defined as {', '.join(finding['names'])}")
+        else:
+            logger.info(f"{finding['type']}: {', '.join(finding['names'])} ({finding['value']}) and "
+                        f"{', '.join(finding['other'])} ({finding['other_value']})")
+    if report["skipped"]:
+        logger.info(f"Not checked (not an IP/range): {len(report['skipped'])} object(s)")
+    logger.info(f"Address check: {report['objects']} objects, "
+                + ", ".join(f"{count} {finding_type}" for finding_type, count in counts.items()) + ".")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pa_api_url", type=str, help="PA API URL")
+    parser.add_argument("pa_api_key", type=str, help="PA API key")
+    parser.add_argument("ex_file_path", type=str, nargs="?", default=None, help="Excel file path")
+    parser.add_argument("ex_sheet", type=str, nargs="?", default=None, help="Excel sheet name")
+    parser.add_argument("--config-json", type=str, default=None, help="Config parsed by pa_temp_validation.py --config-out")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Parsed template cache directory")
+    parser.add_argument("--all", action="store_true", help="Also list the findings between firewall objects")
+    parser.add_argument("--strict", action="store_true",
+                        help="Fail on any sheet finding (same IP, contained, overlap), not only on name conflicts inside the sheet")
+    parser.add_argument("--report", type=str, default=None, help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    if args.config_json:
+        with open(args.config_json) as config_file:
+            conf = json.load(config_file)
+    elif args.ex_file_path and args.ex_sheet:
+        parsed = load_parsed(args.ex_file_path, args.ex_sheet, args.cache_dir)
+        check_template(parsed["valid"])
+        conf = parsed["config"]
+    else:
+        parser.error("give the Excel file path and sheet, or --config-json")
+
+    with PaClient(args.pa_api_url, args.pa_api_key) as client:
+        firewall = current_state({}, client.display_obj_addresses(), {}, {})["addresses"]
+    report = check_addresses(desired_state(conf)["addresses"], firewall)
+    report["findings"][:0] = sheet_conflicts(conf)
+    log_report(report, sheet_only=not args.all)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    # updates of firewall objects are the normal deploy path, they never fail the check
+    failing = [finding for finding in report["findings"] if finding["sheet"] and finding["type"] != "update"
+               and (args.strict or finding["type"] == "name_conflict")]
+    if failing:
+        exit(f"{len(failing)} address problem(s) in the sheet.")
+
+
+if __name__ == "__main__":
+    main()
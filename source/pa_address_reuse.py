@@ -0,0 +1,104 @@
+from pa_plan import current_state
+import ipaddress
+import logging
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Address object reuse: an IP already defined on the firewall (or earlier in the sheet) under another
+# name is not created again, the groups and policies of the sheet reference the existing object instead.
+# Index: normalised ip-netmask/ip-range -> object name.
+
+
+def normalise_ip(value) -> str:
+    # "10.0.0.1" and "10.0.0.1/32" -> "10.0.0.1/32", "10.0.0.1 - 10.0.0.9" -> "10.0.0.1-10.0.0.9"
+    value = str(value).strip()
+    try:
+        if "-" in value:
+            return "-".join(str(ipaddress.ip_address(part.strip())) for part in value.split("-", 1))
+        return str(ipaddress.ip_interface(value))
+    except ValueError:
+        # fqdn and anything else PAN-OS accepts: compared as written
+        return value.lower()
+
+
+def address_index(addresses: dict) -> dict:
+    # {name: {"ip": value}} (pa_plan state) -> {normalised ip: name}, the first name in sort order wins
+    index = {}
+    for name in sorted(addresses):
+        index.setdefault(normalise_ip(addresses[name]["ip"]), name)
+    return index
+
+
+def reuse_addresses(conf: dict, firewall: dict) -> tuple:
+    # conf: create_config() output, firewall: display_obj_addresses() output
+    # -> (rewritten conf, names of the firewall objects used as they are, [reused items and conflicts report])
+    # a conflict is a name the sheet defines again with another IP after it has been resolved (sheet object,
+    # or firewall object reused by the sheet): the rewritten conf would silently use the first value
+    existing = current_state({}, firewall, {}, {})["addresses"]
+    firewall_index = address_index(existing)
+    sheet_index = {}
+    renamed = {}
+    unchanged = set()
+    # name -> (normalised ip, ip as defined, source) of the names already resolved
+    resolved = {}
+    report = []
+    for addr_group in conf["addr_groups"]:
+        for addr_object in addr_group["objects"]:
+            for addr_obj_name, addr_obj_value in addr_object.items():
+                key = normalise_ip(addr_obj_value)
+                if addr_obj_name in resolved:
+                    defined_key, defined_ip, source = resolved[addr_obj_name]
+                    if defined_key != key:
+                        report.append({"name": addr_obj_name, "ip": str(addr_obj_value),
+                                       "conflict": defined_ip, "source": source})
+                    continue
+                resolved[addr_obj_name] = (key, str(addr_obj_value), "sheet")
+                if addr_obj_name in existing and normalise_ip(existing[addr_obj_name]["ip"]) == key:
+                    unchanged.add(addr_obj_name)
+                elif key in firewall_index:
+                    renamed[addr_obj_name] = firewall_index[key]
+                    unchanged.add(firewall_index[key])
+                    resolved.setdefault(firewall_index[key], (key, existing[firewall_index[key]]["ip"], "firewall"))
+                    report.append({"name": addr_obj_name, "ip": str(addr_obj_value),
+                                   "reused": firewall_index[key], "source": "firewall"})
+                elif key in sheet_index:
+                    renamed[addr_obj_name] = sheet_index[key]
+                    report.append({"name": addr_obj_name, "ip": str(addr_obj_value),
+                                   "reused": sheet_index[key], "source": "sheet"})
+                else:
+                    sheet_index[key] = addr_obj_name
+
+    rewritten = dict(conf, addr_groups=[], policies=[])
+    for addr_group in conf["addr_groups"]:
+        objects = {}
+        for addr_object in addr_group["objects"]:
+            for addr_obj_name, addr_obj_value in addr_object.items():
+                name = renamed.get(addr_obj_name, addr_obj_name)
+                objects.setdefault(name, existing[name]["ip"] if name in unchanged else addr_obj_value)
+        rewritten["addr_groups"].append(dict(addr_group, objects=[{name: value} for name, value in objects.items()]))
+    # policies can reference address objects directly
+    for policy in conf["policies"]:
+        rewritten["policies"].append(dict(
+            policy,
+            src_addr=renamed.get(policy["src_addr"], policy["src_addr"]),
+            dst_addr=renamed.get(policy["dst_addr"], policy["dst_addr"]),
+        ))
+    return rewritten, unchanged, report
+
+
+def reuse_conflicts(report: list) -> list:
+    return [item for item in report if "conflict" in item]
+
+
+def log_reuse(report: list, unchanged: set) -> None:
+    for item in report:
+        if "conflict" in item:
+            logger.info(f"Address {item['name']} ({item['ip']}) conflicts with the {item['source']} object "
+                        f"{item['name']} ({item['conflict']}) already used by the sheet.")
+        else:
+            logger.info(f"Address {item['name']} ({item['ip']}) reuses the {item['source']} object {item['reused']}.")
+    logger.info(f"Address reuse: {len(report) - len(reuse_conflicts(report))} object(s) replaced by existing ones, "
+                f"{len(unchanged)} firewall object(s) used as they are, {len(reuse_conflicts(report))} conflict(s).")
@@ -1,8 +1,14 @@
 import requests
 import logging
 import json
-from urllib3.exceptions import InsecureRequestWarning
+import re
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from pa_request import RequestLayer, get_request_layer
+from urllib3.exceptions import InsecureRequestWarning, NewConnectionError
 import xml.etree.ElementTree as ET
+from urllib.parse import urlencode
 
 # logger will return the source module name
 logger = logging.getLogger(__name__)
@@ -16,17 +22,20 @@ api_url = ""
 # pa_api_key = get_api_key(api_url, "", "")
 pa_api_key = ""
 
+REST_API = "/restapi/v11.2"
+XML_API = "/api/"
+
 # PAN-OS XML API
-# The PAN-OS XML API is powerful and low-level, allowing you to take full control of every aspect of your security, 
+# The PAN-OS XML API is powerful and low-level, allowing you to take full control of every aspect of your security,
 # and build deep integrations with a variety of other systems. You can make XML API calls directly to the firewall,
 #  directly to Panorama, or to a firewall via Panorama.
 
 # PAN-OS REST API
-# The PAN-OS REST API simplifies access to resources as high-level URIs. 
+# The PAN-OS REST API simplifies access to resources as high-level URIs.
 # You can use this API to create, change, and delete resources.
 # REST API on-device documentation: https://HOSTNAME/restapi
 
-# 1. Enable API access: 
+# 1. Enable API access:
 # https://docs.paloaltonetworks.com/ngfw/api/api-authentication-and-security/pan-os-api-authentication
 # 2. Generate an API key certificate:
 # https://docs.paloaltonetworks.com/ngfw/api/api-authentication-and-security/generate-api-key
@@ -35,38 +44,950 @@ pa_api_key = ""
 # run get_api_key() function
 
 
-def commit(pa_url: str, api_key: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/System/Configuration:commit"
-    url = pa_url + api
-    logger.info("Commit the changes...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
+def service_entry(name: str, protocol: str, port: str, desc: str = "") -> dict:
+    return {
+        "entry":
+           {
+                "@name": name,
+                "description": desc,
+                "protocol": {
+                    protocol: {
+                        "port": port,
+                        # "source-port": "0,1-65535",
+                        # "override": {
+                        #     "no": {}
+                        # }
+                    }
+                }
+                # "tag": {
+                #     "member": [
+                #         "some_tag"
+                #     ]
+                # }
+           }
     }
 
-    payload = json.dumps({
-        "entry": {
-            "description": desc,
-            "force": {
-                "partial": None
-            }
+
+def address_entry(name: str, ip_add: str, desc: str = "") -> dict:
+    return {
+        "entry":
+           {
+                "@name": name,
+                "ip-netmask": ip_add,
+                "description": desc,
+                # "tag": {
+                #     "member": [
+                #         "some_tag"
+                #     ]
+                # }
+           }
+    }
+
+
+def address_group_entry(name: str, group: list, desc: str = "") -> dict:
+    return {
+        "entry":
+           {
+                "@name": name,
+                "static": {
+                    "member": group
+                },
+                "description": desc,
+                # "tag": {
+                #     "member": [
+                #         "some_tag"
+                #     ]
+                # }
+           }
+    }
+
+
+def sec_policy_entry(name: str, src_zone: str, src_addr: str, dst_zone: str, dst_addr: str,
+                     app: str, service: list, action: str, desc: str = "") -> dict:
+    return {
+        "entry":
+        {
+            "@name": name,
+            "from": {  # source zone
+                "member": [
+                    src_zone
+                ]
+            },
+            "to": {  # destination zone
+                "member": [
+                    dst_zone
+                ]
+            },
+            "source": {
+                "member": [
+                    src_addr
+                ]
+            },
+            "destination": {
+                "member": [
+                    dst_addr
+                ]
+            },
+            "application": {
+                "member": [
+                    app
+                ]
+            },
+            "service": {
+                "member": service  # list
+            },
+            "action": action,
+            "description": desc
+            # "source-user": {
+            #     "member": [
+            #         "any"
+            #     ]
+            # },
+            # "category": {
+            #     "member": [
+            #         "any"
+            #     ]
+            # },
+            # "negate-source": "no",
+            # "negate-destination": "no",
+            # "disabled": "no",
+            # "tag": {
+            #     "member": [
+            #         "string"
+            #     ]
+            # },
+            # "group-tag": "string",
+            # "schedule": "string",
+            # "icmp-unreachable": "no",
+            # "disable-inspect": "no",
+            # "rule-type": "universal",
+            # "option": {
+            #     "disable-server-response-inspection": "no"
+            # },
+            # "profile-setting": {},
+            # "qos": {},
+            # "log-setting": "string",
+            # "log-start": "no",
+            # "log-end": "yes",
         }
-    })
+    }
 
-    response = requests.post(
-        url=url,
-        headers=headers,
-        data=payload,
-        verify=False
-    )
 
-    if response.status_code == 200:
-        logger.info("PA config changes successfully commited.")
+def xml_status(text: str) -> str:
+    # <response status="success|error" ...>
+    try:
+        return ET.fromstring(text).get("status")
+    except ET.ParseError:
+        return None
+
+
+def commit_job_id(text: str) -> str:
+    # REST commit response: {"@status": "success", "result": {"job": "42", "msg": {"line": "... jobid 42"}}}
+    try:
+        result = json.loads(text).get("result", {})
+        if isinstance(result, dict) and result.get("job"):
+            return str(result["job"])
+    except (ValueError, AttributeError):
+        pass
+    match = re.search(r"jobid\s+(\d+)", text)
+    return match.group(1) if match else None
+
+
+def request_not_sent(err: Exception) -> bool:
+    # connect timeout/refused: the request never reached the firewall, even a commit can be retried
+    if isinstance(err, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(err.args[0], "reason", None) if err.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def already_exists(status: int, text: str) -> bool:
+    # REST API create of an existing object: HTTP 409, code 6 "Object Already Exists"
+    return status == 409 or "already exists" in text.lower()
+
+
+def not_present(status: int, text: str) -> bool:
+    # REST API update of a missing object: HTTP 404, code 5 "Object Not Present"
+    return status == 404 or "not present" in text.lower()
+
+
+def parse_jobs(root: ET.Element) -> list:
+    # <response><result><job><id/><type/><status/><result/><progress/><details><line/></details></job>...
+    # Panorama commit-all jobs also list the managed firewalls: <devices><entry><devicename/><serial-no/>...
+    jobs = []
+    if root is None:
+        return jobs
+    for job in root.iter("job"):
+        if job.find("id") is None:
+            continue
+        jobs.append({
+            "id": job.findtext("id"),
+            "type": job.findtext("type", ""),
+            "status": job.findtext("status", ""),
+            "result": job.findtext("result", ""),
+            "progress": job.findtext("progress", ""),
+            "details": [line.text or "" for line in job.iter("line")],
+            "devices": [{
+                "name": device.findtext("devicename", ""),
+                "serial": device.findtext("serial-no", ""),
+                "status": device.findtext("status", ""),
+                "result": device.findtext("result", ""),
+                "progress": device.findtext("progress", ""),
+            } for device in job.findall("devices/entry")],
+        })
+    return jobs
+
+
+# XML API rendering of the same objects, used by the bulk push path
+def operation_name(method: str, api: str, form: dict = None) -> str:
+    # metrics label: "POST /Objects/Addresses", "XML config/set", "XML op"
+    if form is not None:
+        return "XML " + "/".join(form[key] for key in ("type", "action") if form.get(key))
+    return f"{method} {api[len(REST_API):] if api.startswith(REST_API) else api}"
+
+
+def vsys_xpath(vsys: str) -> str:
+    return f"/config/devices/entry[@name='localhost.localdomain']/vsys/entry[@name='{vsys}']"
+
+
+# config locations: a firewall vsys, a Panorama device group or the Panorama shared config
+LOCATIONS = ("vsys", "device-group", "shared")
+# Panorama rules are pushed before (pre) or after (post) the firewall local rules
+RULEBASES = ("pre", "post")
+
+
+def location_xpath(location: str, name: str = None) -> str:
+    if location == "shared":
+        return "/config/shared"
+    if location == "device-group":
+        return f"/config/devices/entry[@name='localhost.localdomain']/device-group/entry[@name='{name}']"
+    return vsys_xpath(name)
+
+
+def check_location(location: str, device_group: str = None, rulebase: str = "pre") -> None:
+    if location not in LOCATIONS:
+        raise ValueError(f"Unknown location {location}, expected one of {', '.join(LOCATIONS)}")
+    if location == "device-group" and not device_group:
+        raise ValueError("Location device-group needs a device group name")
+    if rulebase not in RULEBASES:
+        raise ValueError(f"Unknown rulebase {rulebase}, expected one of {', '.join(RULEBASES)}")
+
+
+def commit_all_cmds(device_groups: list = (), template_stacks: list = (), desc: str = "") -> list:
+    # Panorama commit-all (push to the managed firewalls): one job for the device groups, one per template stack
+    cmds = []
+    if device_groups:
+        shared_policy = ET.Element("shared-policy")
+        groups = ET.SubElement(shared_policy, "device-group")
+        for device_group in device_groups:
+            ET.SubElement(groups, "entry", name=device_group)
+        if desc:
+            ET.SubElement(shared_policy, "description").text = desc
+        cmds.append(shared_policy)
+    for template_stack in template_stacks:
+        stack = ET.Element("template-stack")
+        ET.SubElement(stack, "name").text = template_stack
+        if desc:
+            ET.SubElement(stack, "description").text = desc
+        cmds.append(stack)
+    return [f"<commit-all>{ET.tostring(cmd, encoding='unicode')}</commit-all>" for cmd in cmds]
+
+
+def _xml_entry(name: str, fields: dict, desc: str = "") -> ET.Element:
+    # fields: {tag: text | list of members | dict of nested fields}
+    entry = ET.Element("entry", name=name)
+
+    def fill(parent, values):
+        for tag, value in values.items():
+            child = ET.SubElement(parent, tag)
+            if isinstance(value, dict):
+                fill(child, value)
+            elif isinstance(value, list):
+                for member in value:
+                    ET.SubElement(child, "member").text = str(member)
+            else:
+                child.text = str(value)
+
+    fill(entry, fields)
+    if desc:
+        ET.SubElement(entry, "description").text = desc
+    return entry
+
+
+def service_xml(name: str, protocol: str, port: str, desc: str = "") -> ET.Element:
+    return _xml_entry(name, {"protocol": {protocol: {"port": port}}}, desc)
+
+
+def address_xml(name: str, ip_add: str, desc: str = "") -> ET.Element:
+    return _xml_entry(name, {"ip-netmask": ip_add}, desc)
+
+
+def address_group_xml(name: str, group: list, desc: str = "") -> ET.Element:
+    return _xml_entry(name, {"static": group}, desc)
+
+
+def sec_policy_xml(name: str, src_zone: str, src_addr: str, dst_zone: str, dst_addr: str,
+                   app: str, service: list, action: str, desc: str = "") -> ET.Element:
+    return _xml_entry(name, {
+        "from": [src_zone],
+        "to": [dst_zone],
+        "source": [src_addr],
+        "destination": [dst_addr],
+        "application": [app],
+        "service": service,
+        "action": action,
+    }, desc)
+
+
+# config section of each entry kind, relative to the vsys xpath
+XML_SECTIONS = {
+    "service": ("service",),
+    "address": ("address",),
+    "group": ("address-group",),
+    "policy": ("rulebase", "security", "rules"),
+}
+
+
+def xml_sections(rulebase: str = None) -> dict:
+    # rulebase: None on a firewall, "pre"/"post" on Panorama (relative to the device group / shared xpath)
+    if rulebase is None:
+        return XML_SECTIONS
+    return dict(XML_SECTIONS, policy=(f"{rulebase}-rulebase", "security", "rules"))
+
+
+def config_xml_entries(conf: dict) -> list:
+    # create_config() output -> [(kind, <entry/>), ...] in dependency order, duplicates removed
+    entries = []
+    seen = set()
+    for service in conf["services"]:
+        if ("service", service["name"]) not in seen:
+            seen.add(("service", service["name"]))
+            entries.append(("service", service_xml(service["name"], service["protocol"], service["port"])))
+    for addr_group in conf["addr_groups"]:
+        members = []
+        for addr_object in addr_group["objects"]:
+            for addr_obj_name, addr_obj_value in addr_object.items():
+                members.append(addr_obj_name)
+                if ("address", addr_obj_name) not in seen:
+                    seen.add(("address", addr_obj_name))
+                    entries.append(("address", address_xml(addr_obj_name, addr_obj_value)))
+        entries.append(("group", address_group_xml(addr_group["name"], members)))
+    for policy in conf["policies"]:
+        services = [s["name"] if isinstance(s, dict) else s for s in policy["service"]]
+        entries.append(("policy", sec_policy_xml(policy["name"], policy["src_zone"], policy["src_addr"],
+                                                 policy["dst_zone"], policy["dst_addr"], policy["app"],
+                                                 services, policy["action"], policy["description"] or "")))
+    return entries
+
+
+def render_xml_chunk(entries: list, paths: dict = XML_SECTIONS) -> str:
+    # [(kind, <entry/>), ...] -> "<service>...</service><address>...</address>..." for one "set" call
+    sections = {}
+    for kind, entry in entries:
+        sections.setdefault(kind, []).append(entry)
+    element = ""
+    for kind in paths:
+        if kind not in sections:
+            continue
+        path = paths[kind]
+        root = ET.Element(path[0])
+        parent = root
+        for tag in path[1:]:
+            parent = ET.SubElement(parent, tag)
+        parent.extend(sections[kind])
+        element += ET.tostring(root, encoding="unicode")
+    return element
+
+
+def xml_to_entry(element: ET.Element) -> dict:
+    # XML API <entry name="x">...</entry> -> REST API {"@name": "x", ...}
+    entry = {"@name": element.get("name")} if element.get("name") is not None else {}
+    for child in element:
+        members = child.findall("member")
+        if members:
+            entry[child.tag] = {"member": [member.text for member in members]}
+        elif len(child):
+            entry[child.tag] = xml_to_entry(child)
+        else:
+            entry[child.tag] = child.text if child.text is not None else {}
+    return entry
+
+
+def entry_to_xml(entry: dict, tag: str = "entry") -> ET.Element:
+    # REST API {"@name": "x", ...} -> XML API <entry name="x">...</entry>
+    element = ET.Element(tag)
+    for key, value in entry.items():
+        if key.startswith("@"):
+            element.set(key[1:], str(value))
+        elif isinstance(value, dict) and list(value) == ["member"]:
+            child = ET.SubElement(element, key)
+            for member in value["member"]:
+                ET.SubElement(child, "member").text = str(member)
+        elif isinstance(value, dict):
+            element.append(entry_to_xml(value, key))
+        else:
+            ET.SubElement(element, key).text = "" if value is None else str(value)
+    return element
+
+
+class PaClient:
+    # One keep-alive requests.Session per firewall: every call made through the client
+    # reuses the pooled TCP/TLS connections instead of opening a new one per object.
+    # pool_maxsize should be >= number of threads sharing the client.
+    # Every call goes through the firewall's pa_request.RequestLayer (retries, adaptive rate limit).
+    # location_type "device-group"/"shared": pa_url is a Panorama, the objects and the pre/post rules are staged
+    # in the device group (or shared) config, commit() commits Panorama and push_and_wait() pushes to the firewalls.
+    def __init__(self, pa_url: str, api_key: str, vsys: str = "vsys1",
+                 pool_connections: int = 1, pool_maxsize: int = 10, verify: bool = False,
+                 request_layer: RequestLayer = None, location_type: str = "vsys",
+                 device_group: str = None, rulebase: str = "pre") -> None:
+        check_location(location_type, device_group, rulebase)
+        self.pa_url = pa_url
+        self.api_key = api_key
+        self.vsys = vsys
+        self.location_type = location_type
+        self.device_group = device_group
+        self.rulebase = rulebase
+        self.verify = verify
+        self.headers = {
+            "X-PAN-KEY": api_key,
+            "Content-Type": "application/json"
+        }
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.requests = request_layer or get_request_layer(pa_url)
+        # upsert_*: per API, how many objects were found existing / missing so far
+        self.upsert_stats = {}
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "PaClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def panorama(self) -> bool:
+        return self.location_type != "vsys"
+
+    @property
+    def scope(self) -> str:
+        # config the client works on, part of the snapshot and state file keys: "vsys1", "device-group:DG:pre"
+        if not self.panorama:
+            return self.vsys
+        return ":".join(part for part in (self.location_type, self.device_group, self.rulebase) if part)
+
+    @property
+    def policy_api(self) -> str:
+        if self.panorama:
+            return f"/Policies/Security{self.rulebase.capitalize()}Rules"
+        return "/Policies/SecurityRules"
+
+    @property
+    def config_xpath(self) -> str:
+        return location_xpath(self.location_type, self.device_group if self.panorama else self.vsys)
+
+    @property
+    def xml_sections(self) -> dict:
+        return xml_sections(self.rulebase if self.panorama else None)
+
+    def location(self, name: str = None, **extra) -> dict:
+        location = {}
+        if name is not None:
+            location["name"] = name
+        location.update(extra)
+        location["location"] = self.location_type
+        if self.location_type == "vsys":
+            location["vsys"] = self.vsys
+        elif self.location_type == "device-group":
+            location["device-group"] = self.device_group
+        return location
+
+    def _send(self, method: str, api: str, params: dict = None, payload: dict = None,
+              form: dict = None, idempotent: bool = None, once: bool = False) -> requests.Response:
+        # payload: REST API JSON body, form: XML API form-encoded body
+        # idempotent: retry on 5xx/connection errors, default: by HTTP method (the XML API reads are POSTs)
+        # once: commits, only retried when the request was not sent (a retry could enqueue a second job)
+        if form is not None:
+            headers = {"X-PAN-KEY": self.api_key}
+            data = form
+            size = len(urlencode(form))
+        else:
+            headers = self.headers
+            data = json.dumps(payload) if payload is not None else None
+            size = len(data.encode()) if data else 0
+        return self.requests.send(lambda: self.session.request(
+            method=method,
+            url=self.pa_url + api,
+            headers=headers,
+            params=params,
+            data=data,
+            verify=self.verify
+        ), method, idempotent, (requests.ConnectionError, requests.Timeout),
+            operation_name(method, api, form), size, once=once, not_sent=request_not_sent)
+
+    @staticmethod
+    def _check(response: requests.Response, success_msg: str, fail_msg: str, log_text: bool = True) -> bool:
+        if response.status_code == 200:
+            logger.info(success_msg)
+            if log_text:
+                logger.info(response.text)
+            return True
+        else:
+            logger.info(f"{fail_msg}: {response.status_code}")
+            logger.info(response.text)
+            return False
+
+    def _commit(self, desc: str = "") -> requests.Response:
+        logger.info("Commit the changes...")
+        if self.panorama:
+            # Panorama candidate config, XML API commit (the firewalls get it with push_and_wait())
+            commit_cmd = ET.Element("commit")
+            ET.SubElement(commit_cmd, "description").text = desc
+            return self._send("POST", XML_API, form={"type": "commit", "cmd": ET.tostring(commit_cmd, encoding="unicode")},
+                              once=True)
+        payload = {
+            "entry": {
+                "description": desc,
+                "force": {
+                    "partial": None
+                }
+            }
+        }
+        return self._send("POST", REST_API + "/System/Configuration:commit", payload=payload, once=True)
+
+    @staticmethod
+    def _check_job(response: requests.Response, success_msg: str, fail_msg: str) -> bool:
+        # REST API commit: HTTP status; XML API commit/commit-all: HTTP 200 with <response status="error">
+        if response.status_code == 200 and xml_status(response.text) == "error":
+            logger.info(f"{fail_msg}: {response.status_code}")
+            logger.info(response.text)
+            return False
+        return PaClient._check(response, success_msg, fail_msg)
+
+    def commit(self, desc: str = "") -> bool:
+        return self._check_job(self._commit(desc), "PA config changes successfully commited.",
+                               "Failed to commit the changes")
+
+    def commit_job(self, desc: str = "") -> str:
+        # returns the commit job id, "" if there was nothing to commit, None if the commit was refused
+        response = self._commit(desc)
+        if not self._check_job(response, "PA config commit successfully enqueued.", "Failed to commit the changes"):
+            return None
+        job_id = commit_job_id(response.text)
+        if job_id is None:
+            logger.info("No commit job was enqueued.")
+            return ""
+        return job_id
+
+    def xml_op(self, cmd: str) -> ET.Element:
+        # XML API operational command, returns the <response> element (None on HTTP/XML error)
+        response = self._send("POST", XML_API, form={"type": "op", "cmd": cmd}, idempotent=cmd.startswith("<show>"))
+        if response.status_code == 200 and xml_status(response.text) == "success":
+            return ET.fromstring(response.text)
+        logger.info(f"Failed to run the operational command: {response.status_code}")
         logger.info(response.text)
         return None
-    else:
-        logger.info(f"Failed to commit the changes: {response.status_code}")
+
+    def job_status(self, job_id: str) -> dict:
+        # {"id", "type", "status": "PEND|ACT|FIN", "result": "PEND|OK|FAIL", "progress", "details"}
+        root = self.xml_op(f"<show><jobs><id>{job_id}</id></jobs></show>")
+        jobs = parse_jobs(root)
+        return jobs[0] if jobs else None
+
+    def pending_jobs(self) -> list:
+        return [job for job in parse_jobs(self.xml_op("<show><jobs><pending></pending></jobs></show>"))
+                if job["status"] != "FIN"]
+
+    def config_version(self) -> str:
+        # id of the last finished commit job, changes whenever the running config changes (None if unknown)
+        commits = [int(job["id"]) for job in parse_jobs(self.xml_op("<show><jobs><all></all></jobs></show>"))
+                   if "commit" in job["type"].lower() and job["status"] == "FIN"]
+        return str(max(commits)) if commits else None
+
+    def wait_for_job(self, job_id: str, timeout: float = 600, interval: float = 1,
+                     max_interval: float = 15) -> dict:
+        # poll with exponential backoff until the job is finished or the timeout expires
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.job_status(job_id)
+            if job is not None and job["status"] == "FIN":
+                logger.info(f"Job {job_id} finished: {job['result']}")
+                return job
+            if job is not None:
+                logger.info(f"Job {job_id}: {job['status']} {job['progress']}%")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.info(f"Job {job_id} did not finish within {timeout}s.")
+                return {"id": job_id, "status": "TIMEOUT", "result": "TIMEOUT",
+                        "progress": job["progress"] if job else "", "details": []}
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+
+    def commit_and_wait(self, desc: str = "", timeout: float = 600) -> dict:
+        return self.wait_commit(self.commit_job(desc), timeout)
+
+    def wait_commit(self, job_id: str, timeout: float = 600) -> dict:
+        # commit_job() result -> final job status
+        if not job_id:
+            return {"id": job_id, "status": "FIN", "result": "FAIL" if job_id is None else "OK",
+                    "progress": "", "details": [], "devices": []}
+        return self.wait_for_job(job_id, timeout)
+
+    def push_jobs(self, device_groups: list = (), template_stacks: list = (), desc: str = "") -> list:
+        # Panorama commit-all of the committed config to the managed firewalls -> [job id or None if refused]
+        job_ids = []
+        for cmd in commit_all_cmds(device_groups, template_stacks, desc):
+            logger.info(f"Push {cmd}...")
+            response = self._send("POST", XML_API, form={"type": "commit", "action": "all", "cmd": cmd}, once=True)
+            if self._check_job(response, "Panorama push successfully enqueued.", "Failed to push the config"):
+                job_ids.append(commit_job_id(response.text) or "")
+            else:
+                job_ids.append(None)
+        return job_ids
+
+    def push_and_wait(self, device_groups: list = (), template_stacks: list = (), desc: str = "",
+                      timeout: float = 600) -> list:
+        # push_jobs(), then poll every job until it finishes -> final job statuses, with the per-firewall results
+        deadline = time.monotonic() + timeout
+        results = []
+        for job_id in self.push_jobs(device_groups, template_stacks, desc):
+            job = self.wait_commit(job_id, max(deadline - time.monotonic(), 0))
+            for device in job.get("devices", []):
+                logger.info(f"Push job {job['id']}: {device['name']} ({device['serial']}) {device['status']} "
+                            f"{device['result']}")
+            results.append(job)
+        return results
+
+    def _upsert(self, api: str, name: str, payload: dict, what: str) -> bool:
+        # create or update in one call when the guess is right, two calls otherwise: the first try is
+        # the path that succeeded most often so far for this API (re-runs quickly switch to update first)
+        logger.info(f"Upsert {what}...")
+        stats = self.upsert_stats.setdefault(api, {"existing": 0, "missing": 0})
+        update_first = stats["existing"] > stats["missing"]
+        attempts = (("PUT", "updated", not_present), ("POST", "created", already_exists))
+        if not update_first:
+            attempts = attempts[::-1]
+        for attempt, (method, done, fallback) in enumerate(attempts):
+            response = self._send(method, REST_API + api, self.location(name), payload)
+            if response.status_code == 200:
+                stats["existing" if method == "PUT" else "missing"] += 1
+                logger.info(f"PA {what} successfully {done}.")
+                return True
+            if attempt == 0 and fallback(response.status_code, response.text):
+                continue
+            break
+        logger.info(f"Failed to upsert {what}: {response.status_code}")
         logger.info(response.text)
+        return False
+
+    def display_obj_services(self) -> dict:
+        logger.info("Display object services...")
+        response = self._send("GET", REST_API + "/Objects/Services", self.location())
+        if self._check(response, "PA object services successfully retrieved.",
+                       "Failed to retrieved PA object services data"):
+            return json.loads(response.text)  # convert json to dictionary
+
+    def create_obj_services(self, name: str, protocol: str, port: str, desc: str = "") -> bool:
+        logger.info("Create object service...")
+        response = self._send("POST", REST_API + "/Objects/Services", self.location(name),
+                              service_entry(name, protocol, port, desc))
+        return self._check(response, "PA object service successfully created.",
+                           "Failed to create object service")
+
+    def update_obj_services(self, name: str, protocol: str, port: str, desc: str = "") -> bool:
+        logger.info("Update object services...")
+        response = self._send("PUT", REST_API + "/Objects/Services", self.location(name),
+                              service_entry(name, protocol, port, desc))
+        return self._check(response, "PA object service successfully updated.",
+                           "Failed to update object serivice")
+
+    def upsert_obj_services(self, name: str, protocol: str, port: str, desc: str = "") -> bool:
+        return self._upsert("/Objects/Services", name, service_entry(name, protocol, port, desc), "object service")
+
+    def delete_obj_services(self, name: str) -> bool:
+        logger.info("Delete object service...")
+        response = self._send("DELETE", REST_API + "/Objects/Services", self.location(name))
+        return self._check(response, "PA object service successfully deleted.",
+                           "Failed to delete object service")
+
+    def rename_obj_services(self, name: str, new_name: str) -> bool:
+        logger.info("Rename object service...")
+        response = self._send("POST", REST_API + "/Objects/Services:rename",
+                              self.location(name, newname=new_name))
+        return self._check(response, "PA object service successfully renamed.",
+                           "Failed to rename object service")
+
+    def display_obj_addresses(self) -> dict:
+        logger.info("Display object addresses...")
+        response = self._send("GET", REST_API + "/Objects/Addresses", self.location())
+        if self._check(response, "PA object addresses successfully retrieved.",
+                       "Failed to retrieved PA object addresses data"):
+            return json.loads(response.text)  # convert json to dictionary
+
+    def create_obj_addresses(self, name: str, ip_add: str, desc: str = "") -> bool:
+        logger.info("Create object addresses...")
+        response = self._send("POST", REST_API + "/Objects/Addresses", self.location(name),
+                              address_entry(name, ip_add, desc))
+        return self._check(response, "PA object addresses successfully created.",
+                           "Failed to create object address")
+
+    def rename_obj_addresses(self, name: str, new_name: str) -> bool:
+        logger.info("Rename object addresses...")
+        response = self._send("POST", REST_API + "/Objects/Addresses:rename",
+                              self.location(name, newname=new_name))
+        return self._check(response, "PA object addresses successfully renamed.",
+                           "Failed to rename object address")
+
+    def update_obj_addresses(self, name: str, ip_add: str, desc: str = "") -> bool:
+        logger.info("Update object addresses...")
+        response = self._send("PUT", REST_API + "/Objects/Addresses", self.location(name),
+                              address_entry(name, ip_add, desc))
+        return self._check(response, "PA object addresses successfully updated.",
+                           "Failed to update object address")
+
+    def upsert_obj_addresses(self, name: str, ip_add: str, desc: str = "") -> bool:
+        return self._upsert("/Objects/Addresses", name, address_entry(name, ip_add, desc), "object address")
+
+    def delete_obj_addresses(self, name: str) -> bool:
+        logger.info("Delete object addresses...")
+        response = self._send("DELETE", REST_API + "/Objects/Addresses", self.location(name))
+        return self._check(response, "PA object addresses successfully deleted.",
+                           "Failed to delete object address")
+
+    def display_address_groups(self) -> dict:
+        logger.info("Display address groups...")
+        response = self._send("GET", REST_API + "/Objects/AddressGroups", self.location())
+        if self._check(response, "PA address groups successfully retrieved.",
+                       "Failed to retrieved PA address groups data"):
+            return json.loads(response.text)  # convert json to dictionary
+
+    def create_address_group(self, name: str, group: list, desc: str = "") -> bool:
+        logger.info("Create address group...")
+        response = self._send("POST", REST_API + "/Objects/AddressGroups", self.location(name),
+                              address_group_entry(name, group, desc))
+        return self._check(response, "PA address group successfully created.",
+                           "Failed to create address group")
+
+    def update_address_group(self, name: str, group: list, desc: str = "") -> bool:
+        logger.info("Update address group...")
+        response = self._send("PUT", REST_API + "/Objects/AddressGroups", self.location(name),
+                              address_group_entry(name, group, desc))
+        return self._check(response, "PA address group successfully updated.",
+                           "Failed to update address group")
+
+    def upsert_address_group(self, name: str, group: list, desc: str = "") -> bool:
+        # group: full member list, it replaces the members of an existing group
+        return self._upsert("/Objects/AddressGroups", name, address_group_entry(name, group, desc), "address group")
+
+    def delete_address_group(self, name: str) -> bool:
+        logger.info("Delete address group...")
+        response = self._send("DELETE", REST_API + "/Objects/AddressGroups", self.location(name))
+        return self._check(response, "PA address group successfully deleted.",
+                           "Failed to delete address group")
+
+    def rename_address_group(self, name: str, new_name: str) -> bool:
+        logger.info("Rename address group...")
+        response = self._send("POST", REST_API + "/Objects/AddressGroups:rename",
+                              self.location(name, newname=new_name))
+        return self._check(response, "PA address group successfully renamed.",
+                           "Failed to rename address group")
+
+    def display_sec_policies(self) -> dict:
+        logger.info("Display policies...")
+        response = self._send("GET", REST_API + self.policy_api, self.location())
+        if self._check(response, "PA policies data successfully retrieved.",
+                       "Failed to retrieved PA policies data", log_text=False):
+            return json.loads(response.text)  # convert json to dictionary
+
+    def create_sec_policy(self, name: str, src_zone: str, src_addr: str,
+                          dst_zone: str, dst_addr: str, app: str,
+                          service: list, action: str, desc: str = "") -> bool:
+        logger.info("Create security policy...")
+        response = self._send("POST", REST_API + self.policy_api, self.location(name),
+                              sec_policy_entry(name, src_zone, src_addr, dst_zone, dst_addr,
+                                               app, service, action, desc))
+        return self._check(response, "PA security policy successfully created.",
+                           "Failed to create security policy")
+
+    def update_sec_policy(self, name: str, src_zone: str, src_addr: str,
+                          dst_zone: str, dst_addr: str, app: str,
+                          service: list, action: str, desc: str = "") -> bool:
+        logger.info("Update security policy...")
+        response = self._send("PUT", REST_API + self.policy_api, self.location(name),
+                              sec_policy_entry(name, src_zone, src_addr, dst_zone, dst_addr,
+                                               app, service, action, desc))
+        return self._check(response, "PA security policy successfully updated.",
+                           "Failed to update security policy")
+
+    def upsert_sec_policy(self, name: str, src_zone: str, src_addr: str,
+                          dst_zone: str, dst_addr: str, app: str,
+                          service: list, action: str, desc: str = "") -> bool:
+        # an existing rule is updated in place, a new rule is appended to the rulebase
+        return self._upsert(self.policy_api, name,
+                            sec_policy_entry(name, src_zone, src_addr, dst_zone, dst_addr, app, service, action, desc),
+                            "security policy")
+
+    def delete_sec_policy(self, name: str) -> bool:
+        logger.info("Delete security policy...")
+        response = self._send("DELETE", REST_API + self.policy_api, self.location(name))
+        return self._check(response, "PA security policy successfully deleted.",
+                           "Failed to delete security policy")
+
+    def rename_security_policy(self, name: str, new_name: str) -> bool:
+        logger.info("Rename security policy...")
+        response = self._send("POST", REST_API + self.policy_api + ":rename",
+                              self.location(name, newname=new_name))
+        return self._check(response, "PA security policy successfully renamed.",
+                           "Failed to rename security policy")
+
+    def move_security_policy(self, name: str, from_where: str, to_where: str = "") -> bool:
+        logger.info("Move security policy...")
+        response = self._send("POST", REST_API + self.policy_api + ":move",
+                              self.location(name, where=from_where, dst=to_where))
+        return self._check(response, "PA security policy successfully moved.",
+                           "Failed to move security policy")
+
+    def iter_entries(self, kind: str, page_size: int = 0, chunk_size: int = 65536):
+        # Lazily yields the entries of one table ("service", "address", "group", "policy") in the
+        # REST API JSON format. The XML API answer is parsed incrementally while it is downloaded and
+        # every entry is dropped once yielded, so memory stays bounded whatever the table size.
+        # page_size > 0: one "get" per page of entries (xpath position() predicate) instead of one stream.
+        section = self.config_xpath + "/" + "/".join(self.xml_sections[kind])
+        container = self.xml_sections[kind][-1]
+        start = 1
+        while True:
+            xpath = section
+            if page_size:
+                xpath += f"/entry[position() >= {start} and position() < {start + page_size}]"
+            count = 0
+            for entry in self._stream_xml_entries(xpath, (container, "result"), chunk_size):
+                count += 1
+                yield entry
+            if not page_size or count < page_size:
+                return
+            start += page_size
+
+    def _stream_xml_entries(self, xpath: str, containers: tuple, chunk_size: int):
+        form = {"type": "config", "action": "get", "xpath": xpath}
+        response = self.requests.send(lambda: self.session.request(
+            method="POST",
+            url=self.pa_url + XML_API,
+            headers={"X-PAN-KEY": self.api_key},
+            data=form,
+            verify=self.verify,
+            stream=True
+        ), "POST", True, (requests.ConnectionError, requests.Timeout),
+            operation_name("POST", XML_API, form) + " (stream)", len(urlencode(form)), stream=True)
+        with response:
+            if response.status_code != 200:
+                logger.info(f"Failed to retrieve {xpath}: {response.status_code}")
+                logger.info(response.text)
+                return
+            parser = ET.XMLPullParser(events=("start", "end"))
+            stack = []
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    if event == "start":
+                        if element.tag == "response" and element.get("status") != "success":
+                            logger.info(f"Failed to retrieve {xpath}: {element.get('status')}")
+                        stack.append(element)
+                        continue
+                    stack.pop()
+                    if element.tag == "entry" and stack and stack[-1].tag in containers:
+                        yield xml_to_entry(element)
+                        stack[-1].remove(element)  # free the parsed entry
+
+    def iter_obj_services(self, page_size: int = 0):
+        return self.iter_entries("service", page_size)
+
+    def iter_obj_addresses(self, page_size: int = 0):
+        return self.iter_entries("address", page_size)
+
+    def iter_address_groups(self, page_size: int = 0):
+        return self.iter_entries("group", page_size)
+
+    def iter_sec_policies(self, page_size: int = 0):
+        return self.iter_entries("policy", page_size)
+
+    def _xml_config(self, action: str, xpath: str, element: str) -> bool:
+        # setting/editing the same element twice gives the same config: safe to retry
+        response = self._send("POST", XML_API, form={
+            "type": "config",
+            "action": action,
+            "xpath": xpath,
+            "element": element,
+        }, idempotent=True)
+        if response.status_code == 200 and xml_status(response.text) == "success":
+            return True
+        logger.info(f"Failed to {action} config: {response.status_code}")
+        logger.info(response.text)
+        return False
+
+    def xml_set(self, xpath: str, element: str) -> bool:
+        # XML API "set" merges the element into the candidate config under xpath (one management-plane write),
+        # the member lists of an existing entry become the union of the old and new members
+        return self._xml_config("set", xpath, element)
+
+    def xml_edit(self, xpath: str, element: str) -> bool:
+        # XML API "edit" replaces the element at xpath (an entry xpath: the whole entry)
+        return self._xml_config("edit", xpath, element)
+
+    def existing_entries(self) -> dict:
+        # {(kind, name): entry} of the services, addresses, groups and rules of the location
+        return {(kind, entry["@name"]): entry for kind in XML_SECTIONS for entry in self.iter_entries(kind)}
+
+    def bulk_push(self, conf: dict, chunk_size: int = 500) -> bool:
+        # New entries: len(entries) / chunk_size "set" calls. A "set" of an existing entry would keep its old
+        # members (rule source/destination/service, group static), so existing entries are replaced one
+        # by one with "edit", after the new ones (they may reference them); identical entries are skipped.
+        logger.info("Bulk push of the config...")
+        entries = config_xml_entries(conf)
+        existing = self.existing_entries()
+        new = [(kind, entry) for kind, entry in entries if (kind, entry.get("name")) not in existing]
+        ok = True
+        for start in range(0, len(new), chunk_size):
+            chunk = new[start:start + chunk_size]
+            logger.info(f"Bulk push new entries {start + 1}-{start + len(chunk)} of {len(new)}...")
+            ok = self.xml_set(self.config_xpath, render_xml_chunk(chunk, self.xml_sections)) and ok
+        replaced = [(kind, entry) for kind, entry in entries if (kind, entry.get("name")) in existing
+                    and existing[(kind, entry.get("name"))] != xml_to_entry(entry)]
+        if replaced:
+            logger.info(f"Bulk push: replacing {len(replaced)} existing entries...")
+        for kind, entry in replaced:
+            xpath = f"{self.config_xpath}/{'/'.join(self.xml_sections[kind])}/entry[@name='{entry.get('name')}']"
+            ok = self.xml_edit(xpath, ET.tostring(entry, encoding="unicode")) and ok
+        if ok:
+            logger.info("PA config successfully pushed.")
+        return ok
+
+
+# Free functions below keep the original (pa_url, api_key, ...) signatures used by the deploy scripts.
+# They share one PaClient (and its connection pool) per firewall URL and API key.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(pa_url: str, api_key: str) -> PaClient:
+    with _clients_lock:
+        client = _clients.get((pa_url, api_key))
+        if client is None:
+            client = PaClient(pa_url, api_key)
+            _clients[(pa_url, api_key)] = client
+        return client
+
+
+def commit(pa_url: str, api_key: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).commit(desc)
+
+
+def commit_and_wait(pa_url: str, api_key: str, desc: str = "", timeout: float = 600) -> dict:
+    return get_client(pa_url, api_key).commit_and_wait(desc, timeout)
 
 
 def get_api_key(pa_url: str, username: str, password: str) -> str:
@@ -77,7 +998,7 @@ def get_api_key(pa_url: str, username: str, password: str) -> str:
         "Content-Type": "application/x-www-form-urlencoded"
     }
     payload = {
-        "user": username, 
+        "user": username,
         "password": password
     }
 
@@ -126,904 +1047,116 @@ def get_api_key(pa_url: str, username: str, password: str) -> str:
 
 
 def display_obj_services(pa_url: str, api_key: str) -> dict:
-    api = "/restapi/v11.2/Objects/Services"
-    url = pa_url + api
-    logger.info("Display object services...")
-    headers = {
-        "X-PAN-KEY": api_key
-    }
+    return get_client(pa_url, api_key).display_obj_services()
 
-    location = {
-        "location": "vsys",
-        "vsys": "vsys1",
-    }
 
-    response = requests.get(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
+def create_obj_services(pa_url: str, api_key: str, name: str, protocol: str, port: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).create_obj_services(name, protocol, port, desc)
 
-    if response.status_code == 200:
-        logger.info("PA object services successfully retrieved.")
-        logger.info(response.text)
-        return json.loads(response.text)  # convert json to dictionary
-    else:
-        logger.info(f"Failed to retrieved PA object services data: {response.status_code}")
-        logger.info(response.text)
 
+def update_obj_services(pa_url: str, api_key: str, name: str, protocol: str, port: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).update_obj_services(name, protocol, port, desc)
 
-def create_obj_services(pa_url: str, api_key: str, name: str, protocol: str, port: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/Objects/Services"
-    url = pa_url + api
-    logger.info("Create object service...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
 
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
+def upsert_obj_services(pa_url: str, api_key: str, name: str, protocol: str, port: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).upsert_obj_services(name, protocol, port, desc)
 
-    payload = json.dumps({
-        "entry":
-           {
-                "@name": name,
-                "description": desc,
-                "protocol": {
-                    protocol: {
-                        "port": port,
-                        # "source-port": "0,1-65535",
-                        # "override": {
-                        #     "no": {}
-                        # }
-                    }
-                }
-                # "tag": {
-                #     "member": [
-                #         "some_tag"
-                #     ]
-                # }
-           }
-    })
 
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
+def delete_obj_services(pa_url: str, api_key: str, name: str) -> bool:
+    return get_client(pa_url, api_key).delete_obj_services(name)
 
-    if response.status_code == 200:
-        logger.info("PA object service successfully created.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to create object service: {response.status_code}")
-        logger.info(response.text)
 
+def rename_obj_services(pa_url: str, api_key: str, name: str, new_name: str) -> bool:
+    return get_client(pa_url, api_key).rename_obj_services(name, new_name)
 
-def update_obj_services(pa_url: str, api_key: str, name: str, protocol: str, port: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/Objects/Services"
-    url = pa_url + api
-    logger.info("Update object services...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
 
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
+def display_obj_addresses(pa_url: str, api_key: str) -> dict:
+    return get_client(pa_url, api_key).display_obj_addresses()
 
-    payload = json.dumps({
-        "entry":
-           {
-                "@name": name,
-                "description": desc,
-                "protocol": {
-                    protocol: {
-                        "port": port,
-                        # "source-port": "0,1-65535",
-                        # "override": {
-                        #     "no": {}
-                        # }
-                    }
-                }
-                # "tag": {
-                #     "member": [
-                #         "some_tag"
-                #     ]
-                # }
-           }
-    })
 
-    response = requests.put(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
+def create_obj_addresses(pa_url: str, api_key: str, name: str, ip_add: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).create_obj_addresses(name, ip_add, desc)
 
-    if response.status_code == 200:
-        logger.info("PA object service successfully updated.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to update object serivice: {response.status_code}")
-        logger.info(response.text)
 
+def rename_obj_addresses(pa_url: str, api_key: str, name: str, new_name: str) -> bool:
+    return get_client(pa_url, api_key).rename_obj_addresses(name, new_name)
 
-def delete_obj_services(pa_url: str, api_key: str, name: str) -> None:
-    api = "/restapi/v11.2/Objects/Services"
-    url = pa_url + api
-    logger.info("Delete object service...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
 
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
+def update_obj_addresses(pa_url: str, api_key: str, name: str, ip_add: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).update_obj_addresses(name, ip_add, desc)
 
-    response = requests.delete(
-        url=url,
-        headers=headers,
-        params=location,
-        # data=payload,
-        verify=False
-    )
 
-    if response.status_code == 200:
-        logger.info("PA object service successfully deleted.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to delete object service: {response.status_code}")
-        logger.info(response.text)
+def upsert_obj_addresses(pa_url: str, api_key: str, name: str, ip_add: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).upsert_obj_addresses(name, ip_add, desc)
 
 
-def rename_obj_services(pa_url: str, api_key: str, name: str, new_name: str) -> None:
-    api = "/restapi/v11.2/Objects/Services:rename"
-    url = pa_url + api
-    logger.info("Rename object service...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
+def delete_obj_addresses(pa_url: str, api_key: str, name: str) -> bool:
+    return get_client(pa_url, api_key).delete_obj_addresses(name)
 
-    location = {
-        "name": name,
-        "newname": new_name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
 
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
+def display_address_groups(pa_url: str, api_key: str) -> dict:
+    return get_client(pa_url, api_key).display_address_groups()
 
-    if response.status_code == 200:
-        logger.info("PA object service successfully renamed.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to rename object service: {response.status_code}")
-        logger.info(response.text)
 
+def create_address_group(pa_url: str, api_key: str, name: str, group: list, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).create_address_group(name, group, desc)
 
-def display_obj_addresses(pa_url: str, api_key: str) -> dict:
-    api = "/restapi/v11.2/Objects/Addresses"
-    url = pa_url + api
-    logger.info("Display object addresses...")
-    headers = {
-        "X-PAN-KEY": api_key
-    }
 
-    location = {
-        "location": "vsys",
-        "vsys": "vsys1",
-    }
+def update_address_group(pa_url: str, api_key: str, name: str, group: list, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).update_address_group(name, group, desc)
 
-    response = requests.get(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
 
-    if response.status_code == 200:
-        logger.info("PA object addresses successfully retrieved.")
-        logger.info(response.text)
-        return response.text
-    else:
-        logger.info(f"Failed to retrieved PA object addresses data: {response.status_code}")
-        logger.info(response.text)
+def upsert_address_group(pa_url: str, api_key: str, name: str, group: list, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).upsert_address_group(name, group, desc)
 
 
-def create_obj_addresses(pa_url: str, api_key: str, name: str, ip_add: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/Objects/Addresses"
-    url = pa_url + api
-    logger.info("Create object addresses...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
+def delete_address_group(pa_url: str, api_key: str, name: str) -> bool:
+    return get_client(pa_url, api_key).delete_address_group(name)
 
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
 
-    payload = json.dumps({
-        "entry":
-           {
-                "@name": name,
-                "ip-netmask": ip_add,
-                "description": desc,
-                # "tag": {
-                #     "member": [
-                #         "some_tag"
-                #     ]
-                # }
-           }
-    })
-
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA object addresses successfully created.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to create object address: {response.status_code}")
-        logger.info(response.text)
-
-
-def rename_obj_addresses(pa_url: str, api_key: str, name: str, new_name: str) -> None:
-    api = "/restapi/v11.2/Objects/Addresses:rename"
-    url = pa_url + api
-    logger.info("Rename object addresses...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "newname": new_name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA object addresses successfully renamed.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to rename object address: {response.status_code}")
-        logger.info(response.text)
-
-
-def update_obj_addresses(pa_url: str, api_key: str, name: str, ip_add: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/Objects/Addresses"
-    url = pa_url + api
-    logger.info("Update object addresses...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    payload = json.dumps({
-        "entry":
-           {
-                "@name": name,
-                "ip-netmask": ip_add,
-                "description": desc,
-           }
-    })
-
-    response = requests.put(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA object addresses successfully updated.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to update object address: {response.status_code}")
-        logger.info(response.text)
-
-
-def delete_obj_addresses(pa_url: str, api_key: str, name: str) -> None:
-    api = "/restapi/v11.2/Objects/Addresses"
-    url = pa_url + api
-    logger.info("Delete object addresses...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    response = requests.delete(
-        url=url,
-        headers=headers,
-        params=location,
-        # data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA object addresses successfully deleted.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to delete object address: {response.status_code}")
-        logger.info(response.text)
-
-
-def display_address_groups(pa_url: str, api_key: str) -> dict:
-    api = "/restapi/v11.2/Objects/AddressGroups"
-    url = pa_url + api
-    logger.info("Display address groups...")
-    headers = {
-        "X-PAN-KEY": api_key
-    }
-
-    location = {
-        "location": "vsys",
-        "vsys": "vsys1",
-    }
-
-    response = requests.get(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA address groups successfully retrieved.")
-        logger.info(response.text)
-        return response.text
-    else:
-        logger.info(f"Failed to retrieved PA address groups data: {response.status_code}")
-        logger.info(response.text)
-
-
-def create_address_group(pa_url: str, api_key: str, name: str, group: list, desc: str = "") -> None:
-    api = "/restapi/v11.2/Objects/AddressGroups"
-    url = pa_url + api
-    logger.info("Create address group...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    payload = json.dumps({
-        "entry":
-           {
-                "@name": name,
-                "static": {
-                    "member": group
-                },
-                "description": desc,
-                # "tag": {
-                #     "member": [
-                #         "some_tag"
-                #     ]
-                # }
-           }
-    })
-
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA address group successfully created.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to create address group: {response.status_code}")
-        logger.info(response.text)
-
-
-def update_address_group(pa_url: str, api_key: str, name: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/Objects/AddressGroups"
-    url = pa_url + api
-    logger.info("Update address group...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    payload = json.dumps({
-        "entry":
-           {
-                "@name": name,
-                "static": {
-                    "member": [
-                        "dns1",
-                        "dns2"
-                    ]
-                },
-                "description": desc,
-           }
-    })
-
-    response = requests.put(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA address group successfully updated.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to update address group: {response.status_code}")
-        logger.info(response.text)
-
-
-def delete_address_group(pa_url: str, api_key: str, name: str) -> None:
-    api = "/restapi/v11.2/Objects/AddressGroups"
-    url = pa_url + api
-    logger.info("Delete address group...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    response = requests.delete(
-        url=url,
-        headers=headers,
-        params=location,
-        # data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA address group successfully deleted.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to delete address group: {response.status_code}")
-        logger.info(response.text)
-
-
-def rename_address_group(pa_url: str, api_key: str, name: str, new_name: str) -> None:
-    api = "/restapi/v11.2/Objects/AddressGroups:rename"
-    url = pa_url + api
-    logger.info("Rename address group...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "newname": new_name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA address group successfully renamed.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to rename address group: {response.status_code}")
-        logger.info(response.text)
+def rename_address_group(pa_url: str, api_key: str, name: str, new_name: str) -> bool:
+    return get_client(pa_url, api_key).rename_address_group(name, new_name)
 
 
 def display_sec_policies(pa_url: str, api_key: str) -> dict:
-    api = "/restapi/v11.2/Policies/SecurityRules"
-    url = pa_url + api
-    logger.info("Display policies...")
-    headers = {
-        "X-PAN-KEY": api_key
-    }
+    return get_client(pa_url, api_key).display_sec_policies()
 
-    location = {
-        "location": "vsys",
-        "vsys": "vsys1",
-    }
 
-    response = requests.get(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA policies data successfully retrieved.")
-        # logger.info(response.text)
-        return json.loads(response.text)  # convert json to dictionary
-    else:
-        logger.info(f"Failed to retrieved PA policies data: {response.status_code}")
-        logger.info(response.text)
-
-
-def create_sec_policy(pa_url: str, api_key: str, name: str, src_zone: str, src_addr: str,  
-                      dst_zone: str, dst_addr: str, app: str, 
-                      service: list, action: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/Policies/SecurityRules"
-    url = pa_url + api
-    logger.info("Create security policy...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    payload = json.dumps({
-        "entry":
-        {
-            "@name": name,
-            "from": {  # source zone
-                "member": [
-                    src_zone
-                ]
-            },
-            "to": {  # destination zone
-                "member": [
-                    dst_zone
-                ]
-            },
-            "source": {
-                "member": [
-                    src_addr
-                ]
-            },
-            "destination": {
-                "member": [
-                    dst_addr
-                ]
-            },
-            "application": {
-                "member": [
-                    app
-                ]
-            },
-            "service": {
-                "member": service
-            },
-            "action": action,
-            "description": desc
-            # "source-user": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "category": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "source-imsi": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "source-imei": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "source-nw-slice": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "source-hip": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "destination-hip": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "saas-user-list": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "saas-tenant-list": {
-            #     "member": [
-            #         "any"
-            #     ]
-            # },
-            # "negate-source": "no",
-            # "negate-destination": "no",
-            # "disabled": "no",
-            # "tag": {
-            #     "member": [
-            #         "string"
-            #     ]
-            # },
-            # "group-tag": "string",
-            # "schedule": "string",
-            # "icmp-unreachable": "no",
-            # "disable-inspect": "no",
-            # "rule-type": "universal",
-            # "option": {
-            #     "disable-server-response-inspection": "no"
-            # },
-            # "profile-setting": {},
-            # "qos": {},
-            # "log-setting": "string",
-            # "log-start": "no",
-            # "log-end": "yes",
-        }
-    })
-
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA security policy successfully created.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to create security policy: {response.status_code}")
-        logger.info(response.text)
-
-
-def update_sec_policy(pa_url: str, api_key: str, name: str, src_zone: str, src_addr: str,  
-                      dst_zone: str, dst_addr: str, app: str, 
-                      service: list, action: str, desc: str = "") -> None:
-    api = "/restapi/v11.2/Policies/SecurityRules"
-    url = pa_url + api
-    logger.info("Update security policy...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
-
-    payload = json.dumps({
-        "entry": 
-        {
-            "@name": name,
-            "from": {  # source zone
-                "member": [
-                    src_zone
-                ]
-            },
-            "to": {  # destination zone
-                "member": [
-                    dst_zone
-                ]
-            },
-            "source": {
-                "member": [
-                    src_addr
-                ]
-            },
-            "destination": {
-                "member": [
-                    dst_addr
-                ]
-            },
-            "application": {
-                "member": [
-                    app
-                ]
-            },
-            "service": {
-                "member": service  # list
-            },
-            "action": action,
-            "description": desc
-        }
-    })
-
-    response = requests.put(
-        url=url,
-        headers=headers,
-        params=location,
-        data=payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA security policy successfully updated.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to update security policy: {response.status_code}")
-        logger.info(response.text)
+def create_sec_policy(pa_url: str, api_key: str, name: str, src_zone: str, src_addr: str,
+                      dst_zone: str, dst_addr: str, app: str,
+                      service: list, action: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).create_sec_policy(name, src_zone, src_addr, dst_zone, dst_addr,
+                                                         app, service, action, desc)
 
 
-def delete_sec_policy(pa_url: str, api_key: str, name: str) -> None:
-    api = "/restapi/v11.2/Policies/SecurityRules"
-    url = pa_url + api
-    logger.info("Delete security policy...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
+def update_sec_policy(pa_url: str, api_key: str, name: str, src_zone: str, src_addr: str,
+                      dst_zone: str, dst_addr: str, app: str,
+                      service: list, action: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).update_sec_policy(name, src_zone, src_addr, dst_zone, dst_addr,
+                                                         app, service, action, desc)
 
-    location = {
-        "name": name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
 
-    response = requests.delete(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logger.info("PA security policy successfully deleted.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to delete security policy: {response.status_code}")
-        logger.info(response.text)
-
-
-def rename_security_policy(pa_url: str, api_key: str, name: str, new_name: str) -> None:
-    api = "/restapi/v11.2/Policies/SecurityRules:rename"
-    url = pa_url + api
-    logger.info("Rename security policy...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
+def upsert_sec_policy(pa_url: str, api_key: str, name: str, src_zone: str, src_addr: str,
+                      dst_zone: str, dst_addr: str, app: str,
+                      service: list, action: str, desc: str = "") -> bool:
+    return get_client(pa_url, api_key).upsert_sec_policy(name, src_zone, src_addr, dst_zone, dst_addr,
+                                                         app, service, action, desc)
 
-    location = {
-        "name": name,
-        "newname": new_name,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
 
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
+def delete_sec_policy(pa_url: str, api_key: str, name: str) -> bool:
+    return get_client(pa_url, api_key).delete_sec_policy(name)
 
-    if response.status_code == 200:
-        logger.info("PA security policy successfully renamed.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to rename security policy: {response.status_code}")
-        logger.info(response.text)
 
+def rename_security_policy(pa_url: str, api_key: str, name: str, new_name: str) -> bool:
+    return get_client(pa_url, api_key).rename_security_policy(name, new_name)
 
-def move_security_policy(pa_url: str, api_key: str, name: str, from_where: str, to_where: str = "") -> None:
-    api = "/restapi/v11.2/Policies/SecurityRules:move"
-    url = pa_url + api
-    logger.info("Move security policy...")
-    headers = {
-        "X-PAN-KEY": api_key,
-        "Content-Type": "application/json"
-    }
 
-    location = {
-        "name": name,
-        "where": from_where,
-        "dst": to_where,
-        "location": "vsys",
-        "vsys": "vsys1"
-    }
+def move_security_policy(pa_url: str, api_key: str, name: str, from_where: str, to_where: str = "") -> bool:
+    return get_client(pa_url, api_key).move_security_policy(name, from_where, to_where)
 
-    response = requests.post(
-        url=url,
-        headers=headers,
-        params=location,
-        verify=False
-    )
 
-    if response.status_code == 200:
-        logger.info("PA security policy successfully moved.")
-        logger.info(response.text)
-        return None
-    else:
-        logger.info(f"Failed to move security policy: {response.status_code}")
-        logger.info(response.text)
+def bulk_push(pa_url: str, api_key: str, conf: dict, chunk_size: int = 500) -> bool:
+    return get_client(pa_url, api_key).bulk_push(conf, chunk_size)
 
 
 def main() -> None:
@@ -1044,23 +1177,23 @@ def main() -> None:
 
     display_address_groups(api_url, pa_api_key)
     # create_address_group(api_url, pa_api_key, "Servers", ["server1", "server2"], "some servers")
-    # update_address_group(api_url, pa_api_key, "DNS_servers", "updated description")
+    # update_address_group(api_url, pa_api_key, "DNS_servers", ["dns1", "dns2"], "updated description")
     # delete_address_group(api_url, pa_api_key, "DNS_servers2")
     # rename_address_group(api_url, pa_api_key, "DNS_servers", "All_DNS_servers")
 
     display_sec_policies(api_url, pa_api_key)
     # For custom services: application: "any", service: "custom_service_port"
-    # create_sec_policy(api_url, pa_api_key, "CUST-A-app-99-man", "WAN_zone", "Users", 
-    #                   "DC_zone", "Other_apps", "any", ["tcp_7700", "tcp_7701", "tcp_7702"], 
+    # create_sec_policy(api_url, pa_api_key, "CUST-A-app-99-man", "WAN_zone", "Users",
+    #                   "DC_zone", "Other_apps", "any", ["tcp_7700", "tcp_7701", "tcp_7702"],
     #                   "allow", "APP manual")
-    # update_sec_policy(api_url, pa_api_key, "Allow_all_7", "WAN_zone", "DC_zone", 
-    #                   "Servers", "All_DNS_servers", "icmp", "application-default", 
+    # update_sec_policy(api_url, pa_api_key, "Allow_all_7", "WAN_zone", "DC_zone",
+    #                   "Servers", "All_DNS_servers", "icmp", "application-default",
     #                   "allow", "Allow all traffic rule 7")
     # delete_sec_policy(api_url, pa_api_key, "Allow_all_traffic4")
     # rename_security_policy(api_url, pa_api_key, "Allow_all_zones5", "Allow_all_5")
-    # possible values for from_where: top, bottom, above, below
+    # possible values for from_where: top, bottom, before, after
     # move_security_policy(api_url, pa_api_key, "Allow_all_7", "bottom")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
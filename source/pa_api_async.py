@@ -0,0 +1,321 @@
+import asyncio
+import json
+import logging
+import urllib.parse
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+import aiohttp
+from pa_request import RequestLayer, get_request_layer
+from pa_api import (PaClient, REST_API, XML_API, operation_name, service_entry, address_entry, check_location,
+                    address_group_entry, sec_policy_entry, already_exists, not_present, xml_status)
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+
+# Asyncio variant of the pa_api.py surface.
+# One event loop can drive thousands of calls (and several firewalls) without a thread per request,
+# the number of in-flight calls per firewall is bounded by a semaphore.
+#
+# async with AsyncPaClient(url, key, max_concurrency=32) as client:
+#     results = await asyncio.gather(*(client.create_obj_addresses(n, ip) for n, ip in objects))
+#
+# pa_deploy_policies.py --async deploys the sheet with deploy_config().
+
+
+def request_not_sent(err: Exception) -> bool:
+    # connection refused/unreachable: the request never reached the firewall, even a commit can be retried
+    return isinstance(err, aiohttp.ClientConnectorError)
+
+
+@dataclass
+class PaResult:
+    operation: str
+    name: str
+    ok: bool
+    status: int
+    data: dict = None
+    text: str = ""
+
+
+class AsyncPaClient:
+    def __init__(self, pa_url: str, api_key: str, vsys: str = "vsys1",
+                 max_concurrency: int = 16, verify: bool = False, request_layer: RequestLayer = None,
+                 location_type: str = "vsys", device_group: str = None, rulebase: str = "pre") -> None:
+        check_location(location_type, device_group, rulebase)
+        self.pa_url = pa_url
+        self.api_key = api_key
+        self.vsys = vsys
+        self.location_type = location_type
+        self.device_group = device_group
+        self.rulebase = rulebase
+        self.verify = verify
+        self.max_concurrency = max_concurrency
+        self.headers = {
+            "X-PAN-KEY": api_key,
+            "Content-Type": "application/json"
+        }
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+        # shared with the blocking clients of the same firewall (retries, adaptive rate limit)
+        self.requests = request_layer or get_request_layer(pa_url)
+        # upsert_*: per API, how many objects were found existing / missing so far
+        self.upsert_stats = {}
+
+    # same query parameters and policy API (firewall vsys, Panorama device group/shared) as the blocking client
+    location = PaClient.location
+    panorama = PaClient.panorama
+    policy_api = PaClient.policy_api
+
+    async def open(self) -> None:
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, ssl=self.verify)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> "AsyncPaClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _send(self, operation: str, name: str, method: str, api: str, params: dict = None,
+                    payload: dict = None, log_failure: bool = True, form: dict = None, once: bool = False) -> PaResult:
+        # form: XML API call (urlencoded body); once: not retried after the firewall may have received it (commit)
+        await self.open()
+        data = json.dumps(payload) if payload is not None else None
+        headers = None
+        if form is not None:
+            data = urllib.parse.urlencode(form)
+            headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+        async def attempt():
+            async with self.session.request(
+                method,
+                self.pa_url + api,
+                params=params,
+                data=data,
+                headers=headers,
+            ) as response:
+                return response.status, await response.text(), response.headers
+
+        async with self.semaphore:
+            try:
+                status, text, _ = await self.requests.send_async(
+                    attempt, method, errors=(aiohttp.ClientError, asyncio.TimeoutError),
+                    operation=operation_name(method, api), request_bytes=len(data.encode()) if data else 0,
+                    once=once, not_sent=request_not_sent)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                logger.info(f"{operation} {name}: {err!r}")
+                return PaResult(operation, name, False, 0, text=str(err))
+
+        # XML API: HTTP 200 with <response status="error">
+        result = PaResult(operation, name, status == 200 and (form is None or xml_status(text) != "error"), status, text=text)
+        if result.ok:
+            try:
+                result.data = json.loads(text)
+            except ValueError:
+                pass
+        elif log_failure:
+            logger.info(f"Failed to {operation} {name}: {status}")
+            logger.info(text)
+        return result
+
+    async def _upsert(self, what: str, name: str, api: str, payload: dict) -> PaResult:
+        # same strategy as PaClient._upsert: the path that succeeded most often first, the other one on
+        # "already exists" / "not present"
+        stats = self.upsert_stats.setdefault(api, {"existing": 0, "missing": 0})
+        attempts = [("PUT", not_present), ("POST", already_exists)]
+        if stats["existing"] <= stats["missing"]:
+            attempts.reverse()
+        (method, fallback), (retry_method, _) = attempts
+        result = await self._send(f"upsert {what}", name, method, REST_API + api, self.location(name), payload,
+                                  log_failure=False)
+        if not result.ok and fallback(result.status, result.text):
+            method = retry_method
+            result = await self._send(f"upsert {what}", name, method, REST_API + api, self.location(name), payload,
+                                      log_failure=False)
+        if result.ok:
+            stats["existing" if method == "PUT" else "missing"] += 1
+        else:
+            logger.info(f"Failed to upsert {what} {name}: {result.status}")
+            logger.info(result.text)
+        return result
+
+    async def commit(self, desc: str = "") -> PaResult:
+        if self.panorama:
+            # Panorama candidate config, XML API commit like PaClient.commit (pushed with PaClient.push_and_wait())
+            commit_cmd = ET.Element("commit")
+            ET.SubElement(commit_cmd, "description").text = desc
+            return await self._send("commit", "", "POST", XML_API,
+                                    form={"type": "commit", "cmd": ET.tostring(commit_cmd, encoding="unicode")}, once=True)
+        payload = {
+            "entry": {
+                "description": desc,
+                "force": {
+                    "partial": None
+                }
+            }
+        }
+        return await self._send("commit", "", "POST", REST_API + "/System/Configuration:commit", payload=payload, once=True)
+
+    async def display_obj_services(self) -> PaResult:
+        return await self._send("display object services", "", "GET",
+                                REST_API + "/Objects/Services", self.location())
+
+    async def create_obj_services(self, name: str, protocol: str, port: str, desc: str = "") -> PaResult:
+        return await self._send("create object service", name, "POST", REST_API + "/Objects/Services",
+                                self.location(name), service_entry(name, protocol, port, desc))
+
+    async def update_obj_services(self, name: str, protocol: str, port: str, desc: str = "") -> PaResult:
+        return await self._send("update object service", name, "PUT", REST_API + "/Objects/Services",
+                                self.location(name), service_entry(name, protocol, port, desc))
+
+    async def upsert_obj_services(self, name: str, protocol: str, port: str, desc: str = "") -> PaResult:
+        return await self._upsert("object service", name, "/Objects/Services", service_entry(name, protocol, port, desc))
+
+    async def delete_obj_services(self, name: str) -> PaResult:
+        return await self._send("delete object service", name, "DELETE", REST_API + "/Objects/Services",
+                                self.location(name))
+
+    async def rename_obj_services(self, name: str, new_name: str) -> PaResult:
+        return await self._send("rename object service", name, "POST", REST_API + "/Objects/Services:rename",
+                                self.location(name, newname=new_name))
+
+    async def display_obj_addresses(self) -> PaResult:
+        return await self._send("display object addresses", "", "GET",
+                                REST_API + "/Objects/Addresses", self.location())
+
+    async def create_obj_addresses(self, name: str, ip_add: str, desc: str = "") -> PaResult:
+        return await self._send("create object address", name, "POST", REST_API + "/Objects/Addresses",
+                                self.location(name), address_entry(name, ip_add, desc))
+
+    async def update_obj_addresses(self, name: str, ip_add: str, desc: str = "") -> PaResult:
+        return await self._send("update object address", name, "PUT", REST_API + "/Objects/Addresses",
+                                self.location(name), address_entry(name, ip_add, desc))
+
+    async def upsert_obj_addresses(self, name: str, ip_add: str, desc: str = "") -> PaResult:
+        return await self._upsert("object address", name, "/Objects/Addresses", address_entry(name, ip_add, desc))
+
+    async def delete_obj_addresses(self, name: str) -> PaResult:
+        return await self._send("delete object address", name, "DELETE", REST_API + "/Objects/Addresses",
+                                self.location(name))
+
+    async def rename_obj_addresses(self, name: str, new_name: str) -> PaResult:
+        return await self._send("rename object address", name, "POST", REST_API + "/Objects/Addresses:rename",
+                                self.location(name, newname=new_name))
+
+    async def display_address_groups(self) -> PaResult:
+        return await self._send("display address groups", "", "GET",
+                                REST_API + "/Objects/AddressGroups", self.location())
+
+    async def create_address_group(self, name: str, group: list, desc: str = "") -> PaResult:
+        return await self._send("create address group", name, "POST", REST_API + "/Objects/AddressGroups",
+                                self.location(name), address_group_entry(name, group, desc))
+
+    async def update_address_group(self, name: str, group: list, desc: str = "") -> PaResult:
+        return await self._send("update address group", name, "PUT", REST_API + "/Objects/AddressGroups",
+                                self.location(name), address_group_entry(name, group, desc))
+
+    async def upsert_address_group(self, name: str, group: list, desc: str = "") -> PaResult:
+        return await self._upsert("address group", name, "/Objects/AddressGroups", address_group_entry(name, group, desc))
+
+    async def delete_address_group(self, name: str) -> PaResult:
+        return await self._send("delete address group", name, "DELETE", REST_API + "/Objects/AddressGroups",
+                                self.location(name))
+
+    async def rename_address_group(self, name: str, new_name: str) -> PaResult:
+        return await self._send("rename address group", name, "POST", REST_API + "/Objects/AddressGroups:rename",
+                                self.location(name, newname=new_name))
+
+    async def display_sec_policies(self) -> PaResult:
+        return await self._send("display policies", "", "GET",
+                                REST_API + self.policy_api, self.location())
+
+    async def create_sec_policy(self, name: str, src_zone: str, src_addr: str,
+                                dst_zone: str, dst_addr: str, app: str,
+                                service: list, action: str, desc: str = "") -> PaResult:
+        return await self._send("create security policy", name, "POST", REST_API + self.policy_api,
+                                self.location(name),
+                                sec_policy_entry(name, src_zone, src_addr, dst_zone, dst_addr,
+                                                 app, service, action, desc))
+
+    async def update_sec_policy(self, name: str, src_zone: str, src_addr: str,
+                                dst_zone: str, dst_addr: str, app: str,
+                                service: list, action: str, desc: str = "") -> PaResult:
+        return await self._send("update security policy", name, "PUT", REST_API + self.policy_api,
+                                self.location(name),
+                                sec_policy_entry(name, src_zone, src_addr, dst_zone, dst_addr,
+                                                 app, service, action, desc))
+
+    async def upsert_sec_policy(self, name: str, src_zone: str, src_addr: str,
+                                dst_zone: str, dst_addr: str, app: str,
+                                service: list, action: str, desc: str = "") -> PaResult:
+        return await self._upsert("security policy", name, self.policy_api,
+                                  sec_policy_entry(name, src_zone, src_addr, dst_zone, dst_addr,
+                                                   app, service, action, desc))
+
+    async def delete_sec_policy(self, name: str) -> PaResult:
+        return await self._send("delete security policy", name, "DELETE", REST_API + self.policy_api,
+                                self.location(name))
+
+    async def rename_security_policy(self, name: str, new_name: str) -> PaResult:
+        return await self._send("rename security policy", name, "POST", REST_API + self.policy_api + ":rename",
+                                self.location(name, newname=new_name))
+
+    async def move_security_policy(self, name: str, from_where: str, to_where: str = "") -> PaResult:
+        return await self._send("move security policy", name, "POST", REST_API + self.policy_api + ":move",
+                                self.location(name, where=from_where, dst=to_where))
+
+
+async def deploy_config(client: AsyncPaClient, conf: dict, commit_desc: str = None, mode: str = "upsert",
+                        existing_addresses: set = frozenset()) -> list:
+    # create_config() output -> services/addresses concurrently, then groups, then policies in sheet order;
+    # mode "upsert": a re-run updates what already exists, "create": existing items fail;
+    # existing_addresses (--reuse-addresses) are referenced, not written
+    def write(kind: str):
+        return getattr(client, f"{mode}_{kind}")
+
+    seen = {("address", name) for name in existing_addresses}
+    objects = []
+    for service in conf["services"]:
+        if ("service", service["name"]) not in seen:
+            seen.add(("service", service["name"]))
+            objects.append(write("obj_services")(service["name"], service["protocol"], service["port"]))
+    for addr_group in conf["addr_groups"]:
+        for addr_object in addr_group["objects"]:
+            for addr_obj_name, addr_obj_value in addr_object.items():
+                if ("address", addr_obj_name) not in seen:
+                    seen.add(("address", addr_obj_name))
+                    objects.append(write("obj_addresses")(addr_obj_name, addr_obj_value))
+    results = list(await asyncio.gather(*objects))
+
+    groups = []
+    for addr_group in conf["addr_groups"]:
+        members = [name for addr_object in addr_group["objects"] for name in addr_object]
+        groups.append(write("address_group")(addr_group["name"], members))
+    results += await asyncio.gather(*groups)
+
+    # rules are appended in creation order, keep them sequential
+    for policy in conf["policies"]:
+        services = [s["name"] if isinstance(s, dict) else s for s in policy["service"]]
+        results.append(await write("sec_policy")(policy["name"], policy["src_zone"], policy["src_addr"],
+                                                 policy["dst_zone"], policy["dst_addr"], policy["app"],
+                                                 services, policy["action"], policy["description"]))
+
+    if commit_desc is not None:
+        results.append(await client.commit(commit_desc))
+    return results
+
+
+async def deploy_many(clients: list, conf: dict, commit_desc: str = None) -> dict:
+    # push the same config to several firewalls at once, returns {pa_url: [PaResult, ...]}
+    all_results = await asyncio.gather(*(deploy_config(client, conf, commit_desc) for client in clients))
+    return {client.pa_url: results for client, results in zip(clients, all_results)}
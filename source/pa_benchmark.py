@@ -0,0 +1,122 @@
+from openpyxl import Workbook
+from pa_mock_server import start_mock_server
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Deployment benchmark against the local mock firewall (pa_mock_server.py).
+# Generates synthetic customer workbooks and runs pa_deploy_policies.py in every client mode,
+# reporting API calls/s, wall time and the p50/p99 server-side call latency.
+#
+# python source/pa_benchmark.py --rows 100 1000 10000 --latency 0.005
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEPLOY = os.path.join(SOURCE_DIR, "pa_deploy_policies.py")
+SHEET = "Rules"
+MODES = {
+    "serial": [],
+    "workers-16": ["--workers", "16"],
+    "async-16": ["--async", "--workers", "16"],
+    "stream": ["--stream"],
+    "bulk": ["--bulk"],
+    "plan": ["--plan", "--workers", "16"],
+}
+
+
+def generate_workbook(path: str, rows: int, objects_per_group: int = 5) -> None:
+    # about 2/3 of the rows are address objects, 1/3 are policies
+    object_rows = max(rows * 2 // 3, objects_per_group)
+    policy_rows = max(rows - object_rows, 1)
+    groups = object_rows // objects_per_group
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET
+    sheet.append(["Group_address_objects"])
+    sheet.append(["Group_name", "Object_name", "IP_address", "Comments"])
+    for group in range(groups):
+        for member in range(objects_per_group):
+            index = group * objects_per_group + member
+            sheet.append([f"bench_grp{group}" if member == 0 else None, f"bench_obj{index}",
+                          f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}/32"])
+    sheet.append([])
+    sheet.append(["Policies"])
+    sheet.append(["Policy_name", "Policy_description", "Source_zone", "Source_address", "Destination_zone",
+                  "Destination_address", "Application", "Service", "Action", "Comments"])
+    for policy in range(policy_rows):
+        service = "application-default" if policy % 3 else f"tcp_{1024 + policy % 20000}\nudp_{1024 + policy % 20000}"
+        sheet.append([f"BENCH-{policy}", "benchmark", "WAN_zone", f"bench_grp{policy % groups}", "DC_zone",
+                      f"bench_grp{(policy + 1) % groups}", "any" if policy % 3 == 0 else "ssl", service, "allow"])
+    workbook.save(path)
+
+
+def _mock_call(url: str, path: str, method: str = "GET") -> dict:
+    request = urllib.request.Request(url + path, method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def run_mode(server_url: str, api_key: str, workbook: str, mode_args: list) -> dict:
+    _mock_call(server_url, "/__mock/reset", "POST")
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, DEPLOY, server_url, api_key, workbook, SHEET, "--no-cache"] + mode_args,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=SOURCE_DIR)
+    wall = time.perf_counter() - started
+    stats = _mock_call(server_url, "/__mock/stats?reset=1")
+    return {
+        "returncode": process.returncode,
+        "wall": wall,
+        "calls": stats["calls"],
+        "errors": stats["errors"],
+        "calls_per_s": stats["calls"] / wall if wall else 0.0,
+        "p50": percentile(stats["durations"], 50),
+        "p99": percentile(stats["durations"], 99),
+        "mean": statistics.fmean(stats["durations"]) if stats["durations"] else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000], help="Workbook sizes (rows)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES), help="Client modes")
+    parser.add_argument("--latency", type=float, default=0.005, help="Mock mean latency per call, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock share of HTTP 503 answers")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, error_rate=args.error_rate, commit_time=0.1)
+    results = []
+    print(f"{'rows':>7} {'mode':<11} {'calls':>7} {'errors':>6} {'wall s':>8} {'calls/s':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            workbook = os.path.join(tmp_dir, f"bench_{rows}.xlsx")
+            generate_workbook(workbook, rows)
+            for mode in args.modes:
+                result = dict(run_mode(server.url, server.state.api_key, workbook, MODES[mode]), rows=rows, mode=mode)
+                results.append(result)
+                print(f"{rows:>7} {mode:<11} {result['calls']:>7} {result['errors']:>6} {result['wall']:>8.2f} "
+                      f"{result['calls_per_s']:>9.1f} {result['p50'] * 1000:>8.2f} {result['p99'] * 1000:>8.2f}"
+                      + ("" if result["returncode"] == 0 else f"  (exit code {result['returncode']})"))
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from pa_api import PaClient
+import logging
+import threading
+import time
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+
+class CommitCoalescer:
+    # Commits are expensive on the management plane: every stage/customer of a run calls request()
+    # and exactly one commit is issued by flush(), or automatically once `deadline` seconds have
+    # passed since the first pending request.
+    # Before committing it waits for commit jobs already running on the firewall (e.g. a previous
+    # deploy), so our commit includes all changes instead of queuing behind them.
+    def __init__(self, client: PaClient, deadline: float = None, timeout: float = 600) -> None:
+        self.client = client
+        self.deadline = deadline
+        self.timeout = timeout
+        self.pending = []
+        self.last_job = None
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def request(self, desc: str) -> None:
+        with self._lock:
+            self.pending.append(desc)
+            if self.deadline is not None and self._timer is None:
+                self._timer = threading.Timer(self.deadline, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _wait_running_commits(self, deadline: float) -> None:
+        for job in self.client.pending_jobs():
+            if "commit" in job["type"].lower():
+                logger.info(f"Waiting for the running commit job {job['id']}...")
+                self.client.wait_for_job(job["id"], max(deadline - time.monotonic(), 0))
+
+    def flush(self) -> dict:
+        # returns the final commit job status, None if nothing was requested
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            descs, self.pending = self.pending, []
+            if not descs:
+                return None
+
+            deadline = time.monotonic() + self.timeout
+            self._wait_running_commits(deadline)
+            # PAN-OS commit descriptions are limited in length, keep the distinct ones
+            desc = "; ".join(dict.fromkeys(descs))[:512]
+            logger.info(f"Coalesced {len(descs)} commit request(s) into one commit.")
+            self.last_job = self.client.wait_commit(self.client.commit_job(desc),
+                                                    max(deadline - time.monotonic(), 0))
+            return self.last_job
@@ -1,19 +1,44 @@
-from pa_api import display_sec_policies
+from pa_api import PaClient, display_sec_policies
+from pa_snapshot import SnapshotStore, DEFAULT_SNAPSHOT_DIR
 import argparse
 
 parser = argparse.ArgumentParser()
 parser.add_argument("pa_api_url", type=str, help="PA API URL")
 parser.add_argument("pa_api_key", type=str, help="PA API key")
+parser.add_argument("--page-size", type=int, default=0,
+                    help="Fetch the rules page by page (default: one streamed request)")
+parser.add_argument("--rest", action="store_true", help="Load the whole rulebase with one REST API call")
+parser.add_argument("--snapshot-ttl", type=float, default=0,
+                    help="Print the rules from the local config snapshot, refreshed when older than this (seconds)")
+parser.add_argument("--snapshot-dir", type=str, default=DEFAULT_SNAPSHOT_DIR, help="Firewall config snapshot directory")
 args = parser.parse_args()
 
 
+def print_policy(policy: dict) -> None:
+    print(policy["@name"], policy["from"]["member"], policy["source"]["member"],
+          policy["to"]["member"], policy["destination"]["member"],
+          policy["application"]["member"], policy["service"]["member"], policy["action"])
+
+
 def main() -> None:
-    policies = display_sec_policies(args.pa_api_url, args.pa_api_key)
-    for policy in policies["result"]["entry"]:
-        print(policy["@name"], policy["from"]["member"], policy["source"]["member"], 
-              policy["to"]["member"], policy["destination"]["member"], 
-              policy["application"]["member"], policy["service"]["member"], policy["action"])
+    if args.snapshot_ttl > 0:
+        with PaClient(args.pa_api_url, args.pa_api_key) as client:
+            policies = SnapshotStore(client, args.snapshot_dir, args.snapshot_ttl).display_sec_policies()
+        for policy in policies["result"]["entry"]:
+            print_policy(policy)
+        return
+
+    if args.rest:
+        policies = display_sec_policies(args.pa_api_url, args.pa_api_key)
+        for policy in policies["result"]["entry"]:
+            print_policy(policy)
+        return
+
+    # rules are printed while they are downloaded, memory does not grow with the rulebase size
+    with PaClient(args.pa_api_url, args.pa_api_key) as client:
+        for policy in client.iter_sec_policies(args.page_size):
+            print_policy(policy)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from pa_api import PaClient
+from pa_plan import WRITE_METHODS, policy_services
+import logging
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Dependency graph deploy (--dag): one node per service, address object, address group and policy of the
+# create_config() output, with an edge for every reference:
+#   address object -> address group -> policy (src/dst), address object -> policy, service -> policy
+# A node starts as soon as the nodes it requires succeeded, independent branches run in parallel, and the
+# nodes depending (directly or not) on a failed node are skipped instead of being sent to the firewall.
+# New rules are appended to the rulebase in creation order, so every policy also waits for the previous
+# policy of the sheet to finish (ordering only: it runs even when the previous one failed).
+# A policy or address group name used twice in the sheet is a ValueError (one node per name).
+#
+# Node: {"label": ..., "func": ..., "args": (...), "requires": {node ids}, "after": {node ids}}
+
+
+def config_dag(client: PaClient, conf: dict, action: str = "upsert", existing_addresses: set = frozenset()) -> dict:
+    # action: PaClient method prefix ("upsert", "create"); existing_addresses: firewall objects used as they are
+    duplicates = []
+    for kind, items in (("address group", conf["addr_groups"]), ("policy", conf["policies"])):
+        seen = set()
+        for item in items:
+            if item["name"] in seen:
+                duplicates.append(f"{kind} {item['name']}")
+            seen.add(item["name"])
+    if duplicates:
+        raise ValueError(f"Duplicate names in the sheet: {', '.join(dict.fromkeys(duplicates))}")
+
+    def method(kind):
+        return getattr(client, f"{action}_{WRITE_METHODS[kind]}")
+
+    nodes = {}
+    for service in conf["services"]:
+        nodes.setdefault(("service", service["name"]), {
+            "label": f"service {service['name']}", "func": method("service"),
+            "args": (service["name"], service["protocol"], service["port"], ""), "requires": set(), "after": set()})
+    for addr_group in conf["addr_groups"]:
+        members = []
+        for addr_object in addr_group["objects"]:
+            for addr_obj_name, addr_obj_value in addr_object.items():
+                members.append(addr_obj_name)
+                if addr_obj_name not in existing_addresses:
+                    nodes.setdefault(("address", addr_obj_name), {
+                        "label": f"address {addr_obj_name}", "func": method("address"),
+                        "args": (addr_obj_name, addr_obj_value, ""), "requires": set(), "after": set()})
+        nodes[("group", addr_group["name"])] = {
+            "label": f"address group {addr_group['name']}", "func": method("group"),
+            "args": (addr_group["name"], members, ""),
+            "requires": {("address", name) for name in members if ("address", name) in nodes}, "after": set()}
+
+    previous = None
+    for policy in conf["policies"]:
+        services = policy_services(policy)
+        requires = {("service", name) for name in services if ("service", name) in nodes}
+        for address in (policy["src_addr"], policy["dst_addr"]):
+            requires |= {node for node in (("group", address), ("address", address)) if node in nodes}
+        node = ("policy", policy["name"])
+        nodes[node] = {
+            "label": f"policy {policy['name']}", "func": method("policy"),
+            "args": (policy["name"], policy["src_zone"], policy["src_addr"], policy["dst_zone"], policy["dst_addr"],
+                     policy["app"], services, policy["action"], policy["description"]),
+            "requires": requires, "after": {previous} if previous else set()}
+        previous = node
+    return nodes
+
+
+def run_dag(nodes: dict, workers: int = 1) -> tuple:
+    # -> ([failed labels], [skipped labels]); every node runs once all its requires/after nodes are done
+    dependents = {node_id: [] for node_id in nodes}
+    remaining = {}
+    for node_id, node in nodes.items():
+        deps = node["requires"] | node["after"]
+        remaining[node_id] = len(deps)
+        for dep in deps:
+            dependents[dep].append(node_id)
+    blocked = {}  # node id -> the failed/skipped node it requires
+    failures, skipped = [], []
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        running = {}
+        # (node id, ok) of the nodes just done; a skipped node is done at once, without recursion
+        done_queue = deque()
+
+        def start(node_id) -> None:
+            if node_id in blocked:
+                skipped.append(nodes[node_id]["label"])
+                logger.info(f"Skipped {nodes[node_id]['label']}: {nodes[blocked[node_id]]['label']} was not deployed")
+                done_queue.append((node_id, False))
+                return
+            node = nodes[node_id]
+            running[pool.submit(node["func"], *node["args"])] = node_id
+
+        for node_id in [node_id for node_id, count in remaining.items() if count == 0]:
+            start(node_id)
+        while running or done_queue:
+            if not done_queue:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node_id = running.pop(future)
+                    try:
+                        ok = bool(future.result())
+                    except Exception as err:
+                        logger.info(f"{nodes[node_id]['label']} raised {err!r}")
+                        ok = False
+                    if not ok:
+                        failures.append(nodes[node_id]["label"])
+                    done_queue.append((node_id, ok))
+            node_id, ok = done_queue.popleft()
+            for dependent in dependents[node_id]:
+                if not ok and node_id in nodes[dependent]["requires"]:
+                    blocked.setdefault(dependent, node_id)
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    start(dependent)
+
+    never_ran = [nodes[node_id]["label"] for node_id, count in remaining.items() if count > 0]
+    if never_ran:
+        logger.info(f"Dependency cycle, not deployed: {', '.join(never_ran)}")
+        skipped += never_ran
+    done_count = len(nodes) - len(failures) - len(skipped)
+    logger.info(f"Dependency graph: {done_count}/{len(nodes)} succeeded, {len(failures)} failed, {len(skipped)} skipped.")
+    for item in failures:
+        logger.info(f"Failed item {item}")
+    return failures, skipped
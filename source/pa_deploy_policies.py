@@ -1,39 +1,500 @@
-from pa_api import create_obj_services, create_obj_addresses, create_address_group, create_sec_policy, commit
-from excel_api import create_config
+from pa_api import PaClient, LOCATIONS, RULEBASES
+from pa_api_async import AsyncPaClient, deploy_config
+from pa_plan import (run_stage, policy_services, desired_state, current_state, fetch_current_state,
+                     build_plan, log_plan, plan_size, execute_plan)
+from excel_api import iter_config, check_template
+from config_cache import load_parsed, DEFAULT_CACHE_DIR
+from customer_configs import is_multi_path, load_customer_configs
+from pa_commit import CommitCoalescer
+from pa_snapshot import SnapshotStore, DEFAULT_SNAPSHOT_DIR
+from pa_rule_analyzer import analyze_deployment, log_report, sheet_findings
+from pa_address_reuse import reuse_addresses, reuse_conflicts, log_reuse
+from service_model import service_conflicts
+from pa_request import configure_firewall, load_api_limits
+from pa_metrics import log_summary, write_metrics
+from pa_state_file import load_state_file, incremental_plan, save_state_file
+from pa_dag import config_dag, run_dag
+from pa_inventory import load_inventory, device_path, log_fanout_report
+from concurrent.futures import ThreadPoolExecutor
 import argparse
+import asyncio
+import logging
+import json
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 parser = argparse.ArgumentParser()
 parser.add_argument("pa_api_url", type=str, help="PA API URL")
 parser.add_argument("pa_api_key", type=str, help="PA API key")
-parser.add_argument("ex_file_path", type=str, help="Excel file path")
+parser.add_argument("ex_file_path", type=str,
+                    help="Excel file path, or a directory / quoted glob of customer workbooks deployed with one commit")
 parser.add_argument("ex_sheet", type=str, help="Excel sheet name")
+parser.add_argument("--config-json", type=str, default=None,
+                    help="Config already parsed by pa_temp_validation.py --config-out (skips the Excel parse)")
+parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Parsed template cache directory")
+parser.add_argument("--no-cache", action="store_true", help="Always parse the workbook")
+parser.add_argument("--create-only", action="store_true",
+                    help="Only create objects and rules, existing ones are reported as failed (no update)")
+parser.add_argument("--stream", action="store_true",
+                    help="Deploy each group/service/policy as soon as it is read from the sheet")
+parser.add_argument("--workers", type=int, default=1, help="Number of parallel API calls per stage (default: 1)")
+parser.add_argument("--dag", action="store_true",
+                    help="Deploy each object as soon as the objects it references are deployed (up to --workers in "
+                         "parallel) and skip the items referencing a failed one")
+parser.add_argument("--async", dest="use_async", action="store_true",
+                    help="Deploy with the asyncio client: up to --workers calls in flight on one event loop, no thread per call")
+parser.add_argument("--plan", action="store_true",
+                    help="Diff the sheet against the firewall and push only the changes")
+parser.add_argument("--prune-prefix", type=str, default=None,
+                    help="With --plan: delete firewall objects/rules with this name prefix that are not in the sheet")
+parser.add_argument("--state-file", type=str, default=None,
+                    help="Deploy only the sheet items changed since the last deploy recorded in this file "
+                         "(no firewall download); with --plan: refresh the file after the deploy")
+parser.add_argument("--dry-run", action="store_true", help="With --plan/--state-file: only display the plan")
+parser.add_argument("--check-services", action="store_true",
+                    help="Stop before deploying when a sheet service has the name of a firewall service with other ports")
+parser.add_argument("--reuse-addresses", action="store_true",
+                    help="Reference the firewall objects (or earlier sheet objects) with the same IP instead of creating new ones")
+parser.add_argument("--analyze", action="store_true",
+                    help="Stop before deploying when a sheet rule is shadowed by or redundant with an earlier rule")
+parser.add_argument("--analyze-report", type=str, default=None, help="With --analyze: write the report to this JSON file")
+parser.add_argument("--snapshot-ttl", type=float, default=0,
+                    help="With --plan/--analyze: reuse the local firewall config snapshot up to this age in seconds (default: off)")
+parser.add_argument("--snapshot-dir", type=str, default=DEFAULT_SNAPSHOT_DIR, help="Firewall config snapshot directory")
+parser.add_argument("--bulk", action="store_true",
+                    help="Push the whole sheet with XML API 'set' calls instead of one REST call per object")
+parser.add_argument("--chunk-size", type=int, default=500, help="With --bulk: entries per XML API call (default: 500)")
+parser.add_argument("--api-limits", type=str, default=None,
+                    help="JSON file of per-firewall API settings (rate, burst, retries, ...), see pa_request.py")
+parser.add_argument("--rate-limit", type=float, default=None,
+                    help="Initial API calls/s for this firewall, adapted on 429/503 (default: unlimited until throttled)")
+parser.add_argument("--retries", type=int, default=None, help="Retries per API call (default: 4)")
+parser.add_argument("--metrics-file", type=str, default=None,
+                    help="Write the run metrics to this file: Prometheus textfile for *.prom, JSON lines otherwise")
+parser.add_argument("--inventory", type=str, default=None,
+                    help="JSON inventory of firewalls (see pa_inventory.py): the sheet is parsed once and deployed to every "
+                         "firewall in parallel instead of pa_api_url; pa_api_key is the default API key")
+parser.add_argument("--device-workers", type=int, default=0,
+                    help="With --inventory: firewalls deployed at the same time (default: all)")
+parser.add_argument("--inventory-report", type=str, default=None,
+                    help="With --inventory: write the per-firewall status report to this JSON file")
+parser.add_argument("--wait", action="store_true",
+                    help="Wait for running commits, commit once and poll the commit job until it finishes")
+parser.add_argument("--commit-timeout", type=float, default=600, help="With --wait/--push: seconds (default: 600)")
+parser.add_argument("--location", choices=LOCATIONS, default="vsys",
+                    help="Where the objects and rules are deployed: the firewall vsys (default), or with a Panorama "
+                         "pa_api_url a device group or the shared config")
+parser.add_argument("--device-group", type=str, default=None, help="With --location device-group: device group name")
+parser.add_argument("--rulebase", choices=RULEBASES, default="pre",
+                    help="Panorama rulebase of the rules: pre (before the firewall local rules, default) or post")
+parser.add_argument("--push", action="store_true",
+                    help="Panorama: after the commit, push to the managed firewalls (commit-all) and poll the push jobs "
+                         "(implies --wait)")
+parser.add_argument("--push-device-group", type=str, action="append", default=None,
+                    help="With --push: device group to push (repeatable, default: --device-group)")
+parser.add_argument("--template-stack", type=str, action="append", default=[],
+                    help="With --push: also push this template stack (repeatable)")
 args = parser.parse_args()
 
+COMMIT_DESC = "Successfully deployed policies from Excel file."
+
+
+def write(client: PaClient, kind: str):
+    # upsert_* by default: a re-run updates the existing objects instead of failing on them
+    return getattr(client, ("create_" if args.create_only else "upsert_") + kind)
 
-def main() -> None:
-    conf = create_config(args.ex_file_path, sheet_name=args.ex_sheet)
-    for service in conf["services"]:
-        create_obj_services(args.pa_api_url, args.pa_api_key, service["name"], service["protocol"], service["port"], "")
 
+def object_jobs(client: PaClient, conf: dict, existing_addresses: set = frozenset()) -> list:
+    # services and address objects do not depend on each other, they share the first stage
+    jobs = []
+    seen = {("address", name) for name in existing_addresses}
+    for service in conf["services"]:
+        if ("service", service["name"]) not in seen:
+            seen.add(("service", service["name"]))
+            jobs.append((f"service {service['name']}", write(client, "obj_services"),
+                         (service["name"], service["protocol"], service["port"], "")))
     for addr_group in conf["addr_groups"]:
-        addr_group_items = []
         for addr_object in addr_group["objects"]:
             for addr_obj_name, addr_obj_value in addr_object.items():
-                create_obj_addresses(args.pa_api_url, args.pa_api_key, addr_obj_name, addr_obj_value, "")
-                addr_group_items.append(addr_obj_name)
-        create_address_group(args.pa_api_url, args.pa_api_key, addr_group["name"], addr_group_items, "")
+                if ("address", addr_obj_name) not in seen:
+                    seen.add(("address", addr_obj_name))
+                    jobs.append((f"address {addr_obj_name}", write(client, "obj_addresses"),
+                                 (addr_obj_name, addr_obj_value, "")))
+    return jobs
+
+
+def group_jobs(client: PaClient, conf: dict) -> list:
+    jobs = []
+    for addr_group in conf["addr_groups"]:
+        addr_group_items = [name for addr_object in addr_group["objects"] for name in addr_object]
+        jobs.append((f"address group {addr_group['name']}", write(client, "address_group"),
+                     (addr_group["name"], addr_group_items, "")))
+    return jobs
 
+
+def policy_jobs(client: PaClient, conf: dict) -> list:
+    jobs = []
     for policy in conf["policies"]:
-        service_list = []
-        for service in policy["service"]:
-            if isinstance(service, dict):
-                service_list.append(service["name"])
-            else:
-                service_list.append(service)
-        create_sec_policy(args.pa_api_url, args.pa_api_key, policy["name"], policy["src_zone"], policy["src_addr"], 
-                          policy["dst_zone"], policy["dst_addr"], policy["app"], service_list, policy["action"], policy["description"])
-        
-    commit(args.pa_api_url, args.pa_api_key, "Successfully deployed policies from Excel file.")
+        jobs.append((f"policy {policy['name']}", write(client, "sec_policy"),
+                     (policy["name"], policy["src_zone"], policy["src_addr"],
+                      policy["dst_zone"], policy["dst_addr"], policy["app"],
+                      policy_services(policy), policy["action"], policy["description"])))
+    return jobs
+
+
+def commit_changes(client: PaClient, failures: list) -> bool:
+    # a push needs the Panorama commit to be finished
+    wait = args.wait or (args.push and client.panorama)
+    if wait:
+        coalescer = CommitCoalescer(client, timeout=args.commit_timeout)
+        coalescer.request(COMMIT_DESC)
+        result = coalescer.flush()
+        for line in result["details"]:
+            logger.info(line)
+        committed = result["result"] == "OK"
+    else:
+        committed = client.commit(COMMIT_DESC)
+    if failures:
+        logger.info(f"Deployment finished with {len(failures)} failed item(s).")
+    if wait and not committed:
+        exit(f"Commit job {result['id']} finished with {result['result']}.")
+    if args.push and client.panorama:
+        push_changes(client)
+    return committed
+
+
+def push_changes(client: PaClient) -> None:
+    # commit-all of the device groups and template stacks, stops the deploy when a push job or a firewall failed
+    device_groups = args.push_device_group or ([client.device_group] if client.device_group else [])
+    if not device_groups and not args.template_stack:
+        exit("--push: no device group (--push-device-group) or template stack (--template-stack) to push.")
+    results = client.push_and_wait(device_groups, args.template_stack, COMMIT_DESC, args.commit_timeout)
+    failed = [f"job {result['id']} {result['result']}" for result in results if result["result"] != "OK"]
+    failed += [f"{device['name']} {device['result']}" for result in results for device in result.get("devices", [])
+               if device["result"] not in ("OK", "")]
+    if failed:
+        exit(f"Push failed: {', '.join(failed)}")
+    logger.info(f"Pushed to {', '.join(device_groups + args.template_stack)}.")
+
+
+# one snapshot store per client: the config version is checked and the tables are read once per run
+snapshot_stores = {}
+
+
+def snapshot_store(client: PaClient) -> SnapshotStore:
+    if client not in snapshot_stores:
+        snapshot_stores[client] = SnapshotStore(client, args.snapshot_dir, args.snapshot_ttl)
+    return snapshot_stores[client]
+
+
+def invalidate_snapshot(client: PaClient) -> None:
+    # called right before the first write (committed or not), the next --plan/--analyze run downloads the tables again;
+    # a run writing nothing (empty plan, --dry-run) keeps the snapshot
+    if args.snapshot_ttl > 0:
+        snapshot_store(client).invalidate()
+
+
+def current_source(client: PaClient):
+    if args.snapshot_ttl > 0:
+        return snapshot_store(client)
+    return client
+
+
+def check_services(client: PaClient, conf: dict) -> None:
+    firewall = current_state(current_source(client).display_obj_services(), {}, {}, {})["services"]
+    conflicts = service_conflicts(conf["services"], firewall)
+    for conflict in conflicts:
+        logger.info(conflict)
+    if conflicts:
+        exit(f"{len(conflicts)} service(s) conflict with the firewall services, nothing deployed.")
+
+
+def reuse_stage(client: PaClient, conf: dict) -> tuple:
+    conf, unchanged, report = reuse_addresses(conf, current_source(client).display_obj_addresses())
+    log_reuse(report, unchanged)
+    conflicts = reuse_conflicts(report)
+    if conflicts:
+        exit(f"{len(conflicts)} sheet address(es) conflict with an object already used by the sheet, nothing deployed.")
+    return conf, unchanged
+
+
+def analyze_gate(client: PaClient, conf: dict) -> None:
+    report = analyze_deployment(conf, current_source(client))
+    log_report(report)
+    if args.analyze_report:
+        with open(args.analyze_report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    findings = sheet_findings(report)
+    if findings:
+        exit(f"{len(findings)} sheet rule(s) would never match, nothing deployed.")
+
+
+def deploy_plan(client: PaClient, conf: dict, state_file: str = None) -> list:
+    source = current_source(client)
+    desired = desired_state(conf)
+    plan = build_plan(desired, fetch_current_state(source), args.prune_prefix)
+    log_plan(plan)
+    if args.dry_run:
+        return []
+    if plan_size(plan) == 0:
+        if state_file:
+            save_state_file(state_file, client, desired, load_state_file(state_file, client), plan, [])
+        return []
+
+    invalidate_snapshot(client)
+    failures = execute_plan(client, plan, args.workers)
+    committed = commit_changes(client, failures)
+    if committed and state_file:
+        save_state_file(state_file, client, desired, load_state_file(state_file, client), plan, failures)
+    return failures if committed else failures + ["commit"]
+
+
+def deploy_incremental(client: PaClient, conf: dict, state_file: str) -> list:
+    desired = desired_state(conf)
+    previous = load_state_file(state_file, client)
+    plan = incremental_plan(desired, previous, "create" if args.create_only else "upsert")
+    log_plan(plan)
+    if args.dry_run:
+        return []
+    if plan_size(plan) == 0:
+        logger.info("No sheet item changed since the last deploy.")
+        return []
+
+    invalidate_snapshot(client)
+    failures = execute_plan(client, plan, args.workers)
+    committed = commit_changes(client, failures)
+    if committed:
+        save_state_file(state_file, client, desired, previous, plan, failures)
+    return failures if committed else failures + ["commit"]
+
+
+def deploy_async(client: PaClient, conf: dict, existing_addresses: set) -> list:
+    # same stages as the default mode, driven by AsyncPaClient; the commit stays with the blocking client (--wait/--push)
+    async def run() -> list:
+        async with AsyncPaClient(client.pa_url, client.api_key, vsys=client.vsys, max_concurrency=max(args.workers, 1),
+                                 verify=client.verify, request_layer=client.requests, location_type=client.location_type,
+                                 device_group=client.device_group, rulebase=client.rulebase) as async_client:
+            return await deploy_config(async_client, conf, mode="create" if args.create_only else "upsert",
+                                       existing_addresses=existing_addresses)
+
+    return [f"{result.operation} {result.name}" for result in asyncio.run(run()) if not result.ok]
+
+
+def load_config() -> dict:
+    if args.config_json:
+        with open(args.config_json) as config_file:
+            return json.load(config_file)
+    if is_multi_path(args.ex_file_path):
+        return load_customer_configs(args.ex_file_path, args.ex_sheet, args.cache_dir, not args.no_cache)
+    parsed = load_parsed(args.ex_file_path, args.ex_sheet, args.cache_dir, not args.no_cache)
+    check_template(parsed["valid"])
+    return parsed["config"]
+
+
+def deploy_stream(client: PaClient) -> list:
+    # groups come before the policies in the sheet and the services of a policy are
+    # yielded right before it, so every object exists before it is referenced
+    failures = []
+    created = set()
+    for kind, item in iter_config(args.ex_file_path, sheet_name=args.ex_sheet):
+        if kind == "row_error":
+            logger.info(item)
+            failures.append(item)
+        if kind == "service" and ("service", item["name"]) not in created:
+            created.add(("service", item["name"]))
+            if not write(client, "obj_services")(item["name"], item["protocol"], item["port"], ""):
+                failures.append(f"service {item['name']}")
+        if kind == "addr_group":
+            members = []
+            for addr_object in item["objects"]:
+                for addr_obj_name, addr_obj_value in addr_object.items():
+                    members.append(addr_obj_name)
+                    if ("address", addr_obj_name) not in created:
+                        created.add(("address", addr_obj_name))
+                        if not write(client, "obj_addresses")(addr_obj_name, addr_obj_value, ""):
+                            failures.append(f"address {addr_obj_name}")
+            if not write(client, "address_group")(item["name"], members, ""):
+                failures.append(f"address group {item['name']}")
+        if kind == "policy":
+            if not write(client, "sec_policy")(item["name"], item["src_zone"], item["src_addr"],
+                                            item["dst_zone"], item["dst_addr"], item["app"],
+                                            policy_services(item), item["action"], item["description"]):
+                failures.append(f"policy {item['name']}")
+
+    for item in failures:
+        logger.info(f"Failed item {item}")
+    return failures if commit_changes(client, failures) else failures + ["commit"]
+
+
+def client_options(device: dict = None) -> dict:
+    # PaClient location: the inventory entry values, default: --location/--device-group/--rulebase
+    device = device or {}
+    return {
+        "location_type": device.get("location") or args.location,
+        "device_group": device.get("device_group") or args.device_group,
+        "rulebase": device.get("rulebase") or args.rulebase,
+    }
+
+
+def configure_requests(devices: list = None) -> None:
+    # --api-limits file, then the inventory api_limits, then --rate-limit/--retries
+    if args.api_limits:
+        load_api_limits(args.api_limits)
+    for device in devices or []:
+        if device["api_limits"]:
+            configure_firewall(device["url"], **device["api_limits"])
+    pa_urls = [device["url"] for device in devices] if devices else [args.pa_api_url]
+    settings = {}
+    if args.rate_limit is not None:
+        settings["rate"] = args.rate_limit
+    if args.retries is not None:
+        settings["retries"] = args.retries
+    for pa_url in pa_urls if settings else []:
+        configure_firewall(pa_url, **settings)
+
+
+def report_metrics() -> None:
+    # per-operation latency/status/bytes/retries table, also when the run stops on an error
+    log_summary()
+    if args.metrics_file:
+        write_metrics(args.metrics_file)
+
+
+def main() -> None:
+    try:
+        deploy()
+    finally:
+        report_metrics()
+
+
+def deploy_device(client: PaClient, conf: dict, state_file: str = None) -> list:
+    # one firewall: checks, then the selected deploy mode and the commit; returns the failed items
+    if args.check_services:
+        check_services(client, conf)
+    existing_addresses = set()
+    if args.reuse_addresses:
+        conf, existing_addresses = reuse_stage(client, conf)
+    if args.analyze:
+        analyze_gate(client, conf)
+    return deploy_mode(client, conf, state_file, existing_addresses)
+
+
+def deploy_mode(client: PaClient, conf: dict, state_file: str, existing_addresses: set) -> list:
+    if args.plan:
+        return deploy_plan(client, conf, state_file)
+    if state_file:
+        return deploy_incremental(client, conf, state_file)
+    if args.dag:
+        try:
+            nodes = config_dag(client, conf, "create" if args.create_only else "upsert", existing_addresses)
+        except ValueError as err:
+            exit(str(err))
+
+    # the modes below write the whole sheet
+    invalidate_snapshot(client)
+    if args.bulk:
+        if not client.bulk_push(conf, args.chunk_size):
+            return ["bulk push"]
+        return [] if commit_changes(client, []) else ["commit"]
+
+    if args.dag:
+        failures, skipped = run_dag(nodes, args.workers)
+        failures += skipped
+    elif args.use_async:
+        failures = deploy_async(client, conf, existing_addresses)
+    else:
+        failures = []
+        failures += run_stage("objects", object_jobs(client, conf, existing_addresses), args.workers)
+        failures += run_stage("address groups", group_jobs(client, conf), args.workers)
+        # rules are appended to the rulebase in the order they are created, so they stay serial to keep the sheet order
+        failures += run_stage("policies", policy_jobs(client, conf))
+
+    return failures if commit_changes(client, failures) else failures + ["commit"]
+
+
+def deploy_fanout(devices: list, conf: dict) -> None:
+    # every firewall in its own thread (named after it, for the log), commits included
+    def run(device: dict) -> dict:
+        threading.current_thread().name = device["name"]
+        started = time.monotonic()
+        result = {"name": device["name"], "url": device["url"], "status": "OK", "failures": [], "error": None}
+        state_file = device_path(args.state_file, device["name"]) if args.state_file else None
+        try:
+            with PaClient(device["url"], device["api_key"], vsys=device["vsys"],
+                          pool_maxsize=max(args.workers, 1), **client_options(device)) as client:
+                result["failures"] = deploy_device(client, conf, state_file)
+            if result["failures"]:
+                result["status"] = "FAILED"
+        except SystemExit as err:  # a gate (--analyze, --check-services, --wait commit) stopped this firewall
+            result.update(status="ERROR", error=str(err.code))
+        except Exception as err:
+            logger.info(f"Deploy to {device['name']} raised {err!r}")
+            result.update(status="ERROR", error=repr(err))
+        result["duration"] = time.monotonic() - started
+        return result
+
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(threadName)s:%(name)s:%(message)s"))
+    with ThreadPoolExecutor(max_workers=args.device_workers or len(devices)) as pool:
+        results = list(pool.map(run, devices))
+    log_fanout_report(results)
+    if args.inventory_report:
+        with open(args.inventory_report, "w") as report_file:
+            json.dump(results, report_file, indent=2)
+    failed = [result["name"] for result in results if result["status"] != "OK"]
+    if failed:
+        exit(f"Deploy failed on {len(failed)} firewall(s): {', '.join(failed)}")
+
+
+def deploy() -> None:
+    try:
+        devices = load_inventory(args.inventory, args.pa_api_key) if args.inventory else None
+        configure_requests(devices)
+    except ValueError as err:  # invalid --inventory / --api-limits file
+        parser.error(str(err))
+    if args.stream and is_multi_path(args.ex_file_path):
+        parser.error("--stream takes a single workbook")
+    if args.stream and (args.analyze or args.reuse_addresses or args.check_services or args.state_file):
+        parser.error("--analyze, --reuse-addresses, --check-services and --state-file need the whole sheet, "
+                     "they cannot be used with --stream")
+    if args.stream and devices:
+        parser.error("--stream cannot be used with --inventory")
+    if args.stream and (args.plan or args.bulk):
+        parser.error("--stream cannot be used with --plan or --bulk")
+    if args.bulk and args.state_file:
+        parser.error("--state-file cannot be used with --bulk")
+    if args.dag and (args.stream or args.bulk or args.plan or args.state_file):
+        parser.error("--dag cannot be used with --stream, --bulk, --plan or --state-file")
+    if args.use_async and (args.stream or args.bulk or args.plan or args.state_file or args.dag):
+        parser.error("--async cannot be used with --stream, --bulk, --plan, --state-file or --dag")
+    if not devices and args.location == "device-group" and not args.device_group:
+        parser.error("--location device-group needs --device-group")
+    if not devices and args.push and args.location == "vsys":
+        parser.error("--push needs a Panorama pa_api_url and --location device-group or shared")
+    if not devices and args.push and args.location == "shared" and not (args.push_device_group or args.template_stack):
+        parser.error("--push with --location shared needs --push-device-group or --template-stack")
+    if args.stream:
+        client = PaClient(args.pa_api_url, args.pa_api_key, **client_options())
+        invalidate_snapshot(client)
+        exit_on_failures(deploy_stream(client))
+        return
+
+    conf = load_config()
+    if devices:
+        deploy_fanout(devices, conf)
+        return
+    with PaClient(args.pa_api_url, args.pa_api_key, pool_maxsize=max(args.workers, 1), **client_options()) as client:
+        exit_on_failures(deploy_device(client, conf, args.state_file))
+
+
+def exit_on_failures(failures: list) -> None:
+    # non-zero exit code, like a --inventory run with a failed firewall
+    if failures:
+        exit(f"Deploy failed on {len(failures)} item(s): {', '.join(failures[:10])}"
+             + (f", ... ({len(failures)} items)" if len(failures) > 10 else ""))
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
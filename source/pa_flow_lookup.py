@@ -0,0 +1,243 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from heapq import merge
+from pa_api import PaClient
+from config_cache import load_parsed
+from excel_api import check_template
+from pa_plan import desired_state, fetch_current_state
+from pa_resolve import ANY, APP_DEFAULT
+from pa_rule_analyzer import ADDRESS_BITS, MIXED, PORT_BITS, Rule, compile_rules, combined_state, port_key, prefix_key
+import argparse
+import csv
+import ipaddress
+import logging
+import time
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# First-match flow lookup: which rule of the rulebase handles a flow
+# (from zone, to zone, source IP, destination IP, application, protocol, port).
+#
+# The rules (pa_rule_analyzer.compile_rules(), names resolved to IP and port ranges) are split into one
+# index per zone pair. Inside a zone pair, every rule is registered under the smallest CIDR containing its
+# source/destination addresses (prefix trie as a dict of (version, prefix length, network)), under its
+# applications, and per protocol under the smallest aligned port block containing its ports. A flow only
+# probes the prefix lengths present in the index, takes the dimension with the fewest candidate rules and
+# checks them in rulebase order until the first match.
+#
+# A flow application "any" stands for any application: only the rules without application filter match.
+# "application-default" services match every port (the default ports of the application are not known).
+# Flows matching no rule get the PAN-OS default rules: intrazone-default (allow), interzone-default (deny).
+# Disabled rules are ignored, negated addresses match their complement. A rule with an address or service
+# that cannot be resolved (fqdn, dynamic group, unknown name) is indexed with "any" in that field: a flow
+# reaching it gets the action "unresolved" with the rule name, as the rules below it may never see the flow.
+
+FLOW_FIELDS = ("from_zone", "to_zone", "source", "destination", "application", "protocol", "port")
+DEFAULT_RULES = {True: ("intrazone-default", "allow"), False: ("interzone-default", "deny")}
+
+
+@dataclass
+class Flow:
+    from_zone: str
+    to_zone: str
+    src: tuple  # (ip version, int)
+    dst: tuple
+    app: str
+    protocol: str
+    port: int
+
+
+def parse_flow(row: dict) -> Flow:
+    # CSV row / FLOW_FIELDS dict -> Flow, ValueError when a field is missing or invalid
+    try:
+        src = ipaddress.ip_address(row["source"].strip())
+        dst = ipaddress.ip_address(row["destination"].strip())
+        port = int(row["port"])
+        protocol = row["protocol"].strip().lower()
+        from_zone, to_zone = row["from_zone"].strip(), row["to_zone"].strip()
+    except (KeyError, AttributeError, TypeError) as err:
+        raise ValueError(f"missing flow field {err}") from None
+    if not 0 <= port <= 65535:
+        raise ValueError(f"invalid port {port}")
+    app = (row.get("application") or ANY).strip() or ANY
+    return Flow(from_zone, to_zone, (src.version, int(src)), (dst.version, int(dst)), app, protocol, port)
+
+
+def _in_ranges(ranges: list, value: tuple) -> bool:
+    # value (version, int) inside merged (version, first, last) ranges / (int,) inside (first, last) ranges
+    pos = bisect_right(ranges, value + (float("inf"),)) - 1
+    return pos >= 0 and ranges[pos][:-2] == value[:-1] and ranges[pos][-2] <= value[-1] <= ranges[pos][-1]
+
+
+def rule_matches(rule: Rule, flow: Flow) -> bool:
+    # zones are matched by the zone pair index
+    if rule.apps != ANY and flow.app not in rule.apps:
+        return False
+    if rule.src != ANY and not _in_ranges(rule.src, flow.src):
+        return False
+    if rule.dst != ANY and not _in_ranges(rule.dst, flow.dst):
+        return False
+    if rule.services in (ANY, APP_DEFAULT):
+        return True
+    ports = rule.services.get(flow.protocol)
+    return ports is not None and _in_ranges(ports, (flow.port,))
+
+
+class ZonePairIndex:
+    def __init__(self) -> None:
+        self.buckets = {dimension: {} for dimension in ("src", "dst", "app", "service")}
+        # prefix lengths registered per dimension: {(version or protocol, prefix length)}
+        self.lengths = {"src": set(), "dst": set(), "service": set()}
+
+    def add(self, rule: Rule) -> None:
+        for dimension, ranges in (("src", rule.src), ("dst", rule.dst)):
+            key = prefix_key(ranges)
+            if key not in (ANY, MIXED):
+                self.lengths[dimension].add(key[:2])
+            self.buckets[dimension].setdefault(key, []).append(rule)
+        for app in [ANY] if rule.apps == ANY else rule.apps:
+            self.buckets["app"].setdefault(app, []).append(rule)
+        if isinstance(rule.services, str):
+            self.buckets["service"].setdefault(ANY, []).append(rule)
+        else:
+            for protocol, ranges in rule.services.items():
+                key = port_key(protocol, ranges)
+                self.lengths["service"].add(key[:2])
+                self.buckets["service"].setdefault(key, []).append(rule)
+
+    def _address_buckets(self, dimension: str, value: tuple) -> list:
+        buckets = self.buckets[dimension]
+        version, address = value
+        keys = [ANY, MIXED] + [(version, length, address >> (ADDRESS_BITS[version] - length))
+                               for rng_version, length in self.lengths[dimension] if rng_version == version]
+        return [buckets[key] for key in keys if key in buckets]
+
+    def _service_buckets(self, flow: Flow) -> list:
+        buckets = self.buckets["service"]
+        keys = [ANY] + [(flow.protocol, length, flow.port >> (PORT_BITS - length))
+                        for protocol, length in self.lengths["service"] if protocol == flow.protocol]
+        return [buckets[key] for key in keys if key in buckets]
+
+    def _app_buckets(self, app: str) -> list:
+        buckets = self.buckets["app"]
+        keys = [ANY] if app == ANY else [ANY, app]
+        return [buckets[key] for key in keys if key in buckets]
+
+    def candidates(self, flow: Flow) -> list:
+        # the buckets of the most selective dimension, each one in rulebase order
+        options = [
+            self._address_buckets("src", flow.src),
+            self._address_buckets("dst", flow.dst),
+            self._service_buckets(flow),
+            self._app_buckets(flow.app),
+        ]
+        return min(options, key=lambda buckets: sum(len(bucket) for bucket in buckets))
+
+
+class FlowLookup:
+    def __init__(self, state: dict) -> None:
+        # state: pa_plan state of the rulebase
+        self.rules, self.skipped = compile_rules(state, unresolved_as_any=True)
+        self.indexes = {}
+        for rule in self.rules:
+            for from_zone in [ANY] if rule.from_zones == ANY else rule.from_zones:
+                for to_zone in [ANY] if rule.to_zones == ANY else rule.to_zones:
+                    self.indexes.setdefault((from_zone, to_zone), ZonePairIndex()).add(rule)
+
+    def first_match(self, flow: Flow) -> Rule:
+        # a rule is registered under one of the 4 zone pairs at most, no rule is checked twice
+        buckets = []
+        for key in ((flow.from_zone, flow.to_zone), (ANY, flow.to_zone), (flow.from_zone, ANY), (ANY, ANY)):
+            index = self.indexes.get(key)
+            if index is not None:
+                buckets += [bucket for bucket in index.candidates(flow) if bucket]
+        candidates = buckets[0] if len(buckets) == 1 else merge(*buckets, key=lambda rule: rule.position)
+        for rule in candidates:
+            if rule_matches(rule, flow):
+                return rule
+        return None
+
+    def lookup(self, flow: Flow) -> dict:
+        rule = self.first_match(flow)
+        if rule is None:
+            name, action = DEFAULT_RULES[flow.from_zone == flow.to_zone]
+            return {"rule": name, "action": action, "position": None}
+        return {"rule": rule.name, "action": "unresolved" if rule.unresolved else rule.action, "position": rule.position}
+
+
+def evaluate_flows(engine: FlowLookup, rows) -> list:
+    # rows: FLOW_FIELDS dicts -> the rows with "rule", "action" (invalid rows: action "invalid", error in "rule")
+    results = []
+    for row in rows:
+        try:
+            result = engine.lookup(parse_flow(row))
+        except ValueError as err:
+            result = {"rule": str(err), "action": "invalid"}
+        results.append({**{field: row.get(field) for field in FLOW_FIELDS}, "rule": result["rule"],
+                        "action": result["action"]})
+    return results
+
+
+def log_results(results: list, elapsed: float) -> None:
+    counts = {}
+    for result in results:
+        counts[result["action"]] = counts.get(result["action"], 0) + 1
+        if result["action"] == "invalid":
+            logger.info(f"Invalid flow {[result[field] for field in FLOW_FIELDS]}: {result['rule']}")
+    per_flow = elapsed / len(results) * 1e6 if results else 0
+    logger.info(f"Flow lookup: {len(results)} flows in {elapsed:.3f}s ({per_flow:.1f} us/flow), "
+                + ", ".join(f"{count} {action}" for action, count in sorted(counts.items())) + ".")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pa_api_url", type=str, help="PA API URL")
+    parser.add_argument("pa_api_key", type=str, help="PA API key")
+    parser.add_argument("flows_csv", type=str, nargs="?", default=None,
+                        help=f"CSV of flows, header: {','.join(FLOW_FIELDS)}")
+    parser.add_argument("--flow", nargs=len(FLOW_FIELDS), metavar=tuple(field.upper() for field in FLOW_FIELDS),
+                        default=None, help="Look up a single flow")
+    parser.add_argument("--excel", nargs=2, metavar=("EX_FILE_PATH", "EX_SHEET"), default=None,
+                        help="Evaluate against the rulebase as it will be after deploying this customer workbook")
+    parser.add_argument("--out", type=str, default=None, help="Write the flows with their matching rule to this CSV")
+    args = parser.parse_args()
+    if not args.flows_csv and not args.flow:
+        parser.error("give a flows CSV or --flow")
+
+    with PaClient(args.pa_api_url, args.pa_api_key) as client:
+        state = fetch_current_state(client)
+    if args.excel:
+        parsed = load_parsed(*args.excel)
+        check_template(parsed["valid"])
+        state = combined_state(desired_state(parsed["config"]), state)
+
+    started = time.perf_counter()
+    engine = FlowLookup(state)
+    logger.info(f"Compiled {len(engine.rules)} rules into {len(engine.indexes)} zone pair indexes "
+                f"in {time.perf_counter() - started:.2f}s.")
+    if engine.skipped:
+        logger.info(f"Unresolved address/service, verdict \"unresolved\" when reached: {', '.join(engine.skipped)}")
+
+    if args.flow:
+        rows = [dict(zip(FLOW_FIELDS, args.flow))]
+    else:
+        with open(args.flows_csv, newline="") as flows_file:
+            rows = list(csv.DictReader(flows_file))
+    started = time.perf_counter()
+    results = evaluate_flows(engine, rows)
+    elapsed = time.perf_counter() - started
+    if args.flow:
+        logger.info(f"Flow matches rule {results[0]['rule']} ({results[0]['action']})")
+    log_results(results, elapsed)
+    if args.out:
+        with open(args.out, "w", newline="") as out_file:
+            writer = csv.DictWriter(out_file, fieldnames=FLOW_FIELDS + ("rule", "action"))
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
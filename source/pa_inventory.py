@@ -0,0 +1,68 @@
+import json
+import logging
+import os
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Firewall inventory for the fan-out deploy (pa_deploy_policies.py --inventory): the sheet is parsed once
+# and deployed to every firewall concurrently, each one with its own client (connection pool), request
+# layer, plan and commit.
+#
+# {"firewalls": [
+#     {"name": "eu-fw1", "url": "https://10.12.0.40"},
+#     {"name": "eu-fw2", "url": "https://10.12.0.41", "api_key_env": "PA_API_KEY_EU_FW2", "vsys": "vsys2",
+#      "api_limits": {"rate": 20}},
+#     {"name": "pano-eu", "url": "https://10.12.0.10", "location": "device-group", "device_group": "EU-DC"}
+# ]}
+# api_key / api_key_env: the API key or the environment variable holding it, default: the command line key
+# api_limits: pa_request settings of the firewall (rate, burst, retries, ...)
+# location / device_group / rulebase: Panorama targets (pa_api.PaClient), default: the command line options
+
+
+def load_inventory(path: str, default_api_key: str) -> list:
+    with open(path) as inventory_file:
+        inventory = json.load(inventory_file)
+    firewalls = inventory["firewalls"] if isinstance(inventory, dict) else inventory
+    devices, names = [], set()
+    for entry in firewalls:
+        if "url" not in entry:
+            raise ValueError(f"Inventory entry without url: {entry}")
+        name = entry.get("name", entry["url"])
+        if name in names:
+            raise ValueError(f"Duplicate inventory firewall name: {name}")
+        names.add(name)
+        api_key = entry.get("api_key")
+        if api_key is None and entry.get("api_key_env"):
+            api_key = os.environ.get(entry["api_key_env"])
+            if api_key is None:
+                raise ValueError(f"Firewall {name}: environment variable {entry['api_key_env']} is not set")
+        devices.append({"name": name, "url": entry["url"], "api_key": api_key or default_api_key,
+                        "vsys": entry.get("vsys", "vsys1"), "api_limits": entry.get("api_limits", {}),
+                        "location": entry.get("location"), "device_group": entry.get("device_group"),
+                        "rulebase": entry.get("rulebase")})
+    if not devices:
+        raise ValueError(f"No firewall in the inventory {path}")
+    return devices
+
+
+def device_path(path: str, name: str) -> str:
+    # per-firewall file next to the given one: state.json -> state.eu-fw1.json
+    root, ext = os.path.splitext(path)
+    safe_name = "".join(char if char.isalnum() or char in "-_." else "_" for char in name)
+    return f"{root}.{safe_name}{ext}"
+
+
+def log_fanout_report(results: list) -> None:
+    # results: [{"name", "url", "status": OK|FAILED|ERROR, "failures": [...], "error": ..., "duration": s}]
+    logger.info(f"{'firewall':<24} {'status':<7} {'failed':>6} {'time s':>7}  details")
+    for result in results:
+        details = result["error"] or ", ".join(result["failures"][:5])
+        if len(result["failures"]) > 5:
+            details += f", ... ({len(result['failures'])} items)"
+        logger.info(f"{result['name'][:24]:<24} {result['status']:<7} {len(result['failures']):>6} "
+                    f"{result['duration']:>7.1f}  {details}")
+    ok = sum(1 for result in results if result["status"] == "OK")
+    logger.info(f"Fan-out deploy: {ok}/{len(results)} firewall(s) deployed without failure.")
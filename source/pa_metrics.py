@@ -0,0 +1,190 @@
+from contextlib import contextmanager
+import json
+import logging
+import os
+import threading
+import time
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Run metrics: every API call (recorded by pa_request.RequestLayer) and the timed phases (Excel parse, ...).
+# Per operation ("POST Objects/Addresses", "XML config/set", ...): duration histogram, status codes,
+# request/response bytes and retries. The run ends with a summary table and, with --metrics-file, a
+# Prometheus textfile (*.prom, for the node_exporter textfile collector of the runner) or JSON lines.
+#
+# The summary compares the median duration of the first and last 10% calls of every operation,
+# an endpoint slowing down while the rulebase grows shows up as a "slowdown" above 1.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.calls = []  # (timestamp, operation, status, duration, request bytes, response bytes, retries)
+        self.phases = []  # (timestamp, phase, duration)
+
+    def record_call(self, operation: str, status: int, duration: float, request_bytes: int = 0,
+                    response_bytes: int = 0, retries: int = 0) -> None:
+        with self.lock:
+            self.calls.append((time.time(), operation, status, duration, request_bytes, response_bytes, retries))
+
+    def record_phase(self, name: str, duration: float) -> None:
+        with self.lock:
+            self.phases.append((time.time(), name, duration))
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started = time.time()
+            self.calls = []
+            self.phases = []
+
+    def operations(self) -> dict:
+        # {operation: [call, ...]} in call order
+        with self.lock:
+            calls = list(self.calls)
+        by_operation = {}
+        for call in calls:
+            by_operation.setdefault(call[1], []).append(call)
+        return by_operation
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.record_phase(name, time.perf_counter() - started)
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def summarize(metrics: Metrics = METRICS) -> list:
+    rows = []
+    for operation, calls in sorted(metrics.operations().items()):
+        durations = [call[3] for call in calls]
+        tenth = max(len(durations) // 10, 1)
+        first, last = percentile(durations[:tenth], 50), percentile(durations[-tenth:], 50)
+        rows.append({
+            "operation": operation,
+            "calls": len(calls),
+            "errors": sum(1 for call in calls if call[2] is None or call[2] >= 400),
+            "retries": sum(call[6] for call in calls),
+            "total": sum(durations),
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "p99": percentile(durations, 99),
+            "max": max(durations),
+            "request_bytes": sum(call[4] for call in calls),
+            "response_bytes": sum(call[5] for call in calls),
+            "slowdown": last / first if first and len(calls) >= 20 else None,
+        })
+    return rows
+
+
+def log_summary(metrics: Metrics = METRICS) -> None:
+    rows = summarize(metrics)
+    if rows:
+        logger.info(f"{'operation':<36} {'calls':>6} {'errors':>6} {'retries':>7} {'total s':>8} {'p50 ms':>8} "
+                    f"{'p95 ms':>8} {'p99 ms':>8} {'KB out':>8} {'KB in':>8} {'slowdown':>8}")
+    for row in rows:
+        slowdown = f"{row['slowdown']:.2f}" if row["slowdown"] is not None else "-"
+        logger.info(f"{row['operation'][:36]:<36} {row['calls']:>6} {row['errors']:>6} {row['retries']:>7} "
+                    f"{row['total']:>8.2f} {row['p50'] * 1000:>8.1f} {row['p95'] * 1000:>8.1f} "
+                    f"{row['p99'] * 1000:>8.1f} {row['request_bytes'] / 1024:>8.1f} "
+                    f"{row['response_bytes'] / 1024:>8.1f} {slowdown:>8}")
+    phases = {}
+    for _, name, duration in metrics.phases:
+        phases[name] = phases.get(name, 0.0) + duration
+    for name, duration in phases.items():
+        logger.info(f"Phase {name}: {duration:.3f}s")
+    logger.info(f"Run time: {time.time() - metrics.started:.2f}s")
+
+
+def _labels(**labels) -> str:
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_text(metrics: Metrics = METRICS) -> str:
+    lines = [
+        "# HELP pa_api_call_duration_seconds PAN-OS API call duration, retries included.",
+        "# TYPE pa_api_call_duration_seconds histogram",
+    ]
+    by_operation = metrics.operations()
+    for operation, calls in sorted(by_operation.items()):
+        durations = [call[3] for call in calls]
+        for bucket in BUCKETS:
+            count = sum(1 for duration in durations if duration <= bucket)
+            lines.append(f"pa_api_call_duration_seconds_bucket{_labels(operation=operation, le=bucket)} {count}")
+        lines.append(f"pa_api_call_duration_seconds_bucket{_labels(operation=operation, le='+Inf')} {len(durations)}")
+        lines.append(f"pa_api_call_duration_seconds_sum{_labels(operation=operation)} {sum(durations)}")
+        lines.append(f"pa_api_call_duration_seconds_count{_labels(operation=operation)} {len(durations)}")
+
+    counters = (
+        ("pa_api_calls_total", "PAN-OS API calls by final HTTP status (0: connection error).", None),
+        ("pa_api_request_bytes_total", "PAN-OS API request body bytes.", 4),
+        ("pa_api_response_bytes_total", "PAN-OS API response body bytes.", 5),
+        ("pa_api_retries_total", "PAN-OS API call retries.", 6),
+    )
+    for name, help_text, field in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for operation, calls in sorted(by_operation.items()):
+            if field is None:
+                statuses = {}
+                for call in calls:
+                    statuses[call[2] or 0] = statuses.get(call[2] or 0, 0) + 1
+                for status, count in sorted(statuses.items()):
+                    lines.append(f"{name}{_labels(operation=operation, status=status)} {count}")
+            else:
+                lines.append(f"{name}{_labels(operation=operation)} {sum(call[field] for call in calls)}")
+
+    phases = {}
+    for _, name, duration in metrics.phases:
+        phases[name] = phases.get(name, 0.0) + duration
+    lines += ["# HELP pa_phase_duration_seconds Duration of the run phases (Excel parse, ...).",
+              "# TYPE pa_phase_duration_seconds gauge"]
+    lines += [f"pa_phase_duration_seconds{_labels(phase=name)} {duration}" for name, duration in phases.items()]
+    lines += ["# HELP pa_run_duration_seconds Duration of the run.", "# TYPE pa_run_duration_seconds gauge",
+              f"pa_run_duration_seconds {time.time() - metrics.started}"]
+    return "\n".join(lines) + "\n"
+
+
+def json_lines(metrics: Metrics = METRICS) -> str:
+    # one line per call and per phase, then one summary line per operation
+    with metrics.lock:
+        calls, phases = list(metrics.calls), list(metrics.phases)
+    lines = []
+    for timestamp, operation, status, duration, request_bytes, response_bytes, retries in calls:
+        lines.append(json.dumps({"type": "call", "time": timestamp, "operation": operation, "status": status,
+                                 "duration": duration, "request_bytes": request_bytes,
+                                 "response_bytes": response_bytes, "retries": retries}))
+    for timestamp, name, duration in phases:
+        lines.append(json.dumps({"type": "phase", "time": timestamp, "phase": name, "duration": duration}))
+    for row in summarize(metrics):
+        lines.append(json.dumps(dict(row, type="summary")))
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str, metrics: Metrics = METRICS) -> None:
+    # *.prom: Prometheus textfile, anything else: JSON lines; written atomically (the collector may read it any time)
+    text = prometheus_text(metrics) if path.endswith(".prom") else json_lines(metrics)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as metrics_file:
+        metrics_file.write(text)
+    os.replace(tmp_path, path)
+    logger.info(f"Metrics written to {path}")
@@ -0,0 +1,405 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from pa_api import REST_API, XML_API, xml_to_entry, entry_to_xml
+import xml.etree.ElementTree as ET
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Local stand-in for the PAN-OS management plane, used for benchmarks and dry runs
+# without a real firewall. State is kept in memory, in the REST API JSON format.
+#
+# REST API: /restapi/v11.2/Objects/{Services,Addresses,AddressGroups}, /Policies/Security{,Pre,Post}Rules
+#           (GET/POST/PUT/DELETE, :rename, :move), /System/Configuration:commit
+#           location=vsys|device-group|shared, as a firewall and a Panorama at the same time
+# XML API:  /api/?type=keygen, type=config&action=set|get (get: optional entry[position()] paging),
+#           type=config&action=edit (entry xpath, replaces the entry; "set" merges member lists like PAN-OS),
+#           type=op "show jobs ...", type=commit (Panorama commit), type=commit&action=all (push to the
+#           --devices managed firewalls, listed in the job)
+# Mock:     GET /__mock/stats[?reset=1] (call count and server-side latencies), GET /__mock/config,
+#           POST /__mock/reset
+#
+# python source/pa_mock_server.py --port 8443 --latency 0.02 --error-rate 0.01
+
+TABLES = {
+    "Objects/Services": "services",
+    "Objects/Addresses": "addresses",
+    "Objects/AddressGroups": "groups",
+    "Policies/SecurityRules": "rules",
+    "Policies/SecurityPreRules": "pre-rules",
+    "Policies/SecurityPostRules": "post-rules",
+}
+XML_TABLES = {
+    "service": "services",
+    "address": "addresses",
+    "address-group": "groups",
+    "rulebase/security/rules": "rules",
+    "pre-rulebase/security/rules": "pre-rules",
+    "post-rulebase/security/rules": "post-rules",
+}
+# config root of a vsys, a device group or shared -> (location, location name) of MockState.config
+LOCATION_XPATH = (r"^/config/(?:shared|devices/entry\[@name='localhost\.localdomain'\]/(vsys|device-group)"
+                  r"/entry\[@name='([^']+)'\])")
+
+
+def xpath_location(match: re.Match) -> tuple:
+    location, name = match.group(1, 2)
+    return (location, name) if location else ("shared", "")
+
+
+class MockState:
+    def __init__(self, api_key: str = "mock-key", commit_time: float = 0.5, devices: int = 0) -> None:
+        self.api_key = api_key
+        self.commit_time = commit_time
+        # managed firewalls of the Panorama commit-all jobs
+        self.devices = [(f"fw-{index}", f"0071{index:08d}") for index in range(1, devices + 1)]
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            # {(location, location name): {table: {name: entry}}}, dicts keep the rule order
+            self.config = {}
+            self.jobs = {}
+            self.next_job = 1
+            self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.durations = []
+
+    def table(self, location: tuple, table: str) -> dict:
+        return self.config.setdefault(location, {}).setdefault(table, {})
+
+    def add_job(self, job_type: str, devices: list = ()) -> str:
+        job_id = str(self.next_job)
+        self.next_job += 1
+        self.jobs[job_id] = {"type": job_type, "started": time.monotonic(), "devices": list(devices)}
+        return job_id
+
+    def job_xml(self, job_id: str) -> str:
+        job = self.jobs[job_id]
+        done = time.monotonic() - job["started"] >= self.commit_time
+        progress = 100 if done else int(100 * (time.monotonic() - job["started"]) / self.commit_time)
+        devices = "".join(f"<entry><devicename>{name}</devicename><serial-no>{serial}</serial-no>"
+                          f"<status>{'commit succeeded' if done else 'commit in progress'}</status>"
+                          f"<result>{'OK' if done else 'PEND'}</result><progress>{progress}</progress></entry>"
+                          for name, serial in job["devices"])
+        return (f"<job><id>{job_id}</id><type>{job['type']}</type><status>{'FIN' if done else 'ACT'}</status>"
+                f"<result>{'OK' if done else 'PEND'}</result><progress>{progress}</progress>"
+                + (f"<devices>{devices}</devices>" if job["devices"] else "")
+                + "<details><line>Configuration committed successfully</line></details></job>")
+
+
+def merge_entry(old: dict, new: dict) -> dict:
+    # XML API "set": nested elements are merged, member lists become the union of the old and new members
+    merged = dict(old)
+    for key, value in new.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            if "member" in value and "member" in merged[key]:
+                merged[key] = {"member": list(dict.fromkeys(merged[key]["member"] + value["member"]))}
+            else:
+                merged[key] = merge_entry(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _move(table: dict, name: str, where: str, dst: str) -> dict:
+    entry = table.pop(name)
+    items = list(table.items())
+    if where == "top":
+        index = 0
+    elif where == "bottom":
+        index = len(items)
+    else:
+        index = [key for key, _ in items].index(dst) + (1 if where == "after" else 0)
+    items.insert(index, (name, entry))
+    return dict(items)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real management plane
+    server_version = "PanMock"
+    # headers and body go out in one segment, otherwise Nagle + delayed ACK add ~40 ms per call
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _reply(self, status: int, body, content_type: str = "application/json") -> None:
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _rest_error(self, status: int, code: int, message: str) -> None:
+        self._reply(status, {"@status": "error", "@code": str(code), "message": message})
+
+    def _xml_reply(self, inner: str = "", status: str = "success") -> None:
+        self._reply(200, f'<response status="{status}">{inner}</response>', "application/xml")
+
+    def _handle(self) -> None:
+        started = time.monotonic()
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+
+        if url.path.startswith("/__mock/"):
+            return self._mock_endpoint(url.path, params)
+
+        server = self.server
+        if server.latency:
+            time.sleep(random.uniform(server.latency * 0.5, server.latency * 1.5))
+        with self.state.lock:
+            self.state.calls += 1
+        if server.error_rate and random.random() < server.error_rate:
+            with self.state.lock:
+                self.state.errors += 1
+            self._rest_error(503, 503, "Service Unavailable")
+        elif url.path == XML_API or url.path == XML_API.rstrip("/"):
+            self._xml_api(params, body)
+        elif url.path.startswith(REST_API + "/"):
+            self._rest_api(url.path[len(REST_API) + 1:], params, body)
+        else:
+            self._rest_error(404, 404, "Not Found")
+
+        with self.state.lock:
+            self.state.durations.append(time.monotonic() - started)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def _mock_endpoint(self, path: str, params: dict) -> None:
+        state = self.state
+        if path == "/__mock/reset":
+            state.reset()
+            return self._reply(200, {"status": "reset"})
+        if path == "/__mock/stats":
+            with state.lock:
+                stats = {"calls": state.calls, "errors": state.errors, "durations": list(state.durations)}
+                if params.get("reset"):
+                    state.reset_stats()
+            return self._reply(200, stats)
+        if path == "/__mock/config":
+            with state.lock:
+                config = {f"{loc[0]}:{loc[1]}": tables for loc, tables in state.config.items()}
+            return self._reply(200, config)
+        self._rest_error(404, 404, "Not Found")
+
+    def _authorized(self, params: dict) -> bool:
+        return (self.headers.get("X-PAN-KEY") or params.get("key")) == self.state.api_key
+
+    @staticmethod
+    def _location(params: dict) -> tuple:
+        location = params.get("location", "vsys")
+        return location, params.get(location, "")
+
+    def _rest_api(self, path: str, params: dict, body: str) -> None:
+        if not self._authorized(params):
+            return self._rest_error(403, 22, "Invalid Credential")
+        action = None
+        if ":" in path:
+            path, action = path.split(":", 1)
+        state = self.state
+
+        if path == "System/Configuration" and action == "commit":
+            with state.lock:
+                job_id = state.add_job("Commit")
+            return self._reply(200, {"@status": "success", "@code": "19", "result": {
+                "job": job_id, "msg": {"line": f"Commit job enqueued with jobid {job_id}"}}})
+        if path not in TABLES:
+            return self._rest_error(404, 404, "Not Found")
+
+        name = params.get("name")
+        with state.lock:
+            table = state.table(self._location(params), TABLES[path])
+            if self.command == "GET":
+                entries = list(table.values()) if name is None else [table[name]] if name in table else []
+                if name is not None and not entries:
+                    return self._rest_error(404, 5, "Object Not Present")
+                return self._reply(200, {"@status": "success", "@code": "19",
+                                         "result": {"@total-count": str(len(entries)),
+                                                    "@count": str(len(entries)), "entry": entries}})
+            if action == "rename":
+                if name not in table:
+                    return self._rest_error(404, 5, "Object Not Present")
+                if params.get("newname") in table:
+                    return self._rest_error(409, 6, "Object Already Exists")
+                entry = dict(table[name], **{"@name": params["newname"]})
+                items = [(params["newname"], entry) if key == name else (key, value) for key, value in table.items()]
+                table.clear()
+                table.update(items)
+                return self._reply(200, {"@status": "success", "@code": "20", "msg": "command succeeded"})
+            if action == "move":
+                if name not in table or (params.get("where") in ("before", "after") and params.get("dst") not in table):
+                    return self._rest_error(404, 5, "Object Not Present")
+                moved = _move(table, name, params.get("where"), params.get("dst"))
+                table.clear()
+                table.update(moved)
+                return self._reply(200, {"@status": "success", "@code": "20", "msg": "command succeeded"})
+            if self.command == "DELETE":
+                if name not in table:
+                    return self._rest_error(404, 5, "Object Not Present")
+                del table[name]
+                return self._reply(200, {"@status": "success", "@code": "20", "msg": "command succeeded"})
+
+            try:
+                entry = json.loads(body)["entry"]
+            except (ValueError, KeyError, TypeError):
+                return self._rest_error(400, 3, "Invalid Object")
+            if self.command == "POST":
+                if name in table:
+                    return self._rest_error(409, 6, "Object Already Exists")
+            elif self.command == "PUT":
+                if name not in table:
+                    return self._rest_error(404, 5, "Object Not Present")
+            table[name] = entry
+            return self._reply(200, {"@status": "success", "@code": "20", "msg": "command succeeded"})
+
+    def _xml_api(self, params: dict, body: str) -> None:
+        params = dict(params, **{key: values[0] for key, values in parse_qs(body, keep_blank_values=True).items()})
+        request_type = params.get("type")
+        state = self.state
+        if request_type == "keygen":
+            return self._xml_reply(f"<result><key>{state.api_key}</key></result>")
+        if not self._authorized(params):
+            return self._xml_reply("<msg>Invalid Credential</msg>", "error")
+
+        if request_type == "config" and params.get("action") == "edit":
+            return self._xml_edit(params.get("xpath", ""), params.get("element", ""))
+        if request_type == "config" and params.get("action") == "set":
+            return self._xml_set(params.get("xpath", ""), params.get("element", ""))
+        if request_type == "config" and params.get("action") in ("get", "show"):
+            return self._xml_get(params.get("xpath", ""))
+        if request_type == "commit":
+            push = params.get("action") == "all"
+            with state.lock:
+                job_id = state.add_job("CommitAll" if push else "Commit", state.devices if push else ())
+            return self._xml_reply(f"<result><msg><line>Commit job enqueued with jobid {job_id}</line></msg>"
+                                   f"<job>{job_id}</job></result>")
+        if request_type == "op":
+            cmd = params.get("cmd", "")
+            with state.lock:
+                match = re.search(r"<id>(\d+)</id>", cmd)
+                if match:
+                    if match.group(1) not in state.jobs:
+                        return self._xml_reply("<msg>job not found</msg>", "error")
+                    return self._xml_reply(f"<result>{state.job_xml(match.group(1))}</result>")
+                if "<jobs>" in cmd:
+                    jobs = [state.job_xml(job_id) for job_id in state.jobs]
+                    if "<pending>" in cmd:
+                        jobs = [job for job in jobs if "<status>FIN</status>" not in job]
+                    return self._xml_reply(f"<result>{''.join(jobs)}</result>")
+        self._xml_reply("<msg>Unsupported request</msg>", "error")
+
+    def _xml_get(self, xpath: str) -> None:
+        match = re.search(LOCATION_XPATH + r"/(service|address|address-group|(?:pre-|post-)?rulebase/security/rules)"
+                          r"(?:/entry\[position\(\) >= (\d+) and position\(\) < (\d+)\])?$", xpath)
+        if not match:
+            return self._xml_reply("<msg>Unsupported xpath</msg>", "error")
+        section, first, last = match.group(3, 4, 5)
+        with self.state.lock:
+            entries = list(self.state.table(xpath_location(match), XML_TABLES[section]).values())
+        total = len(entries)
+        if first is not None:
+            entries = entries[int(first) - 1:int(last) - 1]
+        body = "".join(ET.tostring(entry_to_xml(entry), encoding="unicode") for entry in entries)
+        if first is None:
+            tag = section.split("/")[-1]
+            body = f"<{tag}>{body}</{tag}>"
+        self._xml_reply(f'<result total-count="{total}" count="{len(entries)}">{body}</result>')
+
+    def _xml_set(self, xpath: str, element: str) -> None:
+        match = re.search(LOCATION_XPATH + "$", xpath)
+        if not match:
+            return self._xml_reply("<msg>Unsupported xpath</msg>", "error")
+        try:
+            root = ET.fromstring(f"<root>{element}</root>")
+        except ET.ParseError:
+            return self._xml_reply("<msg>Malformed element</msg>", "error")
+        with self.state.lock:
+            for section, table_name in XML_TABLES.items():
+                table = self.state.table(xpath_location(match), table_name)
+                for entry in root.findall(f"{section}/entry"):
+                    table[entry.get("name")] = merge_entry(table.get(entry.get("name"), {}), xml_to_entry(entry))
+        self._xml_reply('<msg>command succeeded</msg>')
+
+    def _xml_edit(self, xpath: str, element: str) -> None:
+        match = re.search(LOCATION_XPATH + r"/(service|address|address-group|(?:pre-|post-)?rulebase/security/rules)"
+                          r"/entry\[@name='([^']+)'\]$", xpath)
+        if not match:
+            return self._xml_reply("<msg>Unsupported xpath</msg>", "error")
+        try:
+            entry = ET.fromstring(element)
+        except ET.ParseError:
+            return self._xml_reply("<msg>Malformed element</msg>", "error")
+        if entry.tag != "entry" or entry.get("name") != match.group(4):
+            return self._xml_reply("<msg>Element does not match the xpath</msg>", "error")
+        with self.state.lock:
+            # "edit" replaces the entry, an existing entry keeps its position
+            self.state.table(xpath_location(match), XML_TABLES[match.group(3)])[match.group(4)] = xml_to_entry(entry)
+        self._xml_reply('<msg>command succeeded</msg>')
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen backlog: the default (5) drops the connects of a burst of concurrent clients, which then wait for a SYN retry
+    request_queue_size = 128
+
+    def __init__(self, address: tuple, state: MockState, latency: float = 0.0, error_rate: float = 0.0) -> None:
+        super().__init__(address, MockHandler)
+        self.state = state
+        self.latency = latency
+        self.error_rate = error_rate
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+def start_mock_server(port: int = 0, api_key: str = "mock-key", latency: float = 0.0,
+                      error_rate: float = 0.0, commit_time: float = 0.5, devices: int = 0) -> MockServer:
+    # port 0: any free port, see MockServer.url. Runs in a daemon thread, stop with server.shutdown()
+    server = MockServer(("127.0.0.1", port), MockState(api_key, commit_time, devices), latency, error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8443, help="Listening port (plain HTTP)")
+    parser.add_argument("--api-key", type=str, default="mock-key", help="Accepted API key")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean added latency per call, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with HTTP 503")
+    parser.add_argument("--commit-time", type=float, default=0.5, help="Seconds a commit job stays active")
+    parser.add_argument("--devices", type=int, default=0, help="Managed firewalls reported by the push (commit-all) jobs")
+    args = parser.parse_args()
+
+    server = MockServer(("127.0.0.1", args.port), MockState(args.api_key, args.commit_time, args.devices),
+                        args.latency, args.error_rate)
+    logger.info(f"Mock PAN-OS listening on {server.url} (API key: {args.api_key})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bisect import bisect_left
+from pa_api import PaClient
+import logging
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+
+# Planner: compare the create_config() output with the live firewall tables and
+# produce the minimal change set (create/update/delete/move), so a re-run only
+# calls the API for what actually changed.
+#
+# State format (both desired and current):
+# {
+#     "services": {name: {"protocol": "tcp", "port": "80", "description": ""}},
+#     "addresses": {name: {"ip": "10.0.0.1/32", "description": ""}},
+#     "groups": {name: {"members": [...], "description": ""}},
+#     "policies": {name: {"src_zone": [...], ..., "action": "allow", "description": ""}},
+#     "order": [policy names in rulebase order]
+# }
+#
+# Plan format: {"create": [...], "update": [...], "delete": [...], "move": [...]}
+# every item is {"kind": "service|address|group|policy", "name": name, "spec": {...}}
+# an incremental plan (pa_state_file.py) also has "upsert" items, for rows not compared with the firewall
+# move items are {"kind": "policy", "name": name, "where": "before|after", "dst": other policy}
+
+KINDS = ("service", "address", "group", "policy")
+STATE_KEYS = {"service": "services", "address": "addresses", "group": "groups", "policy": "policies"}
+# PaClient create_/update_/upsert_ method suffix per kind
+WRITE_METHODS = {"service": "obj_services", "address": "obj_addresses", "group": "address_group", "policy": "sec_policy"}
+WRITE_ACTIONS = ("create", "update", "upsert")
+POLICY_FIELDS = {
+    "src_zone": "from",
+    "dst_zone": "to",
+    "src_addr": "source",
+    "dst_addr": "destination",
+    "app": "application",
+    "service": "service",
+}
+# rule flags kept in the current state only when set ("yes"): the sheet rules are enabled and not negated
+RULE_FLAGS = {
+    "disabled": "disabled",
+    "negate_source": "negate-source",
+    "negate_destination": "negate-destination",
+}
+
+
+def run_stage(stage: str, jobs: list, workers: int = 1) -> list:
+    # jobs: list of (item name, function, function args)
+    # all jobs of a stage are independent, the function returns once all of them are done (stage barrier)
+    failures = []
+    if workers <= 1:
+        for item, func, func_args in jobs:
+            try:
+                ok = func(*func_args)
+            except Exception as err:
+                logger.info(f"{stage}: {item} raised {err!r}")
+                ok = False
+            if not ok:
+                failures.append(item)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(func, *func_args): item for item, func, func_args in jobs}
+            for future in as_completed(futures):
+                try:
+                    ok = future.result()
+                except Exception as err:
+                    logger.info(f"{stage}: {futures[future]} raised {err!r}")
+                    ok = False
+                if not ok:
+                    failures.append(futures[future])
+
+    logger.info(f"Stage {stage}: {len(jobs) - len(failures)}/{len(jobs)} succeeded.")
+    for item in failures:
+        logger.info(f"Stage {stage}: failed item {item}")
+    return failures
+
+
+def _members(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        value = value.get("member", [])
+    if isinstance(value, str):
+        value = [value]
+    return sorted(value)
+
+
+def _entries(response: dict) -> list:
+    # REST API list response: {"@status": "success", "result": {"@count": "2", "entry": [...]}}
+    if not response:
+        return []
+    return response.get("result", {}).get("entry", []) or []
+
+
+def policy_services(policy: dict) -> list:
+    service_list = []
+    for service in policy["service"]:
+        if isinstance(service, dict):
+            service_list.append(service["name"])
+        else:
+            service_list.append(service)
+    return service_list
+
+
+def desired_state(conf: dict) -> dict:
+    state = {"services": {}, "addresses": {}, "groups": {}, "policies": {}, "order": []}
+    for service in conf["services"]:
+        state["services"][service["name"]] = {
+            "protocol": service["protocol"],
+            "port": str(service["port"]),
+            "description": "",
+        }
+    for addr_group in conf["addr_groups"]:
+        members = []
+        for addr_object in addr_group["objects"]:
+            for addr_obj_name, addr_obj_value in addr_object.items():
+                state["addresses"][addr_obj_name] = {"ip": str(addr_obj_value).strip(), "description": ""}
+                members.append(addr_obj_name)
+        state["groups"][addr_group["name"]] = {"members": sorted(members), "description": ""}
+    for policy in conf["policies"]:
+        spec = {field: _members(policy[field]) for field in POLICY_FIELDS if field != "service"}
+        spec["service"] = sorted(policy_services(policy))
+        spec["action"] = policy["action"]
+        spec["description"] = policy["description"] or ""
+        state["policies"][policy["name"]] = spec
+        state["order"].append(policy["name"])
+    return state
+
+
+def current_state(services: dict, addresses: dict, groups: dict, policies: dict) -> dict:
+    # arguments are the display_obj_services/display_obj_addresses/display_address_groups/display_sec_policies outputs
+    state = {"services": {}, "addresses": {}, "groups": {}, "policies": {}, "order": []}
+    for entry in _entries(services):
+        protocol, settings = next(iter(entry.get("protocol", {"": {}}).items()))
+        state["services"][entry["@name"]] = {
+            "protocol": protocol,
+            "port": str(settings.get("port", "")),
+            "description": entry.get("description", ""),
+        }
+    for entry in _entries(addresses):
+        ip = entry.get("ip-netmask") or entry.get("ip-range") or entry.get("ip-wildcard") or entry.get("fqdn", "")
+        state["addresses"][entry["@name"]] = {"ip": ip, "description": entry.get("description", "")}
+    for entry in _entries(groups):
+        state["groups"][entry["@name"]] = {
+            "members": _members(entry.get("static")),
+            "description": entry.get("description", ""),
+        }
+    for entry in _entries(policies):
+        spec = {field: _members(entry.get(key)) for field, key in POLICY_FIELDS.items()}
+        spec["action"] = entry.get("action", "")
+        spec["description"] = entry.get("description", "")
+        for field, key in RULE_FLAGS.items():
+            if entry.get(key) == "yes":
+                spec[field] = "yes"
+        state["policies"][entry["@name"]] = spec
+        state["order"].append(entry["@name"])
+    return state
+
+
+def fetch_current_state(source) -> dict:
+    # source: PaClient (one GET per table) or pa_snapshot.SnapshotStore
+    return current_state(source.display_obj_services(), source.display_obj_addresses(),
+                         source.display_address_groups(), source.display_sec_policies())
+
+
+def _longest_increasing(sequence: list) -> set:
+    # indices (into sequence) of one longest strictly increasing subsequence, O(n log n)
+    tails, tails_idx, prev = [], [], [None] * len(sequence)
+    for i, value in enumerate(sequence):
+        pos = bisect_left(tails, value)
+        if pos == len(tails):
+            tails.append(value)
+            tails_idx.append(i)
+        else:
+            tails[pos] = value
+            tails_idx[pos] = i
+        prev[i] = tails_idx[pos - 1] if pos > 0 else None
+    keep = set()
+    i = tails_idx[-1] if tails_idx else None
+    while i is not None:
+        keep.add(i)
+        i = prev[i]
+    return keep
+
+
+def plan_moves(desired_order: list, current_order: list) -> list:
+    # rulebase order after the creates (new rules are appended at the bottom)
+    desired_pos = {name: pos for pos, name in enumerate(desired_order)}
+    existing = set(current_order)
+    after_create = [name for name in current_order if name in desired_pos]
+    after_create += [name for name in desired_order if name not in existing]
+    positions = [desired_pos[name] for name in after_create]
+    in_place = {after_create[i] for i in _longest_increasing(positions)}
+
+    # rules left in place are already correctly ordered, every other rule is moved right after its
+    # predecessor (processed in sheet order, so the predecessor is placed already)
+    moves = []
+    for pos, name in enumerate(desired_order):
+        if name in in_place:
+            continue
+        if pos > 0:
+            moves.append({"kind": "policy", "name": name, "where": "after", "dst": desired_order[pos - 1]})
+        else:
+            anchor = next(other for other in desired_order if other in in_place)
+            moves.append({"kind": "policy", "name": name, "where": "before", "dst": anchor})
+    return moves
+
+
+def build_plan(desired: dict, current: dict, prune_prefix: str = None) -> dict:
+    # prune_prefix: firewall objects/rules whose name starts with it and that are missing
+    # in the sheet are deleted. Without it nothing is ever deleted.
+    plan = {"create": [], "update": [], "delete": [], "move": []}
+    for kind in KINDS:
+        key = STATE_KEYS[kind]
+        for name, spec in desired[key].items():
+            if name not in current[key]:
+                plan["create"].append({"kind": kind, "name": name, "spec": spec})
+            elif current[key][name] != spec:
+                plan["update"].append({"kind": kind, "name": name, "spec": spec})
+        if prune_prefix:
+            for name in current[key]:
+                if name.startswith(prune_prefix) and name not in desired[key]:
+                    plan["delete"].append({"kind": kind, "name": name, "spec": current[key][name]})
+    plan["move"] = plan_moves(desired["order"], current["order"])
+    return plan
+
+
+def plan_size(plan: dict) -> int:
+    return sum(len(items) for items in plan.values())
+
+
+def log_plan(plan: dict) -> None:
+    upserts = f"{len(plan['upsert'])} upsert, " if "upsert" in plan else ""
+    logger.info(f"Plan: {len(plan['create'])} create, {len(plan['update'])} update, {upserts}"
+                f"{len(plan['delete'])} delete, {len(plan['move'])} move.")
+    for action in WRITE_ACTIONS + ("delete",):
+        for item in plan.get(action, []):
+            logger.info(f"  {action} {item['kind']} {item['name']}")
+    for item in plan["move"]:
+        logger.info(f"  move policy {item['name']} {item['where']} {item['dst']}")
+
+
+def _write_job(client: PaClient, action: str, item: dict) -> tuple:
+    name, spec = item["name"], item["spec"]
+    label = f"{action} {item['kind']} {name}"
+    func = getattr(client, f"{action}_{WRITE_METHODS[item['kind']]}")
+    if item["kind"] == "service":
+        return label, func, (name, spec["protocol"], spec["port"], spec["description"])
+    if item["kind"] == "address":
+        return label, func, (name, spec["ip"], spec["description"])
+    if item["kind"] == "group":
+        return label, func, (name, spec["members"], spec["description"])
+    return label, func, (name, spec["src_zone"][0], spec["src_addr"][0], spec["dst_zone"][0],
+                         spec["dst_addr"][0], spec["app"][0], spec["service"],
+                         spec["action"], spec["description"])
+
+
+def _delete_job(client: PaClient, item: dict) -> tuple:
+    func = {
+        "service": client.delete_obj_services,
+        "address": client.delete_obj_addresses,
+        "group": client.delete_address_group,
+        "policy": client.delete_sec_policy,
+    }[item["kind"]]
+    return f"delete {item['kind']} {item['name']}", func, (item["name"],)
+
+
+def execute_plan(client: PaClient, plan: dict, workers: int = 1) -> list:
+    # dependency order: objects -> groups -> policies -> moves, deletes in the reverse order
+    def writes(kinds):
+        return [_write_job(client, action, item) for action in WRITE_ACTIONS
+                for item in plan.get(action, []) if item["kind"] in kinds]
+
+    def deletes(kinds):
+        return [_delete_job(client, item) for item in plan["delete"] if item["kind"] in kinds]
+
+    failures = []
+    failures += run_stage("objects", writes(("service", "address")), workers)
+    failures += run_stage("address groups", writes(("group",)), workers)
+    # created rules are appended in creation order, keep them serial
+    failures += run_stage("policies", writes(("policy",)))
+    failures += run_stage("policy moves", [(f"move policy {m['name']}", client.move_security_policy,
+                                            (m["name"], m["where"], m["dst"])) for m in plan["move"]])
+    failures += run_stage("policy deletes", deletes(("policy",)), workers)
+    failures += run_stage("address group deletes", deletes(("group",)), workers)
+    failures += run_stage("object deletes", deletes(("service", "address")), workers)
+    return failures
@@ -0,0 +1,259 @@
+from pa_metrics import METRICS
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Request layer shared by the PAN-OS API clients (pa_api.PaClient, pa_api_async.AsyncPaClient).
+# - retries with exponential backoff and full jitter; idempotent calls are retried on 5xx and connection
+#   errors, the other calls only on 429/503 (the firewall throttled them, they were not processed) and on
+#   connection errors raised before the request was sent; "once" calls (commits: a second attempt could
+#   enqueue a second commit job) are only retried when the request was not sent
+# - adaptive token bucket per firewall: the rate is cut by DECREASE on 429/503 (at most once per second)
+#   and grows back additively with every successful call (AIMD), so parallel deploys run as fast as the
+#   management plane allows; the rate settles where the firewall throttles less than once per second
+#
+# The settings are per firewall URL, every client of the same firewall shares one layer (and one bucket).
+# Limits file (--api-limits): {"default": {"rate": 0, "retries": 4}, "https://10.12.0.40": {"rate": 20}}
+# with the DEFAULT_SETTINGS keys, anything else is a ValueError
+#
+# Every call is recorded in pa_metrics under its operation name: duration (retries and waits included),
+# final status (None: connection error), request/response bytes and retries.
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+THROTTLE_STATUS = (429, 503)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+DECREASE = 0.7
+DEFAULT_SETTINGS = {
+    "rate": 0.0,  # calls/s, 0: unlimited until the firewall throttles
+    "burst": 10,
+    "min_rate": 1.0,
+    "max_rate": 0.0,  # 0: no upper limit
+    "increase": 0.1,  # calls/s added per successful call once limited
+    "retries": 4,
+    "backoff": 0.5,  # seconds, first retry delay cap (doubled per retry)
+    "max_backoff": 30.0,
+}
+
+
+class RateLimiter:
+    # token bucket; reserve() takes a token and returns how long the caller must wait for it,
+    # so the same bucket serves threads (time.sleep) and coroutines (asyncio.sleep)
+    def __init__(self, rate: float = 0.0, burst: int = 10, min_rate: float = 1.0, max_rate: float = 0.0,
+                 increase: float = 0.1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.throttled_at = 0.0
+        # calls granted during the current/previous second, the starting point when an unlimited bucket is throttled
+        self.window_start = self.updated
+        self.window_count = 0
+        self.observed_rate = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.observed_rate = self.window_count / (now - self.window_start)
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            if self.rate <= 0:
+                return 0.0
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def on_throttle(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            # the answers to one burst arrive together, they count as one congestion signal
+            if now - self.throttled_at < 1:
+                return
+            self.throttled_at = now
+            current = self.rate if self.rate > 0 else max(self.observed_rate, self.window_count, 2 * self.min_rate)
+            self.rate = max(self.min_rate, current * DECREASE)
+            self.tokens = min(self.tokens, 0.0)
+            logger.info(f"Firewall throttling, API rate limited to {self.rate:.1f} calls/s.")
+
+    def on_success(self) -> None:
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self.rate += self.increase
+            if self.max_rate > 0:
+                self.rate = min(self.rate, self.max_rate)
+
+
+class RequestLayer:
+    def __init__(self, rate: float = 0.0, burst: int = 10, min_rate: float = 1.0, max_rate: float = 0.0,
+                 increase: float = 0.1, retries: int = 4, backoff: float = 0.5, max_backoff: float = 30.0) -> None:
+        self.limiter = RateLimiter(rate, burst, min_rate, max_rate, increase)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0}
+        # the layer is shared by the threads (and the event loop) calling the same firewall
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def retry_delay(self, attempt: int, retry_after: str = None) -> float:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    def _retry(self, attempt: int, idempotent: bool, status: int = None, once: bool = False,
+               sent: bool = True) -> bool:
+        # sent: False for a connection error raised before the request reached the firewall
+        if attempt >= self.retries:
+            return False
+        if once:
+            return status is None and not sent
+        if status is None:  # connection error
+            return idempotent or not sent
+        return status in THROTTLE_STATUS or (idempotent and status in RETRY_STATUS)
+
+    def _done(self, status: int) -> None:
+        self._count("calls")
+        if status in THROTTLE_STATUS:
+            self._count("throttled")
+            self.limiter.on_throttle()
+        elif status is not None and status < 500:
+            self.limiter.on_success()
+
+    def send(self, request, method: str, idempotent: bool = None, errors: tuple = (), operation: str = None,
+             request_bytes: int = 0, stream: bool = False, once: bool = False, not_sent=None):
+        # request(): one blocking attempt returning a requests.Response
+        # stream: the body is not read here, the response size comes from Content-Length only
+        # not_sent(error): True when the connection error was raised before the request was sent
+        idempotent = method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        operation = operation or method
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve()
+            if wait:
+                time.sleep(wait)
+            sent = True
+            try:
+                response = request()
+                status, retry_after = response.status_code, response.headers.get("Retry-After")
+            except errors as err:
+                error, status, retry_after = err, None, None
+                sent = not (not_sent and not_sent(err))
+            self._done(status)
+            if not self._retry(attempt, idempotent, status, once, sent):
+                response_bytes = 0
+                if status is not None:
+                    response_bytes = int(response.headers.get("Content-Length") or 0)
+                    if not response_bytes and not stream:
+                        response_bytes = len(response.content)
+                METRICS.record_call(operation, status, time.perf_counter() - started, request_bytes, response_bytes,
+                                    attempt)
+                if status is None:
+                    raise error
+                return response
+            delay = self.retry_delay(attempt, retry_after)
+            logger.info(f"{method} failed ({status or repr(error)}), retry {attempt + 1}/{self.retries} "
+                        f"in {delay:.1f}s")
+            if status is not None:
+                response.close()
+            self._count("retries")
+            attempt += 1
+            time.sleep(delay)
+
+    async def send_async(self, request, method: str, idempotent: bool = None, errors: tuple = (),
+                         operation: str = None, request_bytes: int = 0, once: bool = False, not_sent=None):
+        # request(): coroutine doing one attempt, returning (status, text, headers)
+        idempotent = method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        operation = operation or method
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+            sent = True
+            try:
+                status, text, headers = await request()
+                retry_after = headers.get("Retry-After")
+            except errors as err:
+                error, status, retry_after = err, None, None
+                sent = not (not_sent and not_sent(err))
+            self._done(status)
+            if not self._retry(attempt, idempotent, status, once, sent):
+                response_bytes = len(text.encode()) if status is not None else 0
+                METRICS.record_call(operation, status, time.perf_counter() - started, request_bytes, response_bytes,
+                                    attempt)
+                if status is None:
+                    raise error
+                return status, text, headers
+            delay = self.retry_delay(attempt, retry_after)
+            logger.info(f"{method} failed ({status or repr(error)}), retry {attempt + 1}/{self.retries} "
+                        f"in {delay:.1f}s")
+            self._count("retries")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+_settings = {"default": dict(DEFAULT_SETTINGS)}
+_layers = {}
+_layers_lock = threading.Lock()
+
+
+def check_settings(pa_url: str, settings: dict) -> None:
+    unknown = sorted(set(settings) - set(DEFAULT_SETTINGS))
+    if unknown:
+        raise ValueError(f"Unknown API limit setting(s) for {pa_url}: {', '.join(unknown)} "
+                         f"(expected: {', '.join(DEFAULT_SETTINGS)})")
+    for key, value in settings.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"API limit setting {key} for {pa_url} must be a number >= 0, not {value!r}")
+
+
+def configure_firewall(pa_url: str, **settings) -> None:
+    # pa_url "default" sets the defaults of every firewall without its own settings
+    check_settings(pa_url, settings)
+    with _layers_lock:
+        _settings[pa_url] = dict(_settings.get(pa_url, _settings["default"]), **settings)
+        if pa_url == "default":
+            _layers.clear()
+        else:
+            _layers.pop(pa_url, None)
+
+
+def load_api_limits(path: str) -> None:
+    with open(path) as limits_file:
+        limits = json.load(limits_file)
+    if not isinstance(limits, dict) or not all(isinstance(settings, dict) for settings in limits.values()):
+        raise ValueError(f"{path}: expected {{\"default\" or firewall URL: {{setting: value}}}}")
+    if "default" in limits:
+        configure_firewall("default", **limits.pop("default"))
+    for pa_url, settings in limits.items():
+        configure_firewall(pa_url, **settings)
+
+
+def get_request_layer(pa_url: str) -> RequestLayer:
+    with _layers_lock:
+        layer = _layers.get(pa_url)
+        if layer is None:
+            layer = RequestLayer(**_settings.get(pa_url, _settings["default"]))
+            _layers[pa_url] = layer
+        return layer
@@ -0,0 +1,162 @@
+from bisect import bisect_right
+import ipaddress
+
+# Resolution of the names used in security rules into integer IP ranges and port ranges,
+# shared by the rulebase analyzers.
+# Objects come from a pa_plan state (desired_state() for the sheet, current_state() for the firewall).
+#
+# address ranges: [(ip version, first int, last int), ...] merged and sorted
+# port ranges:    {"tcp": [(first, last), ...], "udp": [...]} merged and sorted
+
+ANY = "any"
+APP_DEFAULT = "application-default"
+
+# predefined PAN-OS services
+PREDEFINED_SERVICES = {
+    "service-http": {"tcp": [(80, 80), (8080, 8080)]},
+    "service-https": {"tcp": [(443, 443)]},
+}
+
+
+def merge_ranges(ranges: list) -> list:
+    # sorted, overlapping or adjacent ranges merged; works for (version, first, last) and (first, last)
+    merged = []
+    for rng in sorted(ranges):
+        if merged and merged[-1][:-2] == rng[:-2] and rng[-2] <= merged[-1][-1] + 1:
+            if rng[-1] > merged[-1][-1]:
+                merged[-1] = merged[-1][:-1] + (rng[-1],)
+        else:
+            merged.append(tuple(rng))
+    return merged
+
+
+def ranges_cover(outer: list, inner: list) -> bool:
+    # every inner range lies inside one outer range (both merged/sorted)
+    for rng in inner:
+        pos = bisect_right(outer, rng[:-1] + (float("inf"),)) - 1
+        if pos < 0:
+            return False
+        candidate = outer[pos]
+        if candidate[:-2] != rng[:-2] or candidate[-2] > rng[-2] or candidate[-1] < rng[-1]:
+            return False
+    return True
+
+
+def complement_ranges(ranges: list) -> list:
+    # merged (version, first, last) ranges -> the IPv4 and IPv6 addresses outside of them, merged
+    result = []
+    for version, bits in ((4, 32), (6, 128)):
+        start = 0
+        for rng_version, first, last in ranges:
+            if rng_version != version:
+                continue
+            if first > start:
+                result.append((version, start, first - 1))
+            start = last + 1
+        if start <= (1 << bits) - 1:
+            result.append((version, start, (1 << bits) - 1))
+    return result
+
+
+def ip_range(value: str) -> tuple:
+    # "10.0.0.0/24", "10.0.0.1", "10.0.0.1-10.0.0.9" -> (version, first, last), None if not an IP value
+    value = str(value).strip()
+    try:
+        if "-" in value:
+            first, last = (ipaddress.ip_address(part.strip()) for part in value.split("-", 1))
+            if first.version != last.version or first > last:
+                return None
+            return first.version, int(first), int(last)
+        network = ipaddress.ip_network(value, strict=False)
+        return network.version, int(network.network_address), int(network.broadcast_address)
+    except ValueError:
+        return None
+
+
+def port_ranges(port: str) -> list:
+    # "80", "80,443", "1000-2000" -> [(first, last), ...], None if not parsable
+    ranges = []
+    for part in str(port).replace(" ", "").split(","):
+        if not part:
+            continue
+        try:
+            first, _, last = part.partition("-")
+            first, last = int(first), int(last or first)
+        except ValueError:
+            return None
+        if not 0 <= first <= last <= 65535:
+            return None
+        ranges.append((first, last))
+    return merge_ranges(ranges)
+
+
+class AddressBook:
+    # resolves address object/group names (or literal IPs) to merged IP ranges
+    def __init__(self, addresses: dict, groups: dict) -> None:
+        # addresses: {name: {"ip": ...}}, groups: {name: {"members": [...]}}
+        self.objects = {name: ip_range(spec["ip"]) for name, spec in addresses.items()}
+        self.groups = {name: spec["members"] for name, spec in groups.items()}
+        self._cache = {}
+
+    def resolve(self, names: list):
+        # ANY, a merged range list, or None when a name cannot be resolved (fqdn, dynamic group, unknown)
+        ranges = []
+        for name in names:
+            if name == ANY:
+                return ANY
+            resolved = self._resolve_name(name, set())
+            if resolved is None:
+                return None
+            ranges.extend(resolved)
+        # an empty group matches nothing, there is nothing to compare
+        return merge_ranges(ranges) or None
+
+    def _resolve_name(self, name: str, seen: set):
+        if name in self._cache:
+            return self._cache[name]
+        if name in self.objects:
+            result = [self.objects[name]] if self.objects[name] else None
+        elif name in self.groups and name not in seen:
+            result = []
+            for member in self.groups[name]:
+                resolved = self._resolve_name(member, seen | {name})
+                if resolved is None:
+                    result = None
+                    break
+                result.extend(resolved)
+        else:
+            literal = ip_range(name)
+            result = [literal] if literal else None
+        self._cache[name] = result
+        return result
+
+
+class ServiceBook:
+    # resolves service names to {protocol: merged port ranges}
+    def __init__(self, services: dict) -> None:
+        # services: {name: {"protocol": "tcp", "port": "80,443"}}
+        self.services = dict(PREDEFINED_SERVICES)
+        for name, spec in services.items():
+            ports = port_ranges(spec["port"])
+            self.services[name] = {spec["protocol"]: ports} if ports else None
+
+    def resolve(self, names: list):
+        # ANY, APP_DEFAULT, {protocol: ranges}, or None when a name cannot be resolved
+        resolved = {}
+        for name in names:
+            if name in (ANY, APP_DEFAULT):
+                return name
+            protocols = self.services.get(name)
+            if protocols is None:
+                return None
+            for protocol, ports in protocols.items():
+                resolved.setdefault(protocol, []).extend(ports)
+        return {protocol: merge_ranges(ports) for protocol, ports in resolved.items()} or None
+
+
+def services_cover(outer, inner) -> bool:
+    if outer == ANY:
+        return True
+    if inner == ANY or outer == APP_DEFAULT or inner == APP_DEFAULT:
+        return outer == inner
+    return all(protocol in outer and ranges_cover(outer[protocol], ports) for protocol, ports in inner.items())
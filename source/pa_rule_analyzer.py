@@ -0,0 +1,303 @@
+from dataclasses import dataclass
+from heapq import merge
+from pa_api import PaClient
+from config_cache import load_parsed
+from excel_api import check_template
+from pa_plan import desired_state, fetch_current_state, STATE_KEYS
+from pa_resolve import ANY, APP_DEFAULT, AddressBook, ServiceBook, complement_ranges, ranges_cover, services_cover
+import argparse
+import json
+import logging
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Shadowed/redundant rule analyzer.
+# A rule never matches when an earlier rule covers all its zones, addresses, applications and services:
+#   shadowed  - the earlier rule has a different action (the traffic is handled differently than intended)
+#   redundant - the earlier rule has the same action (the rule can be removed)
+#   duplicate - same match criteria and action as the earlier rule
+#
+# Rules are analyzed in rulebase order against indexes of the rules before them, instead of comparing
+# every pair. Every rule is registered under its zone pairs, its applications, for the source and the
+# destination the smallest CIDR containing all its addresses, and per protocol the smallest aligned port
+# block containing its ports. Only a rule registered under "any", under the same zone pair/application or
+# under one of the (at most 33/129) CIDRs or 17 port blocks containing the checked rule's CIDR/block can
+# cover it, so each rule is only compared with the rules of its smallest candidate bucket.
+# Disabled rules are left out, negate-source/negate-destination rules match the complement of their addresses.
+
+MIXED = "mixed"  # addresses of both IP versions, no single covering CIDR
+ADDRESS_BITS = {4: 32, 6: 128}
+PORT_BITS = 16
+FINDING_TYPES = ("shadowed", "redundant", "duplicate")
+
+
+@dataclass
+class Rule:
+    position: int
+    name: str
+    action: str
+    from_zones: object  # ANY or frozenset
+    to_zones: object
+    src: object  # ANY or merged IP ranges
+    dst: object
+    apps: object
+    services: object  # ANY, application-default or {protocol: port ranges}
+    unresolved: bool = False  # compile_rules(unresolved_as_any=True): the unresolved fields are ANY
+
+    def match_key(self) -> tuple:
+        services = self.services if isinstance(self.services, str) else sorted(self.services.items())
+        return self.from_zones, self.to_zones, tuple(self.src), tuple(self.dst), self.apps, repr(services)
+
+    def covers(self, other: "Rule") -> bool:
+        return (_set_covers(self.from_zones, other.from_zones) and _set_covers(self.to_zones, other.to_zones)
+                and _set_covers(self.apps, other.apps) and _addresses_cover(self.src, other.src)
+                and _addresses_cover(self.dst, other.dst) and services_cover(self.services, other.services))
+
+
+def _names(members: list):
+    return ANY if ANY in members else frozenset(members)
+
+
+def _set_covers(outer, inner) -> bool:
+    return outer == ANY or (inner != ANY and outer >= inner)
+
+
+def _addresses_cover(outer, inner) -> bool:
+    return outer == ANY or (inner != ANY and ranges_cover(outer, inner))
+
+
+def _negate(ranges):
+    # negate-source/negate-destination: every address but the ranges ([] for "any": the rule matches nothing)
+    if ranges is None:
+        return None
+    return [] if ranges == ANY else complement_ranges(ranges)
+
+
+def compile_rules(state: dict, unresolved_as_any: bool = False) -> tuple:
+    # pa_plan state -> ([Rule, ...] in rulebase order, [names of the rules that cannot be resolved])
+    # disabled rules (and negated "any" addresses) never match, they are left out
+    # unresolved_as_any: keep the unresolved rules, their unresolved address/service fields matching anything
+    addresses = AddressBook(state["addresses"], state["groups"])
+    services = ServiceBook(state["services"])
+    rules, skipped = [], []
+    for position, name in enumerate(state["order"]):
+        spec = state["policies"][name]
+        if spec.get("disabled") == "yes":
+            continue
+        src = addresses.resolve(spec["src_addr"])
+        dst = addresses.resolve(spec["dst_addr"])
+        if spec.get("negate_source") == "yes":
+            src = _negate(src)
+        if spec.get("negate_destination") == "yes":
+            dst = _negate(dst)
+        if src == [] or dst == []:
+            continue
+        service = services.resolve(spec["service"])
+        unresolved = src is None or dst is None or service is None
+        if unresolved:
+            skipped.append(name)
+            if not unresolved_as_any:
+                continue
+            src, dst, service = (ANY if value is None else value for value in (src, dst, service))
+        rules.append(Rule(position, name, spec["action"], _names(spec["src_zone"]), _names(spec["dst_zone"]),
+                          src, dst, _names(spec["app"]), service, unresolved))
+    return rules, skipped
+
+
+def prefix_key(ranges) -> tuple:
+    # smallest CIDR (version, prefix length, network bits) containing all the ranges
+    if ranges == ANY:
+        return ANY
+    versions = {rng[0] for rng in ranges}
+    if len(versions) > 1:
+        return MIXED
+    version = versions.pop()
+    bits = ADDRESS_BITS[version]
+    first, last = ranges[0][1], ranges[-1][2]
+    prefix_len = bits - (first ^ last).bit_length()
+    return version, prefix_len, first >> (bits - prefix_len)
+
+
+def port_key(protocol: str, ranges: list) -> tuple:
+    # smallest aligned port block (protocol, prefix length, block) containing all the ranges
+    first, last = ranges[0][0], ranges[-1][1]
+    prefix_len = PORT_BITS - (first ^ last).bit_length()
+    return protocol, prefix_len, first >> (PORT_BITS - prefix_len)
+
+
+def prefix_ancestors(key) -> list:
+    # CIDR or port block key -> the keys of the blocks containing it, itself included
+    if key in (ANY, MIXED):
+        return []
+    version, prefix_len, network = key
+    return [(version, length, network >> (prefix_len - length)) for length in range(prefix_len + 1)]
+
+
+class RuleIndex:
+    def __init__(self) -> None:
+        self.buckets = {dimension: {} for dimension in ("zones", "app", "src", "dst", "service")}
+
+    def add(self, rule: Rule) -> None:
+        for from_zone in _values(rule.from_zones):
+            for to_zone in _values(rule.to_zones):
+                self.buckets["zones"].setdefault((from_zone, to_zone), []).append(rule)
+        for app in _values(rule.apps):
+            self.buckets["app"].setdefault(app, []).append(rule)
+        self.buckets["src"].setdefault(prefix_key(rule.src), []).append(rule)
+        self.buckets["dst"].setdefault(prefix_key(rule.dst), []).append(rule)
+        if isinstance(rule.services, str):
+            self.buckets["service"].setdefault(rule.services, []).append(rule)
+        else:
+            for protocol, ranges in rule.services.items():
+                self.buckets["service"].setdefault(port_key(protocol, ranges), []).append(rule)
+
+    def _zone_buckets(self, rule: Rule) -> list:
+        # a covering rule is registered under every zone pair of the checked rule (or under "any"),
+        # the zone pair with the smallest buckets is enough
+        buckets = self.buckets["zones"]
+        options = []
+        for from_zone in _values(rule.from_zones):
+            for to_zone in _values(rule.to_zones):
+                keys = {(from_zone, to_zone), (ANY, to_zone), (from_zone, ANY), (ANY, ANY)}
+                options.append([buckets[key] for key in keys if key in buckets])
+        return min(options, key=_size)
+
+    def _app_buckets(self, apps) -> list:
+        buckets = self.buckets["app"]
+        if apps == ANY:
+            return [buckets.get(ANY, [])]
+        return [buckets.get(ANY, []), min((buckets.get(app, []) for app in apps), key=len)]
+
+    def _address_buckets(self, dimension: str, ranges) -> list:
+        buckets = self.buckets[dimension]
+        keys = [ANY]
+        if ranges != ANY:
+            keys.append(MIXED)
+            keys += prefix_ancestors(prefix_key(ranges))
+        return [buckets[key] for key in keys if key in buckets]
+
+    def _service_buckets(self, services) -> list:
+        # "any" covers every service, application-default only itself; a port rule is covered on each of
+        # its protocols, the protocol with the smallest buckets is enough
+        buckets = self.buckets["service"]
+        if services == ANY:
+            return [buckets.get(ANY, [])]
+        if services == APP_DEFAULT:
+            return [buckets.get(ANY, []), buckets.get(APP_DEFAULT, [])]
+        options = []
+        for protocol, ranges in services.items():
+            keys = prefix_ancestors(port_key(protocol, ranges))
+            options.append([buckets.get(ANY, [])] + [buckets[key] for key in keys if key in buckets])
+        return min(options, key=_size)
+
+    def candidates(self, rule: Rule):
+        # earlier rules that may cover the rule, in rulebase order
+        options = [
+            self._zone_buckets(rule),
+            self._app_buckets(rule.apps),
+            self._address_buckets("src", rule.src),
+            self._address_buckets("dst", rule.dst),
+            self._service_buckets(rule.services),
+        ]
+        smallest = [bucket for bucket in min(options, key=_size) if bucket]
+        if len(smallest) == 1:
+            return smallest[0]
+        return merge(*smallest, key=lambda candidate: candidate.position)
+
+
+def _values(names) -> list:
+    return [ANY] if names == ANY else names
+
+
+def _size(buckets: list) -> int:
+    return sum(len(bucket) for bucket in buckets)
+
+
+def analyze(state: dict, sheet_rules: set = None) -> dict:
+    # state: pa_plan state of the rulebase to analyze, sheet_rules: names of the rules coming from the sheet
+    sheet_rules = sheet_rules or set()
+    rules, skipped = compile_rules(state)
+    index = RuleIndex()
+    findings = []
+    for rule in rules:
+        for earlier in index.candidates(rule):
+            if earlier.covers(rule):
+                if earlier.action != rule.action:
+                    finding_type = "shadowed"
+                elif earlier.match_key() == rule.match_key():
+                    finding_type = "duplicate"
+                else:
+                    finding_type = "redundant"
+                findings.append({
+                    "rule": rule.name,
+                    "type": finding_type,
+                    "covered_by": earlier.name,
+                    "action": rule.action,
+                    "covered_by_action": earlier.action,
+                    "sheet": rule.name in sheet_rules,
+                })
+                break
+        index.add(rule)
+    return {"rules": len(state["order"]), "skipped": skipped, "findings": findings}
+
+
+def combined_state(desired: dict, current: dict) -> dict:
+    # the rulebase as it will be after the deployment: sheet objects replace the firewall ones with the
+    # same name, sheet rules keep the position of the existing rule or are appended at the bottom
+    state = {key: {**current[key], **desired[key]} for key in STATE_KEYS.values()}
+    state["order"] = current["order"] + [name for name in desired["order"] if name not in current["policies"]]
+    return state
+
+
+def analyze_deployment(conf: dict, source) -> dict:
+    # conf: create_config() output, source: PaClient or pa_snapshot.SnapshotStore
+    desired = desired_state(conf)
+    return analyze(combined_state(desired, fetch_current_state(source)), set(desired["order"]))
+
+
+def sheet_findings(report: dict) -> list:
+    return [finding for finding in report["findings"] if finding["sheet"]]
+
+
+def log_report(report: dict) -> None:
+    counts = {finding_type: 0 for finding_type in FINDING_TYPES}
+    for finding in report["findings"]:
+        counts[finding["type"]] += 1
+        logger.info(f"{finding['type']}: {'sheet ' if finding['sheet'] else ''}rule {finding['rule']} "
+                    f"({finding['action']}) is covered by {finding['covered_by']} ({finding['covered_by_action']})")
+    if report["skipped"]:
+        logger.info(f"Not analyzed (unresolved address/service): {', '.join(report['skipped'])}")
+    logger.info(f"Rule analysis: {report['rules']} rules, "
+                + ", ".join(f"{count} {finding_type}" for finding_type, count in counts.items()) + ".")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pa_api_url", type=str, help="PA API URL")
+    parser.add_argument("pa_api_key", type=str, help="PA API key")
+    parser.add_argument("--excel", nargs=2, metavar=("EX_FILE_PATH", "EX_SHEET"), default=None,
+                        help="Also analyze the rules this customer workbook would add")
+    parser.add_argument("--report", type=str, default=None, help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    with PaClient(args.pa_api_url, args.pa_api_key) as client:
+        if args.excel:
+            parsed = load_parsed(*args.excel)
+            check_template(parsed["valid"])
+            conf = parsed["config"]
+            report = analyze_deployment(conf, client)
+        else:
+            report = analyze(fetch_current_state(client))
+    log_report(report)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    if sheet_findings(report):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
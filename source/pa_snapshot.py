@@ -0,0 +1,102 @@
+from pa_api import PaClient
+import hashlib
+import json
+import logging
+import os
+import time
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Local snapshot of the live firewall tables (display_* outputs), keyed by firewall URL and vsys
+# (PaClient.scope: the device group/shared location and rulebase on Panorama).
+# The tools needing the current objects/rules (current config, diff, analyzers) read the snapshot
+# instead of downloading the tables again. The snapshot is refreshed when it is older than the TTL
+# or when the config version (id of the last finished commit job, one cheap "show jobs" call) changed.
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pa_customer_rules", "snapshots")
+DEFAULT_TTL = 300  # seconds
+TABLES = {
+    "services": "display_obj_services",
+    "addresses": "display_obj_addresses",
+    "groups": "display_address_groups",
+    "policies": "display_sec_policies",
+}
+
+
+class SnapshotStore:
+    # exposes the same display_* methods as PaClient, so it can be used in place of the client
+    def __init__(self, client: PaClient, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR, ttl: float = DEFAULT_TTL) -> None:
+        self.client = client
+        self.snapshot_dir = snapshot_dir
+        self.ttl = ttl
+        key = hashlib.sha256(f"{client.pa_url}\0{client.scope}".encode()).hexdigest()
+        self.path = os.path.join(snapshot_dir, key + ".json")
+        self.snapshot = None
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as snapshot_file:
+                return json.load(snapshot_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, snapshot: dict) -> None:
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, version: str = None) -> dict:
+        logger.info("Refreshing the firewall config snapshot...")
+        snapshot = {
+            "pa_url": self.client.pa_url,
+            "vsys": self.client.scope,
+            "version": version if version is not None else self.client.config_version(),
+            "fetched": time.time(),
+            "tables": {table: getattr(self.client, display)() for table, display in TABLES.items()},
+        }
+        if all(value is not None for value in snapshot["tables"].values()):
+            self._write(snapshot)
+        self.snapshot = snapshot
+        return snapshot
+
+    def get(self) -> dict:
+        if self.snapshot is not None:
+            return self.snapshot
+        snapshot = self._read()
+        if snapshot is None:
+            return self.refresh()
+        if time.time() - snapshot["fetched"] > self.ttl:
+            logger.info("Firewall config snapshot expired.")
+            return self.refresh()
+        version = self.client.config_version()
+        # unknown version (no commit job history): the TTL alone decides
+        if version is not None and version != snapshot["version"]:
+            logger.info(f"Firewall config changed ({snapshot['version']} -> {version}).")
+            return self.refresh(version)
+        logger.info(f"Using the firewall config snapshot from {time.ctime(snapshot['fetched'])}.")
+        self.snapshot = snapshot
+        return snapshot
+
+    def invalidate(self) -> None:
+        # call after pushing changes, the next get() downloads the tables again
+        self.snapshot = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def display_obj_services(self) -> dict:
+        return self.get()["tables"]["services"]
+
+    def display_obj_addresses(self) -> dict:
+        return self.get()["tables"]["addresses"]
+
+    def display_address_groups(self) -> dict:
+        return self.get()["tables"]["groups"]
+
+    def display_sec_policies(self) -> dict:
+        return self.get()["tables"]["policies"]
@@ -0,0 +1,105 @@
+from pa_api import PaClient
+from pa_plan import KINDS, STATE_KEYS, WRITE_ACTIONS, plan_moves
+import hashlib
+import json
+import logging
+import os
+
+# logger will return the source module name
+logger = logging.getLogger(__name__)
+# display logging info level
+logging.basicConfig(level=logging.INFO)
+
+# Incremental re-deploy (--state-file): after each committed deploy, a fingerprint of every service,
+# address, group and policy of the sheet (pa_plan desired state) is stored with the sheet rule order.
+# The next run only pushes the items whose fingerprint changed or that are new (upsert, the firewall
+# tables are not downloaded), deletes the items that disappeared from the sheet and moves the rules
+# whose position among the sheet rules changed.
+# Items that failed keep their previous fingerprint (or none), so the next run retries them.
+#
+# {"version": 1, "pa_url": ..., "vsys": PaClient.scope, "fingerprints": {"policy": {name: sha256}, ...}, "order": [...]}
+#
+# Changes made on the firewall outside of this tool are not seen; --plan compares with the firewall
+# and refreshes the state file.
+
+STATE_FILE_VERSION = 1
+
+
+def fingerprint(spec: dict) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def state_fingerprints(desired: dict) -> dict:
+    return {kind: {name: fingerprint(spec) for name, spec in desired[STATE_KEYS[kind]].items()} for kind in KINDS}
+
+
+def empty_state() -> dict:
+    return {"fingerprints": {kind: {} for kind in KINDS}, "order": []}
+
+
+def load_state_file(path: str, client: PaClient) -> dict:
+    # a missing, unreadable or other firewall's state file is an empty state: every item is pushed
+    try:
+        with open(path) as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        logger.info(f"No deploy state in {path}.")
+        return empty_state()
+    if state.get("version") != STATE_FILE_VERSION or (state.get("pa_url"), state.get("vsys")) != (client.pa_url,
+                                                                                                   client.scope):
+        logger.info(f"The deploy state {path} is for another firewall/vsys or version, ignored.")
+        return empty_state()
+    state["fingerprints"] = {kind: state["fingerprints"].get(kind, {}) for kind in KINDS}
+    return state
+
+
+def incremental_plan(desired: dict, previous: dict, action: str = "upsert") -> dict:
+    # action: "upsert", or "create" with --create-only
+    plan = {write_action: [] for write_action in WRITE_ACTIONS}
+    plan["delete"] = []
+    current = state_fingerprints(desired)
+    for kind in KINDS:
+        known = previous["fingerprints"][kind]
+        for name, spec in desired[STATE_KEYS[kind]].items():
+            if known.get(name) != current[kind][name]:
+                plan[action].append({"kind": kind, "name": name, "spec": spec})
+        for name in known:
+            if name not in current[kind]:
+                plan["delete"].append({"kind": kind, "name": name, "spec": {}})
+    plan["move"] = plan_moves(desired["order"], [name for name in previous["order"] if name in desired["policies"]])
+    return plan
+
+
+def failed_items(plan: dict, failures: list) -> tuple:
+    # run_stage() failure labels -> ({(kind, name)} of the failed writes/deletes, a rule move failed)
+    labels = set(failures)
+    failed = {(item["kind"], item["name"]) for action in WRITE_ACTIONS + ("delete",) for item in plan.get(action, [])
+              if f"{action} {item['kind']} {item['name']}" in labels}
+    moves_failed = any(f"move policy {item['name']}" in labels for item in plan["move"])
+    return failed, moves_failed
+
+
+def save_state_file(path: str, client: PaClient, desired: dict, previous: dict, plan: dict, failures: list) -> None:
+    failed, moves_failed = failed_items(plan, failures)
+    fingerprints = state_fingerprints(desired)
+    for kind, name in failed:
+        if name in previous["fingerprints"][kind]:
+            fingerprints[kind][name] = previous["fingerprints"][kind][name]
+        else:
+            fingerprints[kind].pop(name, None)
+    state = {
+        "version": STATE_FILE_VERSION,
+        "pa_url": client.pa_url,
+        "vsys": client.scope,
+        "fingerprints": fingerprints,
+        # the rule order is only known once every move succeeded
+        "order": previous["order"] if moves_failed else desired["order"],
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as state_file:
+        json.dump(state, state_file, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    logger.info(f"Deploy state saved to {path} ({sum(len(names) for names in fingerprints.values())} items, "
+                f"{len(failed)} failed item(s) to retry).")
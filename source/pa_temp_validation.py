@@ -1,15 +1,35 @@
-from excel_api import validate_template
+from excel_api import check_template
+from config_cache import load_parsed, DEFAULT_CACHE_DIR
+from customer_configs import is_multi_path, load_customer_configs
 import argparse
+import json
 
 parser = argparse.ArgumentParser()
-parser.add_argument("ex_file_path", type=str, help="Excel file path")
+parser.add_argument("ex_file_path", type=str, help="Excel file path, or a directory / quoted glob of customer workbooks")
 parser.add_argument("ex_sheet", type=str, help="Excel sheet name")
+parser.add_argument("--config-out", type=str, default=None,
+                    help="Also write the parsed config (JSON) to this file, for pa_deploy_policies.py --config-json")
+parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Parsed template cache directory")
+parser.add_argument("--no-cache", action="store_true", help="Always parse the workbook")
 args = parser.parse_args()
 
 
 def main() -> None:
-    validate_template(args.ex_file_path, args.ex_sheet)
+    if is_multi_path(args.ex_file_path):
+        # every workbook is validated, then merged into one config
+        config = load_customer_configs(args.ex_file_path, args.ex_sheet, args.cache_dir, not args.no_cache)
+        if args.config_out:
+            with open(args.config_out, "w") as config_file:
+                json.dump(config, config_file, indent=2)
+        return
+
+    # the workbook is parsed once (or not at all on a cache hit) for the validation and the config extraction
+    parsed = load_parsed(args.ex_file_path, args.ex_sheet, args.cache_dir, not args.no_cache)
+    check_template(parsed["valid"])
+    if args.config_out:
+        with open(args.config_out, "w") as config_file:
+            json.dump(parsed["config"], config_file, indent=2)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,79 @@
+from pa_resolve import merge_ranges, port_ranges
+import hashlib
+import re
+
+# Service model of the "Service" sheet column.
+# A cell holds one "protocol_ports" item per line, ports are single ports, ranges and comma lists:
+#   tcp_7700            tcp_7700-7800       tcp_80,443,8000-8080
+# All the items of a cell are compiled into sorted port interval sets per protocol, adjacent and
+# overlapping ports are merged, and one service object is created per protocol.
+
+PROTOCOLS = ("tcp", "udp", "sctp")
+SPECIAL_SERVICES = ("application-default", "any")
+MAX_NAME_LENGTH = 63  # PAN-OS object name limit
+MAX_PORT_LENGTH = 1023  # PAN-OS service port field limit
+
+
+def parse_service_cell(service: str) -> dict:
+    # "tcp_7700\ntcp_7701\nudp_123-222" -> {"tcp": [(7700, 7701)], "udp": [(123, 222)]}
+    ports = {}
+    for item in re.split(r"[\s;]+", str(service).strip()):
+        if not item:
+            continue
+        protocol, _, port = item.partition("_")
+        protocol = protocol.lower()
+        ranges = port_ranges(port) if port else None
+        if protocol not in PROTOCOLS or not ranges:
+            raise ValueError(f"Invalid service '{item}', expected protocol_port (e.g. tcp_443, udp_123-222)")
+        ports.setdefault(protocol, []).extend(ranges)
+    return {protocol: merge_ranges(ranges) for protocol, ranges in sorted(ports.items())}
+
+
+def format_ports(ranges: list) -> str:
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def service_name(protocol: str, port: str) -> str:
+    # tcp_443, udp_123-222, tcp_80_443_8000-8080; too long names keep a prefix and a hash of the ports
+    name = f"{protocol}_{port.replace(',', '_')}"
+    if len(name) > MAX_NAME_LENGTH:
+        digest = hashlib.sha1(port.encode()).hexdigest()[:8]
+        name = f"{name[:MAX_NAME_LENGTH - len(digest) - 1].rstrip('_')}_{digest}"
+    return name
+
+
+def _port_chunks(ranges: list) -> list:
+    # port strings within the PAN-OS port field limit
+    chunks, current = [], []
+    for rng in ranges:
+        if current and len(format_ports(current + [rng])) > MAX_PORT_LENGTH:
+            chunks.append(format_ports(current))
+            current = []
+        current.append(rng)
+    if current:
+        chunks.append(format_ports(current))
+    return chunks
+
+
+def service_objects(service: str) -> list:
+    # sheet cell -> [{"name": ..., "protocol": ..., "port": ...}], the fewest objects for the cell
+    objects = []
+    for protocol, ranges in parse_service_cell(service).items():
+        for port in _port_chunks(ranges):
+            objects.append({"name": service_name(protocol, port), "protocol": protocol, "port": port})
+    return objects
+
+
+def service_conflicts(services: list, firewall: dict) -> list:
+    # services: create_config() services, firewall: current_state()["services"]
+    # a service with the name of an existing one but other ports would change the rules already using it
+    conflicts = []
+    for service in services:
+        existing = firewall.get(service["name"])
+        if existing is None:
+            continue
+        if (existing["protocol"] != service["protocol"]
+                or port_ranges(existing["port"]) != port_ranges(service["port"])):
+            conflicts.append(f"service {service['name']}: {service['protocol']}/{service['port']} in the sheet, "
+                             f"{existing['protocol']}/{existing['port']} on the firewall")
+    return conflicts
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import unittest
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from pa_api import PaClient  # noqa: E402
+from pa_mock_server import start_mock_server  # noqa: E402
+
+# python -m unittest discover tests
+
+
+def sheet_config(group_members: dict, rule_services: list) -> dict:
+    # create_config() output: one group, one rule from the group to any
+    return {
+        "services": [{"name": name, "protocol": "tcp", "port": port} for name, port in rule_services],
+        "addr_groups": [{"name": "web", "objects": [{name: ip} for name, ip in group_members.items()]}],
+        "policies": [{"name": "allow-web", "src_zone": "trust", "src_addr": "web", "dst_zone": "untrust",
+                      "dst_addr": "any", "app": "any", "service": [name for name, _ in rule_services],
+                      "action": "allow", "description": ""}],
+    }
+
+
+class BulkPushTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = start_mock_server(commit_time=0)
+        self.client = PaClient(self.server.url, "mock-key")
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+
+    def config(self) -> dict:
+        with urllib.request.urlopen(self.server.url + "/__mock/config") as response:
+            return json.load(response)["vsys:vsys1"]
+
+    def test_rerun_shrinks_member_lists(self) -> None:
+        self.assertTrue(self.client.bulk_push(sheet_config({"h1": "10.0.0.1", "h2": "10.0.0.2"},
+                                                           [("tcp-80", "80"), ("tcp-443", "443")])))
+        self.assertTrue(self.client.bulk_push(sheet_config({"h1": "10.0.0.1"}, [("tcp-443", "443")])))
+        config = self.config()
+        self.assertEqual(config["groups"]["web"]["static"]["member"], ["h1"])
+        self.assertEqual(config["rules"]["allow-web"]["service"]["member"], ["tcp-443"])
+
+    def test_rerun_keeps_rule_order(self) -> None:
+        conf = sheet_config({"h1": "10.0.0.1"}, [("tcp-80", "80")])
+        second = dict(conf["policies"][0], name="allow-web-2")
+        conf["policies"].append(second)
+        self.assertTrue(self.client.bulk_push(conf))
+        conf["policies"][0]["action"] = "deny"
+        self.assertTrue(self.client.bulk_push(conf))
+        rules = self.config()["rules"]
+        self.assertEqual(list(rules), ["allow-web", "allow-web-2"])
+        self.assertEqual(rules["allow-web"]["action"], "deny")
+
+
+if __name__ == "__main__":
+    unittest.main()
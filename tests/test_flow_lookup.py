@@ -0,0 +1,117 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from pa_flow_lookup import FlowLookup, evaluate_flows, parse_flow, rule_matches  # noqa: E402
+
+# python -m unittest discover tests
+
+SERVICES = {
+    "tcp-443": {"protocol": "tcp", "port": "443"},
+    "tcp-high": {"protocol": "tcp", "port": "1024-65535"},
+    "udp-dns": {"protocol": "udp", "port": "53"},
+}
+
+
+def rule(src: str = "any", dst: str = "any", service: str = "any", action: str = "allow", app: str = "any",
+         zones: tuple = ("trust", "untrust"), **flags) -> dict:
+    # pa_plan policy state, flags: disabled / negate_source / negate_destination = "yes"
+    return {"src_zone": [zones[0]], "src_addr": [src], "dst_zone": [zones[1]], "dst_addr": [dst], "app": [app],
+            "service": [service], "action": action, "description": "", **flags}
+
+
+def rulebase(*rules: tuple) -> dict:
+    # (name, policy) in rulebase order -> pa_plan state, addresses written as IP literals
+    return {"services": SERVICES, "addresses": {"dns-server": {"ip": "10.0.0.53"}, "vendor": {"ip": "vendor.example"}},
+            "groups": {}, "policies": dict(rules), "order": [name for name, _ in rules]}
+
+
+def flow(source: str, destination: str, port: int = 443, protocol: str = "tcp", application: str = "any",
+         from_zone: str = "trust", to_zone: str = "untrust"):
+    return parse_flow({"from_zone": from_zone, "to_zone": to_zone, "source": source, "destination": destination,
+                       "application": application, "protocol": protocol, "port": port})
+
+
+def zones_match(compiled, item) -> bool:
+    # rule_matches() leaves the zones to the zone pair index
+    return ((compiled.from_zones == "any" or item.from_zone in compiled.from_zones)
+            and (compiled.to_zones == "any" or item.to_zone in compiled.to_zones))
+
+
+class FlowLookupTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = FlowLookup(rulebase(
+            ("deny-bad-host", rule(src="10.1.1.66", action="deny")),
+            ("allow-https", rule(src="10.1.0.0/16", service="tcp-443")),
+            ("allow-dns", rule(dst="dns-server", service="udp-dns", zones=("trust", "dmz"))),
+            ("allow-ssl-high", rule(src="10.0.0.0/8", service="tcp-high", app="ssl")),
+            ("old-rule", rule(action="allow", disabled="yes")),
+            ("deny-not-lan", rule(src="10.0.0.0/8", action="deny", negate_source="yes")),
+        ))
+
+    def lookup(self, *args, **kwargs) -> tuple:
+        result = self.engine.lookup(flow(*args, **kwargs))
+        return result["rule"], result["action"]
+
+    def test_first_matching_rule_wins(self) -> None:
+        self.assertEqual(self.lookup("10.1.1.66", "8.8.8.8"), ("deny-bad-host", "deny"))
+        self.assertEqual(self.lookup("10.1.2.3", "8.8.8.8"), ("allow-https", "allow"))
+
+    def test_port_protocol_and_application_must_match(self) -> None:
+        self.assertEqual(self.lookup("10.9.0.1", "8.8.8.8", port=8443, application="ssl"), ("allow-ssl-high", "allow"))
+        self.assertEqual(self.lookup("10.9.0.1", "8.8.8.8", port=8443, application="web-browsing"),
+                         ("interzone-default", "deny"))
+        self.assertEqual(self.lookup("10.1.2.3", "8.8.8.8", port=443, protocol="udp"), ("interzone-default", "deny"))
+        self.assertEqual(self.lookup("10.1.2.3", "10.0.0.53", port=53, protocol="udp", to_zone="dmz"),
+                         ("allow-dns", "allow"))
+        self.assertEqual(self.lookup("10.1.2.3", "10.0.0.54", port=53, protocol="udp", to_zone="dmz"),
+                         ("interzone-default", "deny"))
+
+    def test_misses_get_the_default_rules(self) -> None:
+        self.assertEqual(self.lookup("10.1.2.3", "10.1.2.4", from_zone="trust", to_zone="trust"),
+                         ("intrazone-default", "allow"))
+        self.assertEqual(self.lookup("10.1.2.3", "8.8.8.8", from_zone="dmz", to_zone="untrust"),
+                         ("interzone-default", "deny"))
+
+    def test_disabled_rules_are_ignored_and_negation_matches_the_complement(self) -> None:
+        self.assertEqual(self.lookup("192.168.1.1", "8.8.8.8", port=22), ("deny-not-lan", "deny"))
+        self.assertEqual(self.lookup("10.200.0.1", "8.8.8.8", port=22), ("interzone-default", "deny"))
+
+    def test_unresolved_rule_is_reported(self) -> None:
+        engine = FlowLookup(rulebase(("to-vendor", rule(dst="vendor")), ("allow-all", rule())))
+        self.assertEqual(engine.lookup(flow("10.0.0.1", "8.8.8.8")),
+                         {"rule": "to-vendor", "action": "unresolved", "position": 0})
+
+    def test_invalid_rows_are_reported(self) -> None:
+        rows = [{"from_zone": "trust", "to_zone": "untrust", "source": "10.1.2.3", "destination": "not-an-ip",
+                 "application": "any", "protocol": "tcp", "port": "443"},
+                {"from_zone": "trust", "to_zone": "untrust", "source": "10.1.2.3", "destination": "8.8.8.8",
+                 "application": "any", "protocol": "tcp", "port": "443"}]
+        self.assertEqual([result["action"] for result in evaluate_flows(self.engine, rows)], ["invalid", "allow"])
+
+    def test_indexed_lookup_matches_a_linear_scan(self) -> None:
+        rng = random.Random(5)
+        addresses = ["any", "10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "10.1.2.3", "192.168.0.0/16", "2001:db8::/32"]
+        rules = [(f"r{i}", rule(src=rng.choice(addresses), dst=rng.choice(addresses),
+                                service=rng.choice(["any", "application-default", "tcp-443", "tcp-high", "udp-dns"]),
+                                app=rng.choice(["any", "ssl", "dns"]), action=rng.choice(["allow", "deny"]),
+                                zones=(rng.choice(["trust", "any"]), rng.choice(["untrust", "dmz"]))))
+                 for i in range(300)]
+        engine = FlowLookup(rulebase(*rules))
+        hosts = ["10.1.2.3", "10.1.9.9", "10.200.0.1", "192.168.5.5", "8.8.8.8", "2001:db8::1", "2001:db9::1"]
+        for _ in range(2000):
+            version = rng.choice([4, 6])
+            candidates = [host for host in hosts if (":" in host) == (version == 6)]
+            item = flow(rng.choice(candidates), rng.choice(candidates), port=rng.choice([53, 443, 8080, 22]),
+                        protocol=rng.choice(["tcp", "udp"]), application=rng.choice(["any", "ssl", "dns"]),
+                        to_zone=rng.choice(["untrust", "dmz"]))
+            expected = next((compiled for compiled in engine.rules if zones_match(compiled, item)
+                             and rule_matches(compiled, item)), None)
+            self.assertIs(engine.first_match(item), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
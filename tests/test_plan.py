@@ -0,0 +1,104 @@
+import json
+import os
+import random
+import sys
+import unittest
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from pa_api import PaClient  # noqa: E402
+from pa_mock_server import start_mock_server  # noqa: E402
+from pa_plan import build_plan, current_state, desired_state, execute_plan, plan_moves, plan_size  # noqa: E402
+
+# python -m unittest discover tests
+
+
+def apply_moves(order: list, moves: list) -> list:
+    # the rulebase after the :move calls, in plan order
+    order = list(order)
+    for move in moves:
+        order.remove(move["name"])
+        pos = order.index(move["dst"])
+        order.insert(pos + 1 if move["where"] == "after" else pos, move["name"])
+    return order
+
+
+def sheet_config(rule_names: list) -> dict:
+    # create_config() output: one group, one rule per name
+    return {
+        "services": [],
+        "addr_groups": [{"name": "web", "objects": [{"h1": "10.0.0.1"}]}],
+        "policies": [{"name": name, "src_zone": "trust", "src_addr": "web", "dst_zone": "untrust",
+                      "dst_addr": "any", "app": "any", "service": ["application-default"],
+                      "action": "allow", "description": ""} for name in rule_names],
+    }
+
+
+class PlanMovesTest(unittest.TestCase):
+    def test_same_order_needs_no_move(self) -> None:
+        self.assertEqual(plan_moves(["a", "b", "c"], ["a", "b", "c"]), [])
+
+    def test_one_rule_moved_to_the_bottom(self) -> None:
+        moves = plan_moves(["a", "b", "c", "d"], ["d", "a", "b", "c"])
+        self.assertEqual(moves, [{"kind": "policy", "name": "d", "where": "after", "dst": "c"}])
+
+    def test_first_rule_moved_before_the_rules_in_place(self) -> None:
+        moves = plan_moves(["d", "a", "b", "c"], ["a", "b", "c", "d"])
+        self.assertEqual(moves, [{"kind": "policy", "name": "d", "where": "before", "dst": "a"}])
+
+    def test_new_rules_are_placed_after_the_create(self) -> None:
+        # "new" is appended at the bottom by the create, then moved in place
+        desired = ["a", "new", "b"]
+        moves = plan_moves(desired, ["a", "b"])
+        self.assertEqual(apply_moves(["a", "b", "new"], moves), desired)
+
+    def test_random_reorders_use_the_fewest_moves(self) -> None:
+        # every rule outside one longest increasing subsequence is moved once
+        rng = random.Random(7)
+        for size in (1, 2, 10, 200):
+            current = [f"r{i}" for i in range(size)]
+            desired = current[:]
+            rng.shuffle(desired)
+            moves = plan_moves(desired, current)
+            self.assertEqual(apply_moves(current, moves), desired)
+            positions = [desired.index(name) for name in current]
+            longest = [1] * size
+            for i in range(size):
+                for j in range(i):
+                    if positions[j] < positions[i]:
+                        longest[i] = max(longest[i], longest[j] + 1)
+            self.assertEqual(len(moves), size - max(longest, default=0))
+
+
+class PlanExecutionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = start_mock_server(commit_time=0)
+        self.client = PaClient(self.server.url, "mock-key")
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+
+    def rule_order(self) -> list:
+        with urllib.request.urlopen(self.server.url + "/__mock/config") as response:
+            return list(json.load(response)["vsys:vsys1"]["rules"])
+
+    def current(self) -> dict:
+        return current_state(self.client.display_obj_services(), self.client.display_obj_addresses(),
+                             self.client.display_address_groups(), self.client.display_sec_policies())
+
+    def test_reordered_sheet_is_applied_on_the_firewall(self) -> None:
+        self.assertEqual(execute_plan(self.client, build_plan(desired_state(sheet_config(["a", "b", "c"])),
+                                                              self.current())), [])
+        desired = desired_state(sheet_config(["c", "new", "a", "b"]))
+        plan = build_plan(desired, self.current())
+        self.assertEqual([item["name"] for item in plan["create"]], ["new"])
+        self.assertEqual(plan["update"], [])
+        self.assertEqual(execute_plan(self.client, plan), [])
+        self.assertEqual(self.rule_order(), ["c", "new", "a", "b"])
+        self.assertEqual(plan_size(build_plan(desired, self.current())), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
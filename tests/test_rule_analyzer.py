@@ -0,0 +1,109 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from pa_rule_analyzer import analyze, compile_rules  # noqa: E402
+
+# python -m unittest discover tests
+
+SERVICES = {
+    "tcp-443": {"protocol": "tcp", "port": "443"},
+    "tcp-low": {"protocol": "tcp", "port": "1-1024"},
+    "udp-443": {"protocol": "udp", "port": "443"},
+}
+
+
+def rule(src: str = "any", dst: str = "any", service: str = "any", action: str = "allow", app: str = "any",
+         zones: tuple = ("trust", "untrust"), **flags) -> dict:
+    # pa_plan policy state, flags: disabled / negate_source / negate_destination = "yes"
+    return {"src_zone": [zones[0]], "src_addr": [src], "dst_zone": [zones[1]], "dst_addr": [dst], "app": [app],
+            "service": [service], "action": action, "description": "", **flags}
+
+
+def rulebase(*rules: tuple) -> dict:
+    # (name, policy) in rulebase order -> pa_plan state, addresses written as IP literals
+    return {"services": SERVICES, "addresses": {}, "groups": {}, "policies": dict(rules),
+            "order": [name for name, _ in rules]}
+
+
+def findings(state: dict) -> dict:
+    return {finding["rule"]: (finding["type"], finding["covered_by"]) for finding in analyze(state)["findings"]}
+
+
+class RuleAnalyzerTest(unittest.TestCase):
+    def test_broader_deny_shadows_a_later_allow(self) -> None:
+        state = rulebase(("deny-10", rule(src="10.0.0.0/8", action="deny")),
+                         ("allow-web", rule(src="10.1.1.0/24", service="tcp-443")))
+        self.assertEqual(findings(state), {"allow-web": ("shadowed", "deny-10")})
+
+    def test_narrower_rule_with_the_same_action_is_redundant(self) -> None:
+        state = rulebase(("allow-low", rule(dst="192.168.0.0/16", service="tcp-low")),
+                         ("allow-https", rule(dst="192.168.1.10", service="tcp-443")))
+        self.assertEqual(findings(state), {"allow-https": ("redundant", "allow-low")})
+
+    def test_same_criteria_and_action_is_a_duplicate(self) -> None:
+        state = rulebase(("first", rule(src="10.0.0.1", service="tcp-443")),
+                         ("second", rule(src="10.0.0.1", service="tcp-443")))
+        self.assertEqual(findings(state), {"second": ("duplicate", "first")})
+
+    def test_partial_overlaps_are_not_reported(self) -> None:
+        state = rulebase(("deny-half", rule(src="10.0.0.0/25", action="deny")),
+                         ("allow-net", rule(src="10.0.0.0/24")),
+                         ("deny-udp", rule(service="udp-443", action="deny")),
+                         ("allow-tcp", rule(service="tcp-443")),
+                         ("deny-app", rule(app="ssl", action="deny")),
+                         ("allow-web", rule(app="web-browsing")),
+                         ("deny-dmz", rule(zones=("dmz", "untrust"), action="deny")),
+                         ("allow-trust", rule(zones=("trust", "dmz"))))
+        self.assertEqual(findings(state), {})
+
+    def test_later_rule_covering_an_earlier_one_is_not_reported(self) -> None:
+        state = rulebase(("allow-host", rule(src="10.0.0.1")), ("deny-all", rule(action="deny")))
+        self.assertEqual(findings(state), {})
+
+    def test_disabled_rule_covers_nothing(self) -> None:
+        state = rulebase(("deny-all", rule(action="deny", disabled="yes")), ("allow-web", rule(service="tcp-443")))
+        self.assertEqual(findings(state), {})
+
+    def test_negated_source_covers_the_complement(self) -> None:
+        state = rulebase(("deny-outside", rule(src="10.0.0.0/8", action="deny", negate_source="yes")),
+                         ("allow-inside", rule(src="10.1.1.1")),
+                         ("allow-outside", rule(src="192.168.1.1")))
+        self.assertEqual(findings(state), {"allow-outside": ("shadowed", "deny-outside")})
+
+    def test_only_sheet_rules_are_flagged(self) -> None:
+        state = rulebase(("deny-all", rule(action="deny")), ("firewall-rule", rule(src="10.0.0.1")),
+                         ("sheet-rule", rule(src="10.0.0.2")))
+        report = analyze(state, {"sheet-rule"})
+        self.assertEqual({finding["rule"]: finding["sheet"] for finding in report["findings"]},
+                         {"firewall-rule": False, "sheet-rule": True})
+
+    def test_unresolved_rules_are_skipped(self) -> None:
+        state = rulebase(("deny-all", rule(action="deny")), ("unknown", rule(src="missing-object")))
+        report = analyze(state)
+        self.assertEqual(report["skipped"], ["unknown"])
+        self.assertEqual(report["findings"], [])
+
+    def test_indexed_search_matches_every_pair_check(self) -> None:
+        # wide and narrow addresses/services mixed: the prefix and port buckets must not hide a covering rule
+        rng = random.Random(3)
+        addresses = ["any", "10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "10.1.2.3", "10.2.0.0/16", "192.168.0.1"]
+        rules = [(f"r{i}", rule(src=rng.choice(addresses), dst=rng.choice(addresses),
+                                service=rng.choice(["any", "tcp-low", "tcp-443", "udp-443"]),
+                                action=rng.choice(["allow", "deny"]))) for i in range(300)]
+        state = rulebase(*rules)
+        compiled, _ = compile_rules(state)
+        expected = {}
+        for j, later in enumerate(compiled):
+            earlier = next((other for other in compiled[:j] if other.covers(later)), None)
+            if earlier is not None:
+                expected[later.name] = earlier.name
+        self.assertTrue(expected)
+        self.assertEqual({name: covered_by for name, (_, covered_by) in findings(state).items()}, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
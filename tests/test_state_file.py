@@ -0,0 +1,136 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source")
+sys.path.insert(0, SOURCE_DIR)
+
+from pa_api import PaClient  # noqa: E402
+from pa_mock_server import MockHandler, start_mock_server  # noqa: E402
+from pa_plan import desired_state, plan_size  # noqa: E402
+from pa_state_file import empty_state, incremental_plan, load_state_file, save_state_file  # noqa: E402
+
+# python -m unittest discover tests
+
+
+def sheet_config(hosts: dict, rule_names: list) -> dict:
+    # create_config() output: one group of the hosts, one rule per name
+    return {
+        "services": [],
+        "addr_groups": [{"name": "web", "objects": [{name: ip} for name, ip in hosts.items()]}],
+        "policies": [{"name": name, "src_zone": "trust", "src_addr": "web", "dst_zone": "untrust",
+                      "dst_addr": "any", "app": "any", "service": ["application-default"],
+                      "action": "allow", "description": ""} for name in rule_names],
+    }
+
+
+class CommitFailingHandler(MockHandler):
+    # the object and rule calls succeed, the commit is refused
+    def do_POST(self) -> None:
+        if not self.path.split("?")[0].endswith(":commit"):
+            return super().do_POST()
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._rest_error(503, 503, "Service Unavailable")
+
+
+def items(plan: dict, action: str) -> set:
+    return {(item["kind"], item["name"]) for item in plan[action]}
+
+
+class IncrementalPlanTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "state.json")
+        # no call is made, the client only keys the state file
+        self.client = PaClient("https://fw.example", "key")
+        self.first = desired_state(sheet_config({"h1": "10.0.0.1", "h2": "10.0.0.2"}, ["a", "b"]))
+        first_plan = incremental_plan(self.first, empty_state())
+        save_state_file(self.path, self.client, self.first, empty_state(), first_plan, [])
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.tmp_dir.cleanup()
+
+    def test_unchanged_sheet_has_an_empty_plan(self) -> None:
+        self.assertEqual(plan_size(incremental_plan(self.first, load_state_file(self.path, self.client))), 0)
+
+    def test_only_changes_are_pushed(self) -> None:
+        desired = desired_state(sheet_config({"h1": "10.0.0.9", "h3": "10.0.0.3"}, ["b", "a"]))
+        plan = incremental_plan(desired, load_state_file(self.path, self.client))
+        self.assertEqual(items(plan, "upsert"), {("address", "h1"), ("address", "h3"), ("group", "web")})
+        self.assertEqual(items(plan, "delete"), {("address", "h2")})
+        self.assertEqual(len(plan["move"]), 1)
+
+    def test_failed_items_are_retried_by_the_next_run(self) -> None:
+        desired = desired_state(sheet_config({"h1": "10.0.0.9", "h2": "10.0.0.2"}, ["b", "a"]))
+        previous = load_state_file(self.path, self.client)
+        plan = incremental_plan(desired, previous)
+        failures = ["upsert address h1", f"move policy {plan['move'][0]['name']}"]
+        save_state_file(self.path, self.client, desired, previous, plan, failures)
+        retry = incremental_plan(desired, load_state_file(self.path, self.client))
+        self.assertEqual(items(retry, "upsert"), {("address", "h1")})
+        self.assertEqual(retry["move"], plan["move"])
+
+    def test_state_of_another_firewall_is_ignored(self) -> None:
+        with PaClient("https://other.example", "key") as other:
+            self.assertEqual(load_state_file(self.path, other), empty_state())
+
+
+class StateFileDeployTest(unittest.TestCase):
+    # pa_deploy_policies.py --state-file against the mock firewall
+    def setUp(self) -> None:
+        self.server = start_mock_server(commit_time=0)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp_dir.name, "state.json")
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.tmp_dir.cleanup()
+
+    def deploy(self, conf: dict) -> int:
+        config_path = os.path.join(self.tmp_dir.name, "config.json")
+        with open(config_path, "w") as config_file:
+            json.dump(conf, config_file)
+        return subprocess.run([sys.executable, os.path.join(SOURCE_DIR, "pa_deploy_policies.py"), self.server.url,
+                               "mock-key", "unused.xlsx", "Rules", "--config-json", config_path,
+                               "--state-file", self.state_path, "--retries", "0"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=SOURCE_DIR).returncode
+
+    def addresses(self) -> dict:
+        with urllib.request.urlopen(self.server.url + "/__mock/config") as response:
+            return json.load(response)["vsys:vsys1"]["addresses"]
+
+    def assert_failed_push_keeps_the_state_file(self, break_push, repair_push) -> None:
+        self.assertEqual(self.deploy(sheet_config({"h1": "10.0.0.1"}, ["a"])), 0)
+        with open(self.state_path) as state_file:
+            saved = state_file.read()
+
+        changed = sheet_config({"h1": "10.0.0.9"}, ["a"])
+        break_push()
+        self.assertNotEqual(self.deploy(changed), 0)
+        with open(self.state_path) as state_file:
+            self.assertEqual(state_file.read(), saved)
+
+        # the change is still pending, the next run pushes it
+        repair_push()
+        self.assertEqual(self.deploy(changed), 0)
+        self.assertEqual(self.addresses()["h1"]["ip-netmask"], "10.0.0.9")
+        with open(self.state_path) as state_file:
+            self.assertNotEqual(state_file.read(), saved)
+
+    def test_state_file_is_kept_when_every_call_fails(self) -> None:
+        self.assert_failed_push_keeps_the_state_file(lambda: setattr(self.server, "error_rate", 1.0),
+                                                     lambda: setattr(self.server, "error_rate", 0.0))
+
+    def test_state_file_is_kept_when_the_commit_fails(self) -> None:
+        handler = self.server.RequestHandlerClass
+        self.assert_failed_push_keeps_the_state_file(
+            lambda: setattr(self.server, "RequestHandlerClass", CommitFailingHandler),
+            lambda: setattr(self.server, "RequestHandlerClass", handler))
+
+if __name__ == "__main__":
+    unittest.main()